@@ -0,0 +1,346 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import array
+import itertools
+import re
+import typing
+from re import Pattern
+from ReferenceModels import REFERENCE_MODELS, WORD_MASK
+
+# The value of every bit of a word, and the bits of every byte
+BIT_VALUES: list[int] = [1 << bit for bit in range(16)]
+BYTE_BITS: list[tuple[int, ...]] = [tuple(byte >> bit & 1 for bit in range(8)) for byte in range(256)]
+# The names of the RAM chips, like RAM8 or RAM4K
+RAM_REGEX: Pattern[str] = re.compile(r'^RAM(\d+)(K?)$')
+
+
+class BuiltinPart(typing.NamedTuple):
+    """A built-in chip in a netlist, the nets of its pins, and the number of
+    gates evaluated before it.
+    """
+    chip: str
+    inputs: dict[str, list[int]]
+    outputs: dict[str, list[int]]
+    position: int
+
+
+def lane_word(values: list[int], nets: list[int], lane: int) -> int:
+    """
+    Args:
+        values (list[int]): the lanes of every net.
+        nets (list[int]): the nets of a pin, from bit 0 up.
+        lane (int): a lane.
+
+    Returns:
+        int: the value of the pin in the lane.
+    """
+    word: int = 0
+    for bit, net in enumerate(nets):
+        word |= (values[net] >> lane & 1) << bit
+    return word
+
+
+def set_lane_word(values: list[int], nets: list[int], lane: int, word: int) -> None:
+    """Sets the value of a pin in a lane.
+
+    Args:
+        values (list[int]): the lanes of every net.
+        nets (list[int]): the nets of a pin, from bit 0 up.
+        lane (int): a lane.
+        word (int): the value.
+    """
+    lane_bit: int = 1 << lane
+    for bit, net in enumerate(nets):
+        if word >> bit & 1:
+            values[net] |= lane_bit
+        else:
+            values[net] &= ~lane_bit
+
+
+class BuiltinChip:
+    """A chip simulated in Python instead of by gates, like the built-in
+    chips of the hardware simulator of the course. Each lane has its own
+    state.
+    """
+    inputs: list[tuple[str, int]] = []
+    outputs: list[tuple[str, int]] = []
+    # The inputs the outputs follow between clock edges. The other inputs
+    # are only read on a tick.
+    combinational: tuple[str, ...] = ()
+
+    def __init__(self, part: BuiltinPart, lanes: int) -> None:
+        """
+        Args:
+            part (BuiltinPart): the pins of the chip in the netlist.
+            lanes (int): the number of lanes.
+        """
+        self.part: BuiltinPart = part
+        self.lanes: int = lanes
+
+    def evaluate(self, values: list[int]) -> None:
+        """Sets the outputs from the combinational inputs and the state.
+
+        Args:
+            values (list[int]): the lanes of every net.
+        """
+
+    def tick(self, values: list[int]) -> None:
+        """Latches the inputs on the rising edge of the clock.
+
+        Args:
+            values (list[int]): the lanes of every net.
+        """
+
+    def tock(self) -> bool:
+        """Updates the state on the falling edge of the clock.
+
+        Returns:
+            bool: whether the state changed.
+        """
+        return False
+
+    def read(self, index: int, lane: int = 0) -> int:
+        """
+        Args:
+            index (int): a word of the state of the chip.
+            lane (int): a lane.
+
+        Returns:
+            int: the word.
+        """
+        raise ValueError(f"{self.part.chip} has no state")
+
+    def write(self, index: int, word: int, lane: int = 0) -> None:
+        """
+        Args:
+            index (int): a word of the state of the chip.
+            word (int): its new value.
+            lane (int): a lane.
+        """
+        raise ValueError(f"{self.part.chip} has no state")
+
+    def load(self, path: str) -> None:
+        """
+        Args:
+            path (str): a file to load into the chip.
+        """
+        raise ValueError(f"{self.part.chip} can't load files")
+
+
+class MemoryChip(BuiltinChip):
+    """A word-addressed memory, where out is the word at address. When load
+    is set, in is written to the word on the tick, and is read from the tock
+    on.
+    """
+    address_width: int = 0
+    combinational = ("address",)
+
+    def __init__(self, part: BuiltinPart, lanes: int) -> None:
+        super().__init__(part, lanes)
+        self.words: list[array.array] = [array.array('H', bytes(2 << self.address_width)) for _ in range(lanes)]
+        # The (lane, address, word) of the writes latched on the last tick
+        self._writes: list[tuple[int, int, int]] = []
+
+    def evaluate(self, values: list[int]) -> None:
+        address: list[int] = self.part.inputs["address"]
+        out: list[int] = self.part.outputs["out"]
+        for lane, words in enumerate(self.words):
+            set_lane_word(values, out, lane, words[lane_word(values, address, lane)])
+
+    def tick(self, values: list[int]) -> None:
+        load: int = values[self.part.inputs["load"][0]]
+        self._writes = [(lane, lane_word(values, self.part.inputs["address"], lane),
+                         lane_word(values, self.part.inputs["in"], lane))
+                        for lane in range(self.lanes) if load >> lane & 1]
+
+    def tock(self) -> bool:
+        writes: list[tuple[int, int, int]] = self._writes
+        for lane, address, word in writes:
+            self.words[lane][address] = word
+        self._writes = []
+        return bool(writes)
+
+    def read(self, index: int, lane: int = 0) -> int:
+        return self.words[lane][index]
+
+    def write(self, index: int, word: int, lane: int = 0) -> None:
+        self.words[lane][index] = word & WORD_MASK
+
+
+class RAM16K(MemoryChip):
+    """The data memory of the computer."""
+    inputs = [("in", 16), ("load", 1), ("address", 14)]
+    outputs = [("out", 16)]
+    address_width = 14
+
+
+class Screen(MemoryChip):
+    """The memory map of the screen, 256 rows of 32 words."""
+    inputs = [("in", 16), ("load", 1), ("address", 13)]
+    outputs = [("out", 16)]
+    address_width = 13
+
+
+class ROM32K(MemoryChip):
+    """The instruction memory of the computer, loaded from a .hack file."""
+    inputs = [("address", 15)]
+    outputs = [("out", 16)]
+    address_width = 15
+
+    def tick(self, values: list[int]) -> None:
+        pass
+
+    def load(self, path: str) -> None:
+        with open(path, 'r') as input_file:
+            program: list[int] = [int(line.strip(), 2) for line in input_file if line.strip()]
+        for words in self.words:
+            words[:len(program)] = array.array('H', program)
+            words[len(program):] = array.array('H', bytes(2 * (len(words) - len(program))))
+
+
+class Keyboard(BuiltinChip):
+    """The memory map of the keyboard, the code of the key held down."""
+    outputs = [("out", 16)]
+
+    def __init__(self, part: BuiltinPart, lanes: int) -> None:
+        super().__init__(part, lanes)
+        self.keys: list[int] = [0] * lanes
+
+    def evaluate(self, values: list[int]) -> None:
+        for lane, key in enumerate(self.keys):
+            set_lane_word(values, self.part.outputs["out"], lane, key)
+
+    def read(self, index: int, lane: int = 0) -> int:
+        return self.keys[lane]
+
+    def write(self, index: int, word: int, lane: int = 0) -> None:
+        self.keys[lane] = word & WORD_MASK
+
+
+class WordChip(BuiltinChip):
+    """A combinational chip computed a word at a time by its reference model,
+    which replaces its gates once they were verified to match the model.
+    """
+    # The reference model, which takes the value of every input pin as a
+    # keyword argument and returns the value of every output pin. Set by
+    # fast_path for each chip.
+    model: typing.Callable[..., dict[str, int]]
+
+    def __init__(self, part: BuiltinPart, lanes: int) -> None:
+        super().__init__(part, lanes)
+        self._inputs: list[tuple[str, list[int]]] = list(part.inputs.items())
+        self._outputs: dict[str, list[int]] = part.outputs
+        # The first net and the width of every output pin, whose nets are
+        # numbered in a row by build_netlist
+        self._ranges: dict[str, tuple[int, int]] = {pin: (nets[0], len(nets)) for pin, nets in part.outputs.items()}
+        self._contiguous: bool = all(nets == list(range(nets[0], nets[0] + len(nets)))
+                                     for nets in part.outputs.values())
+
+    def evaluate(self, values: list[int]) -> None:
+        inputs: list[tuple[str, list[int]]] = self._inputs
+        outputs: dict[str, list[int]] = self._outputs
+        if self.lanes == 1 and self._contiguous:
+            # Every net is 0 or 1, so the bits select the powers of two of
+            # a word, and a word is written as the bits of its bytes
+            words: dict[str, int] = {pin: sum(itertools.compress(BIT_VALUES, map(values.__getitem__, nets)))
+                                     for pin, nets in inputs}
+            ranges: dict[str, tuple[int, int]] = self._ranges
+            for pin, word in self.model(**words).items():
+                start, width = ranges[pin]
+                if width == 1:
+                    values[start] = word
+                else:
+                    values[start:start + width] = (BYTE_BITS[word & 0xFF] + BYTE_BITS[word >> 8])[:width]
+            return
+        for lane in range(self.lanes):
+            words = {pin: lane_word(values, nets, lane) for pin, nets in inputs}
+            for pin, word in self.model(**words).items():
+                set_lane_word(values, outputs[pin], lane, word)
+
+
+# The pins of the chips that may be replaced by their reference models,
+# as given in the course. Smaller chips, like Mux16, are faster as gates.
+FAST_PATH_PINS: dict[str, tuple[list[tuple[str, int]], list[tuple[str, int]]]] = {
+    "Mux4Way16": ([("a", 16), ("b", 16), ("c", 16), ("d", 16), ("sel", 2)], [("out", 16)]),
+    "Mux8Way16": ([(name, 16) for name in "abcdefgh"] + [("sel", 3)], [("out", 16)]),
+    "Add16": ([("a", 16), ("b", 16)], [("out", 16)]),
+    "Inc16": ([("in", 16)], [("out", 16)]),
+    "ALU": ([("x", 16), ("y", 16), ("zx", 1), ("nx", 1), ("zy", 1), ("ny", 1), ("f", 1), ("no", 1)],
+            [("out", 16), ("zr", 1), ("ng", 1)]),
+}
+# The fast paths created so far, by name
+FAST_PATHS: dict[str, type[WordChip]] = {}
+
+
+def fast_path(name: str) -> typing.Optional[type[WordChip]]:
+    """
+    Args:
+        name (str): the name of a chip.
+
+    Returns:
+        type[WordChip]: the chip computed by its reference model, or None
+        if it has no fast path.
+    """
+    if name not in FAST_PATH_PINS:
+        return None
+    if name not in FAST_PATHS:
+        inputs, outputs = FAST_PATH_PINS[name]
+        FAST_PATHS[name] = type(name, (WordChip,), {
+            "__doc__": f"{name} computed by its reference model.", "inputs": inputs, "outputs": outputs,
+            "combinational": tuple(pin for pin, _ in inputs), "model": staticmethod(REFERENCE_MODELS[name])})
+    return FAST_PATHS[name]
+
+
+# The built-in chips, used for parts that aren't in the directory of the
+# simulated chip, like the hardware simulator of the course does
+BUILTIN_CHIPS: dict[str, type[BuiltinChip]] = {
+    "RAM16K": RAM16K,
+    "Screen": Screen,
+    "ROM32K": ROM32K,
+    "Keyboard": Keyboard,
+}
+# The memory arrays created so far, by name
+MEMORY_ARRAYS: dict[str, type[MemoryChip]] = {}
+
+
+def memory_array(name: str) -> typing.Optional[type[MemoryChip]]:
+    """
+    Args:
+        name (str): the name of a chip.
+
+    Returns:
+        type[MemoryChip]: a memory with the pins of the RAM chip of this
+        name, like RAM8 or RAM4K, or None if it isn't one.
+    """
+    match: typing.Optional[re.Match[str]] = RAM_REGEX.match(name)
+    if match is None:
+        return None
+    words: int = int(match.group(1)) * (1024 if match.group(2) else 1)
+    address_width: int = words.bit_length() - 1
+    if words != 1 << address_width:
+        return None
+    if name not in MEMORY_ARRAYS:
+        MEMORY_ARRAYS[name] = type(name, (MemoryChip,), {
+            "__doc__": f"{name} modelled as an array of {words} words.",
+            "inputs": [("in", 16), ("load", 1), ("address", address_width)], "outputs": [("out", 16)],
+            "address_width": address_width})
+    return MEMORY_ARRAYS[name]
+
+
+def builtin_chip(name: str) -> type[BuiltinChip]:
+    """
+    Args:
+        name (str): the name of a built-in chip, a memory array or a fast
+            path.
+
+    Returns:
+        type[BuiltinChip]: the class that simulates it.
+    """
+    chip: typing.Optional[type[BuiltinChip]] = BUILTIN_CHIPS.get(name) or memory_array(name) or fast_path(name)
+    if chip is None:
+        raise ValueError(f"{name} isn't a built-in chip")
+    return chip
@@ -0,0 +1,101 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import sys
+import time
+from EventDrivenSimulator import EventDrivenSimulator
+from HardwareSimulator import HardwareSimulator
+from Netlist import Netlist, load_netlist
+from TestRunner import RunOptions, verified_fast_paths
+
+# The state compared between the simulators after a run
+REGISTERS: tuple[str, ...] = ("ARegister", "DRegister", "PC")
+MEMORIES: tuple[str, ...] = ("RAM16K", "Screen")
+
+
+def load_computer(simulator: HardwareSimulator, program: str, ram: list[tuple[int, int]]) -> None:
+    """Loads a program into the ROM of a computer, like ROM32K load in a test
+    script, and sets words of its RAM.
+
+    Args:
+        simulator (HardwareSimulator): simulates the computer.
+        program (str): the path of a .hack file.
+        ram (list[tuple[int, int]]): the (address, value) of the words to set.
+    """
+    simulator.load("ROM32K", program)
+    for address, value in ram:
+        simulator.write_state("RAM16K", address, value)
+
+
+def run_cycles(simulator: HardwareSimulator, cycles: int) -> float:
+    """
+    Returns:
+        float: the time in seconds it took to run the cycles, each a tick and
+        a tock.
+    """
+    start: float = time.perf_counter()
+    for _ in range(cycles):
+        simulator.tick()
+        simulator.tock()
+    return time.perf_counter() - start
+
+
+def computer_state(simulator: HardwareSimulator) -> list[object]:
+    """
+    Returns:
+        list[object]: the registers and memories of a computer.
+    """
+    state: list[object] = [simulator.read_state(register) for register in REGISTERS
+                           if register in simulator.netlist.probes]
+    for memory in MEMORIES:
+        state.append(bytes(simulator.part(memory).words[0]))
+    return state
+
+
+if "__main__" == __name__:
+    # Runs a program on Computer.hdl for many cycles, evaluating the whole
+    # network on every tick and tock, and then evaluating only the gates
+    # whose inputs changed, and compares their speed. For example, the
+    # program of ComputerRect.tst:
+    # python ClockBenchmark.py Rect.hack --ram 0=4 --cycles 5000
+    # Both simulators must end in the same state. With --fast-paths, the
+    # parts whose gates were verified are computed by their reference models,
+    # like TestRunner does.
+    argument_parser = argparse.ArgumentParser(prog="ClockBenchmark")
+    argument_parser.add_argument("program", help="a .hack file")
+    argument_parser.add_argument("--chip", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                "Computer.hdl"), help="the computer to simulate")
+    argument_parser.add_argument("--cycles", type=int, default=5000, help="the number of clock cycles to run")
+    argument_parser.add_argument("--ram", nargs="*", default=[], metavar="ADDRESS=VALUE",
+                                 help="words of RAM to set before running")
+    argument_parser.add_argument("--fast-paths", action="store_true",
+                                 help="compute the verified parts by their reference models")
+    arguments = argument_parser.parse_args()
+    ram_words: list[tuple[int, int]] = [(int(word.split("=")[0]), int(word.split("=")[1]))
+                                        for word in arguments.ram]
+    fast_paths: frozenset[str] = verified_fast_paths(arguments.chip, RunOptions()) if arguments.fast_paths \
+        else frozenset()
+    netlist: Netlist = load_netlist(arguments.chip, fast_paths=fast_paths)
+    full: HardwareSimulator = HardwareSimulator(netlist)
+    event_driven: EventDrivenSimulator = EventDrivenSimulator(netlist)
+    for simulator in (full, event_driven):
+        load_computer(simulator, arguments.program, ram_words)
+    full_time: float = run_cycles(full, arguments.cycles)
+    event_driven_time: float = run_cycles(event_driven, arguments.cycles)
+    # The first evaluation of the event-driven simulator evaluates every gate
+    evaluations: int = max(event_driven.evaluations, 1)
+    print(f"{os.path.basename(arguments.program)}: {arguments.cycles} cycles, {len(netlist.gates)} gates"
+          + (f", fast paths {', '.join(sorted(fast_paths))}" if fast_paths else ""))
+    print(f"    full evaluation: {arguments.cycles / full_time:.0f} cycles/s, "
+          f"{len(netlist.gates)} gates per tick or tock")
+    print(f"    event-driven: {arguments.cycles / event_driven_time:.0f} cycles/s, "
+          f"{event_driven.total_evaluated_gates / evaluations:.1f} gates evaluated and "
+          f"{event_driven.total_changed_gates / evaluations:.1f} changed per tick or tock, "
+          f"speedup {full_time / event_driven_time:.2f}x")
+    if computer_state(full) != computer_state(event_driven):
+        sys.exit(f"{arguments.program}: the simulators ended in different states")
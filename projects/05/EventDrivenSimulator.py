@@ -0,0 +1,153 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from BuiltinChips import BuiltinChip
+from HardwareSimulator import HardwareSimulator
+from Netlist import Netlist
+
+# A gate, as its (a, b, out) nets, or a built-in chip
+Node = typing.Union[tuple[int, int, int], BuiltinChip]
+
+
+class EventDrivenSimulator(HardwareSimulator):
+    """Simulates a netlist like HardwareSimulator, but only evaluates the
+    gates whose inputs changed since the last evaluation. A net that changes
+    schedules the gates and built-in chips that read it in the bucket of
+    their level, and the buckets are evaluated from the lowest level up, so
+    each node is evaluated at most once and after all of its inputs settled.
+    A built-in chip is also scheduled when its state changes, on a tock that
+    wrote to a memory or when a word of it is set. The gates evaluated and
+    the gates whose outputs changed are counted for every evaluation, which
+    happens once on a tick and once on a tock.
+    """
+
+    def __init__(self, netlist: Netlist, lanes: int = 1) -> None:
+        """
+        Args:
+            netlist (Netlist): the chip to simulate.
+            lanes (int): the number of vectors simulated at once.
+        """
+        super().__init__(netlist, lanes)
+        self._nodes: list[Node] = []
+        for part, gates in zip(self.parts, self._segments):
+            self._nodes += gates
+            self._nodes.append(part)
+        self._nodes += self._segments[-1]
+        # The nodes that read each net, and the level of each node, one more
+        # than the highest level of the nodes driving its inputs
+        self._fanout: list[list[int]] = [[] for _ in range(netlist.net_count)]
+        self._levels: list[int] = []
+        net_levels: list[int] = [0] * netlist.net_count
+        # The output nets of each built-in chip, by node
+        self._part_outputs: dict[int, list[int]] = {}
+        self._part_nodes: dict[str, int] = {}
+        for index, node in enumerate(self._nodes):
+            if isinstance(node, tuple):
+                a, b, out = node
+                inputs: list[int] = [a] if b == a else [a, b]
+                outputs: list[int] = [out]
+            else:
+                inputs = [net for pin in node.combinational for net in node.part.inputs[pin]]
+                outputs = [net for nets in node.part.outputs.values() for net in nets]
+                self._part_outputs[index] = outputs
+                self._part_nodes.setdefault(node.part.chip, index)
+            for net in inputs:
+                self._fanout[net].append(index)
+            level: int = 1 + max((net_levels[net] for net in inputs), default=0)
+            for net in outputs:
+                net_levels[net] = level
+            self._levels.append(level)
+        # Every node is evaluated the first time, since no net settled yet
+        self._buckets: list[list[int]] = [[] for _ in range(max(self._levels, default=0) + 1)]
+        for index, level in enumerate(self._levels):
+            self._buckets[level].append(index)
+        self._scheduled: bytearray = bytearray(b"\x01" * len(self._nodes))
+        self.evaluated_gates: int = 0
+        self.changed_gates: int = 0
+        self.total_evaluated_gates: int = 0
+        self.total_changed_gates: int = 0
+        self.evaluations: int = 0
+
+    def _schedule(self, index: int) -> None:
+        if not self._scheduled[index]:
+            self._scheduled[index] = 1
+            self._buckets[self._levels[index]].append(index)
+
+    def _update(self, net: int, value: int) -> None:
+        if self.values[net] != value:
+            self.values[net] = value
+            for reader in self._fanout[net]:
+                self._schedule(reader)
+
+    def set_lanes(self, pin: str, bits: typing.Sequence[int]) -> None:
+        for net, lane_bits in zip(self.netlist.inputs[pin], bits):
+            self._update(net, lane_bits & self.mask)
+
+    def write_state(self, chip: str, index: typing.Optional[int], value: int) -> None:
+        super().write_state(chip, index, value)
+        for net in self.netlist.probes.get(chip, ()):
+            for reader in self._fanout[net]:
+                self._schedule(reader)
+        if chip in self._part_nodes:
+            self._schedule(self._part_nodes[chip])
+
+    def load(self, chip: str, path: str) -> None:
+        super().load(chip, path)
+        self._schedule(self._part_nodes[chip])
+
+    def evaluate(self) -> None:
+        values: list[int] = self.values
+        mask: int = self.mask
+        nodes: list[Node] = self._nodes
+        fanout: list[list[int]] = self._fanout
+        levels: list[int] = self._levels
+        buckets: list[list[int]] = self._buckets
+        scheduled: bytearray = self._scheduled
+        evaluated: int = 0
+        changed: int = 0
+        for bucket in buckets:
+            if not bucket:
+                continue
+            # Nodes of a level never read each other, so the bucket doesn't
+            # grow while it's evaluated
+            for index in bucket:
+                scheduled[index] = 0
+                node: Node = nodes[index]
+                if type(node) is tuple:
+                    a, b, out = node
+                    evaluated += 1
+                    value: int = mask ^ (values[a] & values[b])
+                    if value == values[out]:
+                        continue
+                    values[out] = value
+                    changed += 1
+                    for reader in fanout[out]:
+                        if not scheduled[reader]:
+                            scheduled[reader] = 1
+                            buckets[levels[reader]].append(reader)
+                else:
+                    outputs: list[int] = self._part_outputs[index]
+                    before: list[int] = [values[net] for net in outputs]
+                    node.evaluate(values)
+                    for net, old in zip(outputs, before):
+                        if values[net] != old:
+                            for reader in fanout[net]:
+                                self._schedule(reader)
+            bucket.clear()
+        self.evaluated_gates, self.changed_gates = evaluated, changed
+        self.total_evaluated_gates += evaluated
+        self.total_changed_gates += changed
+        self.evaluations += 1
+
+    def tock(self) -> None:
+        for (_, out), value in zip(self.netlist.dffs, self._latched or ()):
+            self._update(out, value)
+        self._latched = None
+        for index, part in zip(self._part_outputs, self.parts):
+            if part.tock():
+                self._schedule(index)
+        self.evaluate()
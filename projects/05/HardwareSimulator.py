@@ -0,0 +1,342 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import typing
+from BuiltinChips import BuiltinChip, builtin_chip
+from Netlist import TRUE_NET, Netlist, load_netlist
+from ReferenceModels import REFERENCE_MODELS
+
+# Chips with more input bits than this are checked on random vectors
+# instead of on every possible input
+MAX_EXHAUSTIVE_BITS: int = 20
+
+
+def pack(values: typing.Sequence[int], width: int) -> list[int]:
+    """Packs a value for every lane into the lanes of every bit, so bit i of
+    the j-th integer is bit j of the i-th value.
+
+    Args:
+        values (Sequence[int]): the value of each lane.
+        width (int): the number of bits of the values.
+
+    Returns:
+        list[int]: the lanes of each bit, from bit 0 up.
+    """
+    return [int("".join("1" if value >> bit & 1 else "0" for value in reversed(values)) or "0", 2)
+            for bit in range(width)]
+
+
+def unpack(bits: typing.Sequence[int], lanes: int) -> list[int]:
+    """The inverse of pack.
+
+    Args:
+        bits (Sequence[int]): the lanes of each bit, from bit 0 up.
+        lanes (int): the number of lanes.
+
+    Returns:
+        list[int]: the value of each lane.
+    """
+    if not bits:
+        return [0] * lanes
+    # Every lane becomes a column of binary digits, most significant first
+    rows: list[str] = [format(lane_bits, f"0{lanes}b") for lane_bits in reversed(bits)]
+    return [int("".join(column), 2) for column in zip(*rows)][::-1]
+
+
+def counting_lanes(width: int) -> list[int]:
+    """
+    Args:
+        width (int): a number of bits.
+
+    Returns:
+        list[int]: the lanes of each bit of the numbers 0 to 2**width - 1,
+        one number per lane.
+    """
+    lanes: int = 1 << width
+    bits: list[int] = []
+    for bit in range(width):
+        half: int = 1 << bit
+        # Half a period of zeros and half of ones, repeated
+        period: int = ((1 << half) - 1) << half
+        bits.append(period * (((1 << lanes) - 1) // ((1 << 2 * half) - 1)))
+    return bits
+
+
+class HardwareSimulator:
+    """Simulates a netlist on many input vectors at once. Every net holds an
+    integer with a bit for every lane, so a Nand gate is evaluated for all
+    the lanes by a single bitwise operation on Python's arbitrary-precision
+    integers, which run over machine words in C. The built-in chips are
+    evaluated a lane at a time.
+    """
+
+    def __init__(self, netlist: Netlist, lanes: int = 1) -> None:
+        """
+        Args:
+            netlist (Netlist): the chip to simulate.
+            lanes (int): the number of vectors simulated at once.
+        """
+        self.netlist: Netlist = netlist
+        self.lanes: int = lanes
+        self.mask: int = (1 << lanes) - 1
+        self.values: list[int] = [0] * netlist.net_count
+        self.values[TRUE_NET] = self.mask
+        # The values the DFFs latched on the last tick, until the tock
+        self._latched: typing.Optional[list[int]] = None
+        self._dff_indices: dict[int, int] = {out: index for index, (_, out) in enumerate(netlist.dffs)}
+        self.parts: list[BuiltinChip] = [builtin_chip(part.chip)(part, lanes) for part in netlist.parts]
+        # The gates evaluated before each built-in chip, and after the last
+        self._segments: list[list[tuple[int, int, int]]] = []
+        position: int = 0
+        for part in netlist.parts:
+            self._segments.append(netlist.gates[position:part.position])
+            position = part.position
+        self._segments.append(netlist.gates[position:] if position else netlist.gates)
+
+    def set_lanes(self, pin: str, bits: typing.Sequence[int]) -> None:
+        """
+        Args:
+            pin (str): an input pin.
+            bits (Sequence[int]): the lanes of each bit of the pin.
+        """
+        for net, lane_bits in zip(self.netlist.inputs[pin], bits):
+            self.values[net] = lane_bits & self.mask
+
+    def set_input(self, pin: str, values: typing.Union[int, typing.Sequence[int]]) -> None:
+        """
+        Args:
+            pin (str): an input pin.
+            values (int or Sequence[int]): the value of every lane, or one
+                value for all of them.
+        """
+        nets: list[int] = self.netlist.inputs[pin]
+        if isinstance(values, int):
+            self.set_lanes(pin, [self.mask if values >> bit & 1 else 0 for bit in range(len(nets))])
+        else:
+            self.set_lanes(pin, pack(values, len(nets)))
+
+    def get_lanes(self, pin: str) -> list[int]:
+        """
+        Args:
+            pin (str): an output or input pin.
+
+        Returns:
+            list[int]: the lanes of each bit of the pin.
+        """
+        nets: list[int] = self.netlist.outputs.get(pin) or self.netlist.inputs[pin]
+        return [self.values[net] for net in nets]
+
+    def get_output(self, pin: str) -> list[int]:
+        """
+        Args:
+            pin (str): an output or input pin.
+
+        Returns:
+            list[int]: the unsigned value of the pin in every lane.
+        """
+        return unpack(self.get_lanes(pin), self.lanes)
+
+    def part(self, chip: str) -> BuiltinChip:
+        """
+        Args:
+            chip (str): the name of a built-in chip.
+
+        Returns:
+            BuiltinChip: its first part in the netlist.
+        """
+        for part in self.parts:
+            if part.part.chip == chip:
+                return part
+        raise ValueError(f"{self.netlist.name} has no built-in {chip}")
+
+    def read_state(self, chip: str, index: typing.Optional[int] = None, lane: int = 0) -> int:
+        """
+        Args:
+            chip (str): the name of a built-in chip, or of a chip made of
+                DFFs, like a register.
+            index (int): the word of a memory to read.
+            lane (int): a lane.
+
+        Returns:
+            int: the unsigned value of the word, or of the register. Like
+            the built-in registers of the course, a register holds its new
+            value from the tick, though it outputs it from the tock.
+        """
+        if chip in self.netlist.probes and not index:
+            nets: list[int] = self.netlist.probes[chip]
+            if self._latched is not None:
+                return sum((self._latched[self._dff_indices[net]] >> lane & 1) << bit
+                           for bit, net in enumerate(nets))
+            return sum((self.values[net] >> lane & 1) << bit for bit, net in enumerate(nets))
+        return self.part(chip).read(index or 0, lane)
+
+    def write_state(self, chip: str, index: typing.Optional[int], value: int) -> None:
+        """Sets a word of a built-in chip, or a register, in every lane.
+
+        Args:
+            chip (str): the name of a built-in chip, or of a chip made of
+                DFFs, like a register.
+            index (int): the word of a memory to set.
+            value (int): the new value.
+        """
+        if chip in self.netlist.probes and not index:
+            for bit, net in enumerate(self.netlist.probes[chip]):
+                self.values[net] = self.mask if value >> bit & 1 else 0
+                if self._latched is not None:
+                    self._latched[self._dff_indices[net]] = self.values[net]
+            return
+        for lane in range(self.lanes):
+            self.part(chip).write(index or 0, value, lane)
+
+    def load(self, chip: str, path: str) -> None:
+        """Loads a file into a built-in chip, like a program into the ROM.
+
+        Args:
+            chip (str): the name of a built-in chip.
+            path (str): the file to load.
+        """
+        self.part(chip).load(path)
+
+    def evaluate(self) -> None:
+        """Settles the combinational gates and built-in chips, from the
+        inputs and the outputs of the DFFs.
+        """
+        values: list[int] = self.values
+        mask: int = self.mask
+        for part, gates in zip(self.parts, self._segments):
+            for a, b, out in gates:
+                values[out] = mask ^ (values[a] & values[b])
+            part.evaluate(values)
+        for a, b, out in self._segments[-1]:
+            values[out] = mask ^ (values[a] & values[b])
+
+    def tick(self) -> None:
+        """The rising edge of the clock, where the DFFs and the built-in chips
+        latch their inputs.
+        """
+        self.evaluate()
+        self._latched = [self.values[net] for net, _ in self.netlist.dffs]
+        for part in self.parts:
+            part.tick(self.values)
+
+    def tock(self) -> None:
+        """The falling edge of the clock, where the DFFs output the values
+        they latched, and the built-in chips update their state.
+        """
+        for (_, out), value in zip(self.netlist.dffs, self._latched or ()):
+            self.values[out] = value
+        self._latched = None
+        for part in self.parts:
+            part.tock()
+        self.evaluate()
+
+
+def check_chip(simulator: HardwareSimulator, model: typing.Callable[..., typing.Optional[dict[str, int]]],
+               inputs: dict[str, list[int]]) -> list[str]:
+    """Compares the outputs of a simulated combinational chip with a model,
+    on the inputs that were set in every lane.
+
+    Args:
+        simulator (HardwareSimulator): the evaluated chip.
+        model (Callable[..., Optional[dict[str, int]]]): the model of the
+            chip.
+        inputs (dict[str, list[int]]): the value of each input pin in every
+            lane.
+
+    Returns:
+        list[str]: the lanes where the outputs differ.
+    """
+    outputs: dict[str, list[int]] = {pin: simulator.get_output(pin) for pin in simulator.netlist.outputs}
+    mismatches: list[str] = []
+    for lane in range(simulator.lanes):
+        arguments: dict[str, int] = {pin: values[lane] for pin, values in inputs.items()}
+        expected: typing.Optional[dict[str, int]] = model(**arguments)
+        actual: dict[str, int] = {pin: values[lane] for pin, values in outputs.items()}
+        if expected is not None and expected != actual:
+            mismatches.append(f"{arguments}: expected {expected}, got {actual}")
+    return mismatches
+
+
+def check_netlist(netlist: Netlist, model: typing.Callable[..., typing.Optional[dict[str, int]]],
+                  vectors: int = 1 << 16, seed: int = 0) -> tuple[HardwareSimulator, list[str]]:
+    """Simulates a combinational chip on every possible input when it has at
+    most MAX_EXHAUSTIVE_BITS input bits, and otherwise on random inputs, all
+    at once, and compares it with a model.
+
+    Args:
+        netlist (Netlist): the chip.
+        model (Callable[..., Optional[dict[str, int]]]): the model of the
+            chip.
+        vectors (int): the number of random inputs.
+        seed (int): the seed of the random inputs.
+
+    Returns:
+        tuple[HardwareSimulator, list[str]]: the simulator, and the lanes
+        where the outputs differ.
+    """
+    widths: dict[str, int] = {pin: len(nets) for pin, nets in netlist.inputs.items()}
+    input_bits: int = sum(widths.values())
+    if input_bits <= MAX_EXHAUSTIVE_BITS:
+        simulator: HardwareSimulator = HardwareSimulator(netlist, 1 << input_bits)
+        counting: list[int] = counting_lanes(input_bits)
+        for pin, width in widths.items():
+            simulator.set_lanes(pin, counting[:width])
+            counting = counting[width:]
+        inputs: dict[str, list[int]] = {pin: simulator.get_output(pin) for pin in widths}
+    else:
+        generator: random.Random = random.Random(seed)
+        simulator = HardwareSimulator(netlist, vectors)
+        inputs = {pin: [generator.getrandbits(width) for _ in range(vectors)] for pin, width in widths.items()}
+        for pin, values in inputs.items():
+            simulator.set_input(pin, values)
+    simulator.evaluate()
+    return simulator, check_chip(simulator, model, inputs)
+
+
+if "__main__" == __name__:
+    # Flattens a chip and checks it against its Python model, on every
+    # possible input when the chip has at most MAX_EXHAUSTIVE_BITS input
+    # bits, and otherwise on random inputs, all simulated at once. For
+    # example:
+    # python HardwareSimulator.py ../02/Inc16.hdl
+    # RAM parts are modelled as arrays unless --gate-level-memory is given,
+    # and with --cache netlists are cached on disk until their chips change.
+    argument_parser = argparse.ArgumentParser(prog="HardwareSimulator")
+    argument_parser.add_argument("input_paths", nargs="+", metavar="input_path", help="an .hdl file")
+    argument_parser.add_argument("--vectors", type=int, default=1 << 16,
+                                 help="the number of random vectors of chips with many inputs")
+    argument_parser.add_argument("--seed", type=int, default=0, help="the seed of the random vectors")
+    argument_parser.add_argument("--gate-level-memory", action="store_true",
+                                 help="simulate RAM parts by their gates instead of as arrays")
+    argument_parser.add_argument("--cache", action="store_true",
+                                 help="cache the netlists on disk until their .hdl files change")
+    arguments = argument_parser.parse_args()
+    failed: bool = False
+    for input_path in arguments.input_paths:
+        start: float = time.perf_counter()
+        netlist: Netlist = load_netlist(input_path, not arguments.gate_level_memory, arguments.cache)
+        elaborated: float = time.perf_counter() - start
+        print(f"{os.path.basename(input_path)}: {len(netlist.gates)} gates, {len(netlist.dffs)} DFFs, "
+              f"{len(netlist.parts)} built-in chips, {netlist.levels} levels, loaded in {elaborated:.2f}s")
+        model = REFERENCE_MODELS.get(netlist.name)
+        if model is None or netlist.dffs or netlist.parts:
+            continue
+        start = time.perf_counter()
+        simulator, mismatches = check_netlist(netlist, model, arguments.vectors, arguments.seed)
+        input_bits: int = sum(len(nets) for nets in netlist.inputs.values())
+        kind: str = "every input" if input_bits <= MAX_EXHAUSTIVE_BITS else "random inputs"
+        print(f"    {simulator.lanes} vectors ({kind}) in {time.perf_counter() - start:.2f}s, "
+              f"{len(mismatches)} mismatches")
+        for mismatch in mismatches[:5]:
+            print(f"    {mismatch}")
+        failed = failed or bool(mismatches)
+    if failed:
+        sys.exit(1)
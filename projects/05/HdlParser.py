@@ -0,0 +1,160 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import re
+import typing
+from re import Pattern
+
+COMMENT_REGEX: Pattern[str] = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+TOKEN_REGEX: Pattern[str] = re.compile(r'\.\.|[A-Za-z_][\w.]*|\d+|[{}()\[\];:,=]')
+
+# (first bit, last bit) of a pin, or None for the whole pin
+BitRange = typing.Optional[tuple[int, int]]
+
+
+class Connection(typing.NamedTuple):
+    """A pin of a part connected to a signal of the chip, part_pin[range] =
+    signal[range]. The signal may also be true or false.
+    """
+    pin: str
+    pin_range: BitRange
+    signal: str
+    signal_range: BitRange
+
+
+class Part(typing.NamedTuple):
+    """A part of a chip, the name of its chip and its connections."""
+    chip: str
+    connections: list[Connection]
+
+
+class ChipDefinition(typing.NamedTuple):
+    """A parsed .hdl file. The inputs and outputs are (name, width) pairs."""
+    name: str
+    inputs: list[tuple[str, int]]
+    outputs: list[tuple[str, int]]
+    parts: list[Part]
+    builtin: typing.Optional[str]
+    clocked: list[str]
+
+
+class HdlParser:
+    """Parses the HDL of a single chip. Reads the whole file, removes its
+    comments, and splits it into tokens.
+    """
+
+    def __init__(self, text: str) -> None:
+        """
+        Args:
+            text (str): the contents of an .hdl file.
+        """
+        self._tokens: list[str] = TOKEN_REGEX.findall(COMMENT_REGEX.sub(" ", text))
+        self._position: int = 0
+
+    def parse(self) -> ChipDefinition:
+        """
+        Returns:
+            ChipDefinition: the chip defined by the file.
+        """
+        self._expect("CHIP")
+        name: str = self._next()
+        self._expect("{")
+        inputs: list[tuple[str, int]] = []
+        outputs: list[tuple[str, int]] = []
+        parts: list[Part] = []
+        builtin: typing.Optional[str] = None
+        clocked: list[str] = []
+        while self._peek() != "}":
+            keyword: str = self._next()
+            if keyword == "IN":
+                inputs += self._pin_declarations()
+            elif keyword == "OUT":
+                outputs += self._pin_declarations()
+            elif keyword == "PARTS":
+                self._expect(":")
+                while self._peek() not in ("}", "BUILTIN", "CLOCKED"):
+                    parts.append(self._part())
+            elif keyword == "BUILTIN":
+                builtin = self._next()
+                self._expect(";")
+            elif keyword == "CLOCKED":
+                clocked = self._names()
+            else:
+                raise ValueError(f"{name}: unexpected {keyword!r}")
+        return ChipDefinition(name, inputs, outputs, parts, builtin, clocked)
+
+    def _peek(self) -> str:
+        if self._position >= len(self._tokens):
+            raise ValueError("Unexpected end of file")
+        return self._tokens[self._position]
+
+    def _next(self) -> str:
+        token: str = self._peek()
+        self._position += 1
+        return token
+
+    def _expect(self, expected: str) -> None:
+        token: str = self._next()
+        if token != expected:
+            raise ValueError(f"Expected {expected!r}, found {token!r}")
+
+    def _names(self) -> list[str]:
+        names: list[str] = [self._next()]
+        while self._next() == ",":
+            names.append(self._next())
+        return names
+
+    def _pin_declarations(self) -> list[tuple[str, int]]:
+        pins: list[tuple[str, int]] = []
+        while True:
+            name: str = self._next()
+            width: int = 1
+            if self._peek() == "[":
+                self._next()
+                width = int(self._next())
+                self._expect("]")
+            pins.append((name, width))
+            if self._next() == ";":
+                return pins
+
+    def _bit_range(self) -> BitRange:
+        if self._peek() != "[":
+            return None
+        self._next()
+        first: int = int(self._next())
+        last: int = first
+        if self._peek() == "..":
+            self._next()
+            last = int(self._next())
+        self._expect("]")
+        return first, last
+
+    def _part(self) -> Part:
+        chip: str = self._next()
+        self._expect("(")
+        connections: list[Connection] = []
+        while True:
+            pin: str = self._next()
+            pin_range: BitRange = self._bit_range()
+            self._expect("=")
+            signal: str = self._next()
+            connections.append(Connection(pin, pin_range, signal, self._bit_range()))
+            if self._next() == ")":
+                break
+        self._expect(";")
+        return Part(chip, connections)
+
+
+def parse_file(path: str) -> ChipDefinition:
+    """
+    Args:
+        path (str): the path of an .hdl file.
+
+    Returns:
+        ChipDefinition: the chip defined by the file.
+    """
+    with open(path, 'r') as input_file:
+        return HdlParser(input_file.read()).parse()
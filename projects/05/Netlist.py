@@ -0,0 +1,606 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import typing
+from BuiltinChips import BUILTIN_CHIPS, BuiltinChip, BuiltinPart, fast_path, memory_array
+from HdlParser import BitRange, ChipDefinition, Connection, parse_file
+
+PROJECTS_DIRECTORY: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The directories of the chips of projects 01-05, searched for the parts
+# that aren't in the directory of the chip itself
+CHIP_DIRECTORIES: list[str] = [os.path.join(PROJECTS_DIRECTORY, *directory.split("/"))
+                               for directory in ("01", "02", "03/a", "03/b", "05")]
+# The nets of the constants true and false
+FALSE_NET: int = 0
+TRUE_NET: int = 1
+# The pins of the primitive chips, which all the others are made of
+PRIMITIVES: dict[str, tuple[list[tuple[str, int]], list[tuple[str, int]]]] = {
+    "Nand": ([("a", 1), ("b", 1)], [("out", 1)]),
+    "DFF": ([("in", 1)], [("out", 1)]),
+}
+# Built-in chips of the CPU that behave exactly like another chip
+ALIASES: dict[str, str] = {"ARegister": "Register", "DRegister": "Register"}
+# The netlists of the chips in a directory are cached in this directory in it
+CACHE_DIRECTORY: str = ".netlist_cache"
+# Changes when the format of the cached netlists does
+CACHE_VERSION: int = 1
+# Where a chip comes from, the kind of chip and the path of its .hdl file
+ChipSource = tuple[str, str]
+
+
+class ChipLibrary:
+    """Finds the .hdl file of every chip, and parses each file once. Like
+    the hardware simulator of the course, a chip is first looked for in the
+    directory of the simulated chip, and then among the built-in chips. The
+    other chips are looked for in a list of directories. With memory_arrays,
+    the parts that are RAM chips, like RAM8 or RAM4K, are modelled as arrays
+    of words instead of their registers, and the parts given as fast_paths,
+    whose gates were verified, are computed by their reference models,
+    though the simulated chip itself always keeps its gates. The source of
+    every chip used is recorded, so a netlist can be cached until one of
+    them changes.
+    """
+
+    def __init__(self, directory: str, search_path: list[str], top: typing.Optional[str] = None,
+                 memory_arrays: bool = True, fast_paths: typing.AbstractSet[str] = frozenset()) -> None:
+        """
+        Args:
+            directory (str): the directory of the simulated chip.
+            search_path (list[str]): the directories to search after it, in
+                order.
+            top (str): the name of the simulated chip.
+            memory_arrays (bool): if this is True, RAM parts are modelled as
+                arrays.
+            fast_paths (AbstractSet[str]): the chips to replace by their
+                reference models.
+        """
+        self.directory: str = directory
+        self.search_path: list[str] = search_path
+        self.top: typing.Optional[str] = top
+        self.memory_arrays: bool = memory_arrays
+        self.fast_paths: typing.AbstractSet[str] = fast_paths
+        self.dependencies: dict[str, ChipSource] = {}
+        self._definitions: dict[str, ChipDefinition] = {}
+
+    def builtin(self, name: str) -> typing.Optional[type[BuiltinChip]]:
+        """
+        Args:
+            name (str): the name of a chip.
+
+        Returns:
+            type[BuiltinChip]: the built-in chip, or None if the chip is
+            simulated by its .hdl file.
+        """
+        if name in BUILTIN_CHIPS and not os.path.isfile(os.path.join(self.directory, name + ".hdl")):
+            return BUILTIN_CHIPS[name]
+        if self.memory_arrays and name != self.top:
+            array_chip = memory_array(name)
+            if array_chip is not None and self._has_path(name) and \
+                    self.pins_of_definition(name) == (array_chip.inputs, array_chip.outputs):
+                return array_chip
+        if name in self.fast_paths and name != self.top:
+            word_chip = fast_path(name)
+            if word_chip is not None and self._has_path(name) and \
+                    self.pins_of_definition(name) == (word_chip.inputs, word_chip.outputs):
+                return word_chip
+        return None
+
+    def source(self, name: str) -> ChipSource:
+        """
+        Args:
+            name (str): the name of a chip.
+
+        Returns:
+            ChipSource: whether the chip is built-in, a memory array, a fast
+            path, a primitive or an .hdl file, and the path of its .hdl file
+            if it has one.
+        """
+        builtin: typing.Optional[type[BuiltinChip]] = self.builtin(name)
+        if builtin is not None:
+            if name in BUILTIN_CHIPS:
+                return "builtin", ""
+            return ("fast" if builtin is fast_path(name) else "memory"), self.path(name)
+        name = ALIASES.get(name, name)
+        if name in PRIMITIVES:
+            return "primitive", ""
+        return "hdl", self.path(name)
+
+    def _has_path(self, name: str) -> bool:
+        try:
+            self.path(name)
+        except ValueError:
+            return False
+        return True
+
+    def pins_of_definition(self, name: str) -> tuple[list[tuple[str, int]], list[tuple[str, int]]]:
+        """
+        Returns:
+            tuple[list, list]: the input and output pins in the .hdl file of
+            a chip.
+        """
+        definition: ChipDefinition = self.definition(name)
+        return definition.inputs, definition.outputs
+
+    def path(self, name: str) -> str:
+        """
+        Args:
+            name (str): the name of a chip.
+
+        Returns:
+            str: the path of its .hdl file.
+        """
+        for directory in [self.directory] + self.search_path:
+            path: str = os.path.join(directory, name + ".hdl")
+            if os.path.isfile(path):
+                return path
+        raise ValueError(f"No .hdl file for the chip {name}")
+
+    def definition(self, name: str) -> ChipDefinition:
+        """
+        Args:
+            name (str): the name of a chip.
+
+        Returns:
+            ChipDefinition: the parsed .hdl file of the chip.
+        """
+        if name not in self._definitions:
+            self._definitions[name] = parse_file(self.path(name))
+        return self._definitions[name]
+
+    def pins(self, name: str) -> tuple[list[tuple[str, int]], list[tuple[str, int]]]:
+        """
+        Args:
+            name (str): the name of a chip.
+
+        Returns:
+            tuple[list, list]: the (name, width) of its input and output pins.
+        """
+        if name not in self.dependencies:
+            self.dependencies[name] = self.source(name)
+        builtin: typing.Optional[type[BuiltinChip]] = self.builtin(name)
+        if builtin is not None:
+            return builtin.inputs, builtin.outputs
+        name = ALIASES.get(name, name)
+        if name in PRIMITIVES:
+            return PRIMITIVES[name]
+        return self.pins_of_definition(name)
+
+
+def library_for(path: str, memory_arrays: bool = True,
+                fast_paths: typing.AbstractSet[str] = frozenset()) -> ChipLibrary:
+    """
+    Args:
+        path (str): the path of an .hdl file.
+        memory_arrays (bool): if this is True, RAM parts are modelled as
+            arrays.
+        fast_paths (AbstractSet[str]): the chips to replace by their
+            reference models.
+
+    Returns:
+        ChipLibrary: searches the directory of the file, the built-in chips,
+        then the directories of projects 01-05.
+    """
+    directory: str = os.path.dirname(os.path.abspath(path))
+    return ChipLibrary(directory, [chip_directory for chip_directory in CHIP_DIRECTORIES
+                                   if chip_directory != directory],
+                       os.path.splitext(os.path.basename(path))[0], memory_arrays, fast_paths)
+
+
+def bit_indices(bit_range: BitRange, width: int) -> range:
+    """
+    Args:
+        bit_range (BitRange): a range of bits of a pin, or None.
+        width (int): the width of the whole pin.
+
+    Returns:
+        range: the indices of the bits.
+    """
+    if bit_range is None:
+        return range(width)
+    return range(bit_range[0], bit_range[1] + 1)
+
+
+class Netlist:
+    """A chip flattened into Nand gates, DFFs and built-in chips. Every bit
+    of every wire is a net, numbered so that nets 0 and 1 are false and
+    true, followed by the inputs of the chip, the outputs of the DFFs, and
+    the outputs of the gates and built-in chips. The gates are sorted by
+    level, so each gate comes after the gates its inputs depend on, and
+    evaluating them in order settles the chip. Each built-in chip is
+    evaluated after the gates before its position.
+    """
+
+    def __init__(self, name: str, net_count: int, inputs: dict[str, list[int]], outputs: dict[str, list[int]],
+                 gates: list[tuple[int, int, int]], dffs: list[tuple[int, int]], levels: int,
+                 parts: typing.Optional[list[BuiltinPart]] = None,
+                 probes: typing.Optional[dict[str, list[int]]] = None) -> None:
+        """
+        Args:
+            name (str): the name of the chip.
+            net_count (int): the number of nets.
+            inputs (dict[str, list[int]]): the nets of each input pin, from
+                bit 0 up.
+            outputs (dict[str, list[int]]): the nets of each output pin.
+            gates (list[tuple[int, int, int]]): the (a, b, out) nets of the
+                Nand gates, in order of evaluation.
+            dffs (list[tuple[int, int]]): the (in, out) nets of the DFFs.
+            levels (int): the number of gates on the longest path.
+            parts (list[BuiltinPart]): the built-in chips, by position.
+            probes (dict[str, list[int]]): the nets of the out pin of the
+                first part of every chip whose outputs are all DFFs, like
+                the registers, so their state can be read and set.
+        """
+        self.name: str = name
+        self.net_count: int = net_count
+        self.inputs: dict[str, list[int]] = inputs
+        self.outputs: dict[str, list[int]] = outputs
+        self.gates: list[tuple[int, int, int]] = gates
+        self.dffs: list[tuple[int, int]] = dffs
+        self.levels: int = levels
+        self.parts: list[BuiltinPart] = parts or []
+        self.probes: dict[str, list[int]] = probes or {}
+
+    def __repr__(self) -> str:
+        return f"<Netlist {self.name}: {len(self.gates)} gates, {len(self.dffs)} DFFs, " \
+               f"{len(self.parts)} built-in chips, {self.levels} levels>"
+
+
+class NetlistBuilder:
+    """Elaborates a chip by instantiating its parts recursively. A wire may
+    be used before the part driving it, so every bit of an output or internal
+    wire starts as a placeholder net, which is later aliased to the net that
+    drives it.
+    """
+
+    def __init__(self, library: ChipLibrary) -> None:
+        """
+        Args:
+            library (ChipLibrary): finds the parts.
+        """
+        self.library: ChipLibrary = library
+        self.net_count: int = 2
+        self.aliases: dict[int, int] = {}
+        # Nets that are driven by something other than an alias
+        self.sources: set[int] = {FALSE_NET, TRUE_NET}
+        self.gates: list[tuple[int, int, int]] = []
+        self.dffs: list[tuple[int, int]] = []
+        # The chip and the nets of the inputs and outputs of the built-in
+        # chips
+        self.parts: list[tuple[str, dict[str, list[int]], dict[str, list[int]]]] = []
+        # The nets of the out pin of the first part of every chip
+        self.probes: dict[str, list[int]] = {}
+
+    def new_net(self) -> int:
+        """
+        Returns:
+            int: a new net.
+        """
+        self.net_count += 1
+        return self.net_count - 1
+
+    def resolve(self, net: int) -> int:
+        """
+        Args:
+            net (int): a net, possibly a placeholder.
+
+        Returns:
+            int: the net that drives it, or false if nothing does.
+        """
+        path: list[int] = []
+        while net in self.aliases:
+            path.append(net)
+            net = self.aliases[net]
+        for alias in path:
+            self.aliases[alias] = net
+        return net if net in self.sources else FALSE_NET
+
+    def instantiate(self, name: str, inputs: dict[str, list[int]]) -> dict[str, list[int]]:
+        """
+        Args:
+            name (str): the name of a chip.
+            inputs (dict[str, list[int]]): the nets of its input pins.
+
+        Returns:
+            dict[str, list[int]]: the nets of its output pins.
+        """
+        builtin: typing.Optional[type[BuiltinChip]] = self.library.builtin(name)
+        if builtin is not None:
+            outputs: dict[str, list[int]] = {pin: [self.new_net() for _ in range(width)]
+                                             for pin, width in builtin.outputs}
+            for nets in outputs.values():
+                self.sources.update(nets)
+            self.parts.append((name, inputs, outputs))
+            return outputs
+        chip_name: str = name
+        name = ALIASES.get(name, name)
+        if name == "Nand":
+            out: int = self.new_net()
+            self.sources.add(out)
+            self.gates.append((inputs["a"][0], inputs["b"][0], out))
+            return {"out": [out]}
+        if name == "DFF":
+            out = self.new_net()
+            self.sources.add(out)
+            self.dffs.append((inputs["in"][0], out))
+            return {"out": [out]}
+        chip: ChipDefinition = self.library.definition(name)
+        if not chip.parts:
+            raise ValueError(f"The chip {name} has no parts")
+        wires: dict[str, list[int]] = dict(inputs)
+        input_names: set[str] = {pin for pin, _ in chip.inputs}
+        for pin, width in chip.outputs:
+            wires[pin] = [self.new_net() for _ in range(width)]
+        for part in chip.parts:
+            part_inputs, part_outputs = self.library.pins(part.chip)
+            part_input_widths: dict[str, int] = dict(part_inputs)
+            part_output_widths: dict[str, int] = dict(part_outputs)
+            nets: dict[str, list[int]] = {pin: [FALSE_NET] * width for pin, width in part_inputs}
+            for connection in part.connections:
+                if connection.pin in part_input_widths:
+                    indices: range = bit_indices(connection.pin_range, part_input_widths[connection.pin])
+                    for index, net in zip(indices, self._read(name, wires, connection, len(indices))):
+                        nets[connection.pin][index] = net
+                elif connection.pin not in part_output_widths:
+                    raise ValueError(f"{name}: the chip {part.chip} has no pin {connection.pin}")
+            outputs = self.instantiate(part.chip, nets)
+            for connection in part.connections:
+                if connection.pin in part_output_widths:
+                    if connection.signal in input_names or connection.signal in ("true", "false"):
+                        raise ValueError(f"{name}: {connection.signal} can't be driven by {part.chip}")
+                    driven: list[int] = [outputs[connection.pin][index] for index in
+                                         bit_indices(connection.pin_range, part_output_widths[connection.pin])]
+                    for placeholder, net in zip(self._write(wires, connection, len(driven)), driven):
+                        if placeholder in self.aliases:
+                            raise ValueError(f"{name}: {connection.signal} has more than one driver")
+                        self.aliases[placeholder] = net
+        if "out" in wires:
+            self.probes.setdefault(chip_name, wires["out"])
+        return {pin: wires[pin] for pin, _ in chip.outputs}
+
+    def _read(self, name: str, wires: dict[str, list[int]], connection: Connection, width: int) -> list[int]:
+        # The nets of the signal of a connection to an input of a part
+        if connection.signal == "true":
+            return [TRUE_NET] * width
+        if connection.signal == "false":
+            return [FALSE_NET] * width
+        if connection.signal_range is None and connection.signal in wires and \
+                len(wires[connection.signal]) != width:
+            raise ValueError(f"{name}: {connection.signal} has {len(wires[connection.signal])} bits, "
+                             f"{connection.pin} has {width}")
+        return self._write(wires, connection, width)
+
+    def _write(self, wires: dict[str, list[int]], connection: Connection, width: int) -> list[int]:
+        # The nets of the bits of a signal, creating the missing bits of an
+        # internal wire as placeholders
+        nets: list[int] = wires.setdefault(connection.signal, [])
+        indices: range = bit_indices(connection.signal_range, width)
+        while len(nets) < indices.stop:
+            nets.append(self.new_net())
+        return [nets[index] for index in indices]
+
+
+def levelize(nodes: list[tuple[typing.Sequence[int], typing.Sequence[int]]],
+             sources: typing.Iterable[int]) -> tuple[list[list[int]], int]:
+    """Sorts the nodes of a netlist, its gates and built-in chips, by the
+    length of the longest path from a source to each of them.
+
+    Args:
+        nodes (list[tuple[Sequence[int], Sequence[int]]]): the input and
+            output nets of every node.
+        sources (Iterable[int]): the nets that aren't driven by nodes.
+
+    Returns:
+        tuple[list[list[int]], int]: the indices of the nodes of each level,
+        and the number of levels.
+    """
+    net_levels: dict[int, int] = dict.fromkeys(sources, 0)
+    drivers: dict[int, int] = {out: index for index, (_, outs) in enumerate(nodes) for out in outs}
+    done: set[int] = set()
+    levels: list[list[int]] = []
+    for index in range(len(nodes)):
+        # Finds the levels of the inputs first, without recursion
+        stack: list[int] = [index]
+        visiting: set[int] = set()
+        while stack:
+            node: int = stack[-1]
+            if node in done:
+                stack.pop()
+                continue
+            node_inputs, node_outputs = nodes[node]
+            pending: list[int] = [drivers[net] for net in node_inputs if net not in net_levels]
+            if not pending:
+                level: int = max((net_levels[net] for net in node_inputs), default=0) + 1
+                net_levels.update(dict.fromkeys(node_outputs, level))
+                if len(levels) < level:
+                    levels.append([])
+                levels[level - 1].append(node)
+                done.add(node)
+                visiting.discard(node)
+                stack.pop()
+            elif node in visiting:
+                raise ValueError(f"Combinational loop through net {node_outputs[0]}")
+            else:
+                visiting.add(node)
+                stack += pending
+    return levels, len(levels)
+
+
+def build_netlist(name: str, library: ChipLibrary) -> Netlist:
+    """Flattens a chip into a netlist, keeping only the gates that affect its
+    outputs, its DFFs or its built-in chips, and numbers its nets in order
+    of evaluation.
+
+    Args:
+        name (str): the name of the chip.
+        library (ChipLibrary): finds the chip and its parts.
+
+    Returns:
+        Netlist: the flattened chip.
+    """
+    builder: NetlistBuilder = NetlistBuilder(library)
+    chip_inputs, _ = library.pins(name)
+    inputs: dict[str, list[int]] = {pin: [builder.new_net() for _ in range(width)] for pin, width in chip_inputs}
+    for nets in inputs.values():
+        builder.sources.update(nets)
+    outputs: dict[str, list[int]] = {pin: [builder.resolve(net) for net in nets] for pin, nets in
+                                     builder.instantiate(name, inputs).items()}
+    gates: list[tuple[int, int, int]] = [(builder.resolve(a), builder.resolve(b), out) for a, b, out in builder.gates]
+    dffs: list[tuple[int, int]] = [(builder.resolve(net), out) for net, out in builder.dffs]
+    parts: list[tuple[str, dict[str, list[int]], dict[str, list[int]]]] = [
+        (chip, {pin: [builder.resolve(net) for net in nets] for pin, nets in part_inputs.items()}, part_outputs)
+        for chip, part_inputs, part_outputs in builder.parts]
+    # Removes the gates whose outputs are never used
+    gate_drivers: dict[int, tuple[int, int, int]] = {gate[2]: gate for gate in gates}
+    live: set[int] = set()
+    pending: list[int] = [net for nets in outputs.values() for net in nets] + [net for net, _ in dffs] + \
+        [net for _, part_inputs, _ in parts for nets in part_inputs.values() for net in nets]
+    while pending:
+        net: int = pending.pop()
+        if net not in live:
+            live.add(net)
+            if net in gate_drivers:
+                pending += gate_drivers[net][:2]
+    gates = [gate for gate in gates if gate[2] in live]
+    # A built-in chip depends on its combinational inputs, and each of its
+    # outputs is a node after the gates
+    nodes: list[tuple[typing.Sequence[int], typing.Sequence[int]]] = [((a, b), (out,)) for a, b, out in gates]
+    for chip, part_inputs, part_outputs in parts:
+        nodes.append(([net for pin in library.builtin(chip).combinational for net in part_inputs[pin]],
+                      [net for nets in part_outputs.values() for net in nets]))
+    input_nets: list[int] = [net for nets in inputs.values() for net in nets]
+    dff_nets: list[int] = [out for _, out in dffs]
+    levels, level_count = levelize(nodes, [FALSE_NET, TRUE_NET] + input_nets + dff_nets)
+    numbers: dict[int, int] = {FALSE_NET: FALSE_NET, TRUE_NET: TRUE_NET}
+    for net in input_nets + dff_nets:
+        numbers[net] = len(numbers)
+    order: list[int] = [node for level in levels for node in level]
+    for node in order:
+        for net in nodes[node][1]:
+            numbers[net] = len(numbers)
+    ordered: list[tuple[int, int, int]] = []
+    builtin_parts: list[BuiltinPart] = []
+    for node in order:
+        if node < len(gates):
+            a, b, out = gates[node]
+            ordered.append((numbers[a], numbers[b], numbers[out]))
+        else:
+            chip, part_inputs, part_outputs = parts[node - len(gates)]
+            builtin_parts.append(BuiltinPart(
+                chip, {pin: [numbers[net] for net in nets] for pin, nets in part_inputs.items()},
+                {pin: [numbers[net] for net in nets] for pin, nets in part_outputs.items()}, len(ordered)))
+    # Only the state of chips made of DFFs can be read and set
+    dff_set: set[int] = set(dff_nets)
+    probes: dict[str, list[int]] = {chip: [numbers[builder.resolve(net)] for net in nets]
+                                    for chip, nets in builder.probes.items()
+                                    if all(builder.resolve(net) in dff_set for net in nets)}
+    return Netlist(name, len(numbers),
+                   {pin: [numbers[net] for net in nets] for pin, nets in inputs.items()},
+                   {pin: [numbers[net] for net in nets] for pin, nets in outputs.items()},
+                   ordered, [(numbers[net], numbers[out]) for net, out in dffs], level_count,
+                   builtin_parts, probes)
+
+
+def file_hash(path: str) -> str:
+    """
+    Returns:
+        str: the sha256 of the contents of a file.
+    """
+    with open(path, 'rb') as input_file:
+        return hashlib.sha256(input_file.read()).hexdigest()
+
+
+def cache_path(path: str, memory_arrays: bool, fast_paths: bool = False) -> str:
+    """
+    Args:
+        path (str): the path of an .hdl file.
+        memory_arrays (bool): whether RAM parts are modelled as arrays.
+        fast_paths (bool): whether some parts are replaced by their
+            reference models.
+
+    Returns:
+        str: the path of the cached netlist of the chip.
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    suffix: str = ("arrays" if memory_arrays else "gates") + (".fast" if fast_paths else "")
+    return os.path.join(directory, CACHE_DIRECTORY, f"{os.path.splitext(filename)[0]}.{suffix}.pickle")
+
+
+def read_cached_netlist(path: str, library: ChipLibrary) -> typing.Optional[Netlist]:
+    """A cached netlist is used only if every chip it was made of still comes
+    from the same place, and its .hdl file has the same hash.
+
+    Args:
+        path (str): the path of the cached netlist.
+        library (ChipLibrary): finds the chips.
+
+    Returns:
+        Netlist: the cached netlist, or None if it's missing or stale.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as cache_file:
+            version, dependencies = pickle.load(cache_file)
+            if version != CACHE_VERSION:
+                return None
+            for chip, (kind, chip_path, digest) in dependencies.items():
+                if library.source(chip) != (kind, chip_path) or (chip_path and file_hash(chip_path) != digest):
+                    return None
+            # The netlist comes after the dependencies, so it's only loaded
+            # when they're unchanged
+            return pickle.load(cache_file)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+
+
+def write_cached_netlist(path: str, netlist: Netlist, library: ChipLibrary) -> None:
+    """
+    Args:
+        path (str): the path of the cached netlist.
+        netlist (Netlist): the netlist to cache.
+        library (ChipLibrary): the library it was built with.
+    """
+    dependencies: dict[str, tuple[str, str, str]] = {
+        chip: (kind, chip_path, file_hash(chip_path) if chip_path else "")
+        for chip, (kind, chip_path) in library.dependencies.items()}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Written to a temporary file first, since other processes may read it
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(descriptor, 'wb') as cache_file:
+        pickle.dump((CACHE_VERSION, dependencies), cache_file, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(netlist, cache_file, pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_path, path)
+
+
+def load_netlist(path: str, memory_arrays: bool = True, use_cache: bool = False,
+                 fast_paths: typing.AbstractSet[str] = frozenset()) -> Netlist:
+    """
+    Args:
+        path (str): the path of an .hdl file.
+        memory_arrays (bool): if this is True, RAM parts are modelled as
+            arrays.
+        use_cache (bool): if this is True, the netlist is read from the
+            cache when its chips didn't change, and written to it otherwise.
+        fast_paths (AbstractSet[str]): the chips to replace by their
+            reference models.
+
+    Returns:
+        Netlist: the flattened chip.
+    """
+    library: ChipLibrary = library_for(path, memory_arrays, fast_paths)
+    if use_cache:
+        cached: typing.Optional[Netlist] = read_cached_netlist(cache_path(path, memory_arrays, bool(fast_paths)),
+                                                               library)
+        if cached is not None:
+            return cached
+    netlist: Netlist = build_netlist(parse_file(path).name, library)
+    if use_cache:
+        write_cached_netlist(cache_path(path, memory_arrays, bool(fast_paths)), netlist, library)
+    return netlist
@@ -0,0 +1,78 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+WORD_MASK: int = 0xFFFF
+
+
+def alu(x: int, y: int, zx: int, nx: int, zy: int, ny: int, f: int, no: int) -> dict[str, int]:
+    """
+    Returns:
+        dict[str, int]: the outputs of the ALU.
+    """
+    x = 0 if zx else x
+    x = x ^ WORD_MASK if nx else x
+    y = 0 if zy else y
+    y = y ^ WORD_MASK if ny else y
+    out: int = (x + y) & WORD_MASK if f else x & y
+    out = out ^ WORD_MASK if no else out
+    return {"out": out, "zr": int(out == 0), "ng": out >> 15}
+
+
+def shift_right(value: int) -> int:
+    """
+    Returns:
+        int: the value shifted right by one bit, keeping its sign.
+    """
+    return (value >> 1) | (value & 0x8000)
+
+
+def extend_alu(x: int, y: int, instruction: int) -> typing.Optional[dict[str, int]]:
+    """
+    Returns:
+        dict[str, int]: the outputs of the extended ALU, or None if they're
+        undefined.
+    """
+    if not instruction >> 7 & 1:
+        return None
+    if instruction >> 8 & 1:
+        return alu(x, y, *(instruction >> bit & 1 for bit in range(5, -1, -1)))
+    shifted: int = x if instruction >> 4 & 1 else y
+    shifted = (shifted << 1) & WORD_MASK if instruction >> 5 & 1 else shift_right(shifted)
+    return {"out": shifted, "zr": int(shifted == 0), "ng": shifted >> 15}
+
+
+# Python models of the combinational chips, taking the values of the input
+# pins and returning the values of the output pins, or None for inputs the
+# chip leaves undefined
+REFERENCE_MODELS: dict[str, typing.Callable[..., typing.Optional[dict[str, int]]]] = {
+    "Not": lambda **pins: {"out": pins["in"] ^ 1},
+    "And": lambda a, b: {"out": a & b},
+    "Or": lambda a, b: {"out": a | b},
+    "Xor": lambda a, b: {"out": a ^ b},
+    "Mux": lambda a, b, sel: {"out": b if sel else a},
+    "DMux": lambda sel, **pins: {"a": 0 if sel else pins["in"], "b": pins["in"] if sel else 0},
+    "Not16": lambda **pins: {"out": pins["in"] ^ WORD_MASK},
+    "And16": lambda a, b: {"out": a & b},
+    "Or16": lambda a, b: {"out": a | b},
+    "Mux16": lambda a, b, sel: {"out": b if sel else a},
+    "Or8Way": lambda **pins: {"out": int(pins["in"] != 0)},
+    "Mux4Way16": lambda a, b, c, d, sel: {"out": (a, b, c, d)[sel]},
+    "Mux8Way16": lambda a, b, c, d, e, f, g, h, sel: {"out": (a, b, c, d, e, f, g, h)[sel]},
+    "DMux4Way": lambda sel, **pins: {name: pins["in"] if sel == index else 0
+                                     for index, name in enumerate("abcd")},
+    "DMux8Way": lambda sel, **pins: {name: pins["in"] if sel == index else 0
+                                     for index, name in enumerate("abcdefgh")},
+    "HalfAdder": lambda a, b: {"sum": a ^ b, "carry": a & b},
+    "FullAdder": lambda a, b, c: {"sum": a ^ b ^ c, "carry": int(a + b + c > 1)},
+    "Add16": lambda a, b: {"out": (a + b) & WORD_MASK},
+    "Inc16": lambda **pins: {"out": (pins["in"] + 1) & WORD_MASK},
+    "ShiftLeft": lambda **pins: {"out": (pins["in"] << 1) & WORD_MASK},
+    "ShiftRight": lambda **pins: {"out": shift_right(pins["in"])},
+    "ALU": alu,
+    "ExtendAlu": extend_alu,
+}
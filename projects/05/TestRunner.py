@@ -0,0 +1,568 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import concurrent.futures
+import itertools
+import os
+import re
+import sys
+import time
+import typing
+from re import Pattern
+from BuiltinChips import WordChip, fast_path
+from EventDrivenSimulator import EventDrivenSimulator
+from HardwareSimulator import HardwareSimulator, check_netlist
+from Netlist import ALIASES, PRIMITIVES, ChipLibrary, Netlist, library_for, load_netlist
+from ReferenceModels import REFERENCE_MODELS
+
+COMMENT_REGEX: Pattern[str] = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+TOKEN_REGEX: Pattern[str] = re.compile(r'"[^"]*"|[{},;]|[^\s{},;]+')
+# A column of the output list, like x%B1.16.1 or RAM16K[0]%D1.7.1
+COLUMN_REGEX: Pattern[str] = re.compile(r'^([\w.]+)(?:\[(\d*)\])?%([BDXS])(\d+)\.(\d+)\.(\d+)$')
+# The number of times a while loop may run before the script is stopped,
+# since its condition may wait for a key that nobody presses
+MAX_LOOP_ITERATIONS: int = 1000
+CONDITIONS: dict[str, typing.Callable[[int, int], bool]] = {
+    "=": lambda a, b: a == b, "<>": lambda a, b: a != b, "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b, "<=": lambda a, b: a <= b, ">=": lambda a, b: a >= b}
+
+# The number of random inputs the gates of a chip with many input bits are
+# checked on before the chip is replaced by its fast path
+VERIFICATION_VECTORS: int = 1 << 12
+
+# The netlists of the chips loaded in this process, by path, by whether RAM
+# parts are modelled as arrays and by the parts replaced by fast paths
+NETLIST_CACHE: dict[tuple[str, bool, frozenset[str]], Netlist] = {}
+# Whether the gates of each chip were verified, by the path of its .hdl file
+VERIFIED_CHIPS: dict[str, bool] = {}
+
+
+class ScriptError(Exception):
+    """An error in a test script, or a line of output that doesn't match
+    the compare file.
+    """
+
+
+class Command(typing.NamedTuple):
+    """A command of a test script, and the commands in its braces if it's a
+    repeat or a while loop.
+    """
+    words: list[str]
+    body: typing.Optional[list["Command"]]
+
+
+class Column(typing.NamedTuple):
+    """A column of the output list, the value of a pin or of the state of a
+    part, formatted as binary, decimal, hexadecimal or a string, and padded.
+    """
+    name: str
+    index: typing.Optional[str]
+    format: str
+    left: int
+    width: int
+    right: int
+
+
+class RunOptions(typing.NamedTuple):
+    """How test scripts are run. The keys are held down on the keyboard, one
+    for every while loop of a script, from the start of the loop until the
+    next one. With memory_arrays, RAM parts are modelled as arrays, with
+    use_cache netlists are cached on disk, with event_driven only the gates
+    whose inputs changed are evaluated, and with fast_paths the parts whose
+    gates were verified are computed by their reference models. If
+    verified_chips is given, it holds the paths of the chips whose gates
+    were already verified, and no other chip is verified again.
+    """
+    keys: tuple[int, ...] = ()
+    write_output: bool = False
+    memory_arrays: bool = True
+    use_cache: bool = False
+    event_driven: bool = False
+    fast_paths: bool = True
+    verified_chips: typing.Optional[frozenset[str]] = None
+
+
+class ScriptResult(typing.NamedTuple):
+    """The outcome of running a test script."""
+    path: str
+    passed: bool
+    message: str
+    seconds: float
+
+
+def cached_netlist(path: str, memory_arrays: bool = True, use_cache: bool = False,
+                   fast_paths: frozenset[str] = frozenset()) -> Netlist:
+    """
+    Args:
+        path (str): the path of an .hdl file.
+        memory_arrays (bool): if this is True, RAM parts are modelled as
+            arrays.
+        use_cache (bool): if this is True, the netlist is also cached on
+            disk, see load_netlist.
+        fast_paths (frozenset[str]): the chips to replace by their reference
+            models.
+
+    Returns:
+        Netlist: the flattened chip, elaborated once per process.
+    """
+    key: tuple[str, bool, frozenset[str]] = (os.path.abspath(path), memory_arrays, fast_paths)
+    if key not in NETLIST_CACHE:
+        NETLIST_CACHE[key] = load_netlist(key[0], memory_arrays, use_cache, fast_paths)
+    return NETLIST_CACHE[key]
+
+
+def parse_commands(tokens: list[str], position: int = 0) -> tuple[list[Command], int]:
+    """Parses the commands of a script up to the closing brace of a block.
+
+    Args:
+        tokens (list[str]): the tokens of the script.
+        position (int): the index of the first token of the block.
+
+    Returns:
+        tuple[list[Command], int]: the commands of the block, and the index
+        of the token after it.
+    """
+    commands: list[Command] = []
+    words: list[str] = []
+    while position < len(tokens):
+        token: str = tokens[position]
+        position += 1
+        if token == "{":
+            body, position = parse_commands(tokens, position)
+            commands.append(Command(words, body))
+            words = []
+        elif token in (",", ";", "}"):
+            if words:
+                commands.append(Command(words, None))
+            words = []
+            if token == "}":
+                return commands, position
+        else:
+            words.append(token)
+    if words:
+        commands.append(Command(words, None))
+    return commands, position
+
+
+def parse_value(text: str) -> int:
+    """
+    Args:
+        text (str): a number, decimal or prefixed by %B, %X or %D.
+
+    Returns:
+        int: its value.
+    """
+    if text[:2].upper() == "%B":
+        return int(text[2:], 2)
+    if text[:2].upper() == "%X":
+        return int(text[2:], 16)
+    if text[:2].upper() == "%D":
+        return int(text[2:])
+    return int(text)
+
+
+def parse_column(text: str) -> Column:
+    """
+    Args:
+        text (str): a column of the output list, like out%B1.16.1.
+
+    Returns:
+        Column: the parsed column.
+    """
+    match: typing.Optional[re.Match[str]] = COLUMN_REGEX.match(text)
+    if match is None:
+        raise ScriptError(f"Bad output column {text}")
+    name, index, value_format, left, width, right = match.groups()
+    return Column(name, index, value_format, int(left), int(width), int(right))
+
+
+def script_chip(path: str) -> str:
+    """
+    Args:
+        path (str): the path of a test script.
+
+    Returns:
+        str: the path of the .hdl file the script loads.
+    """
+    with open(path, 'r') as script_file:
+        match: typing.Optional[re.Match[str]] = re.search(
+            r'\bload\s+([\w.-]+\.hdl)', COMMENT_REGEX.sub(" ", script_file.read()))
+    if match is None:
+        raise ScriptError(f"{path} doesn't load a chip")
+    return os.path.join(os.path.dirname(os.path.abspath(path)), match.group(1))
+
+
+class TestScript:
+    """Runs a .tst script on a HardwareSimulator, and compares every line it
+    outputs with the .cmp file of the script, where a * matches any
+    character.
+    """
+
+    def __init__(self, path: str, options: RunOptions = RunOptions()) -> None:
+        """
+        Args:
+            path (str): the path of the .tst file.
+            options (RunOptions): how to run the script.
+        """
+        self.path: str = os.path.abspath(path)
+        self.directory: str = os.path.dirname(self.path)
+        self.options: RunOptions = options
+        self.keys: list[int] = list(options.keys)
+        self.simulator: typing.Optional[HardwareSimulator] = None
+        self.fast_paths: frozenset[str] = frozenset()
+        self.columns: list[Column] = []
+        self.output_lines: list[str] = []
+        self.compare_lines: typing.Optional[list[str]] = None
+        self.output_file: typing.Optional[str] = None
+        self.time: int = 0
+        self.ticked: bool = False
+        with open(self.path, 'r') as script_file:
+            tokens: list[str] = TOKEN_REGEX.findall(COMMENT_REGEX.sub(" ", script_file.read()))
+        self.commands: list[Command] = parse_commands(tokens)[0]
+
+    def run(self) -> None:
+        """Runs the script. Raises ScriptError on the first line of output
+        that doesn't match the compare file.
+        """
+        self._run_block(self.commands)
+        if self.compare_lines is not None and len(self.compare_lines) > len(self.output_lines):
+            raise ScriptError(f"Expected {len(self.compare_lines)} lines, output {len(self.output_lines)}")
+
+    def write_output(self) -> None:
+        """Writes the lines output so far to the output file of the script."""
+        if self.output_file is not None:
+            with open(os.path.join(self.directory, self.output_file), 'w') as output_file:
+                output_file.writelines(line + "\n" for line in self.output_lines)
+
+    def _run_block(self, commands: list[Command]) -> None:
+        for command in commands:
+            if command.body is None:
+                self._run_command(command.words)
+            elif command.words[0] == "repeat":
+                count: int = int(command.words[1]) if len(command.words) > 1 else MAX_LOOP_ITERATIONS
+                for _ in range(count):
+                    self._run_block(command.body)
+            elif command.words[0] == "while":
+                self._run_while(command.words[1:], command.body)
+            else:
+                raise ScriptError(f"Unknown block {' '.join(command.words)}")
+
+    def _run_while(self, condition: list[str], body: list[Command]) -> None:
+        if len(condition) != 3 or condition[1] not in CONDITIONS:
+            raise ScriptError(f"Bad condition {' '.join(condition)}")
+        if self.keys:
+            key: int = self.keys.pop(0)
+            if any(part.part.chip == "Keyboard" for part in self._simulator().parts):
+                self._simulator().write_state("Keyboard", None, key)
+        compare: typing.Callable[[int, int], bool] = CONDITIONS[condition[1]]
+        expected: int = parse_value(condition[2])
+        for _ in range(MAX_LOOP_ITERATIONS):
+            if not compare(self._signed_value(condition[0], None), expected):
+                return
+            self._run_block(body)
+        raise ScriptError(f"while {' '.join(condition)} didn't end after {MAX_LOOP_ITERATIONS} iterations, "
+                          f"the script may be waiting for a key")
+
+    def _simulator(self) -> HardwareSimulator:
+        if self.simulator is None:
+            raise ScriptError("No chip was loaded")
+        return self.simulator
+
+    def _run_command(self, words: list[str]) -> None:
+        name: str = words[0]
+        if name == "load":
+            path: str = os.path.join(self.directory, words[1])
+            if self.options.fast_paths:
+                self.fast_paths = verified_fast_paths(path, self.options)
+            simulator_class: type[HardwareSimulator] = \
+                EventDrivenSimulator if self.options.event_driven else HardwareSimulator
+            self.simulator = simulator_class(cached_netlist(path, self.options.memory_arrays, self.options.use_cache,
+                                                            self.fast_paths))
+        elif name == "output-file":
+            self.output_file = words[1]
+        elif name == "compare-to":
+            with open(os.path.join(self.directory, words[1]), 'r') as compare_file:
+                self.compare_lines = [line.rstrip() for line in compare_file if line.strip()]
+        elif name == "output-list":
+            self.columns = [parse_column(word) for word in words[1:]]
+            self._output("|" + "|".join(self._header(column) for column in self.columns) + "|")
+        elif name == "set":
+            self._set(words[1], parse_value(words[2]))
+        elif name == "eval":
+            self._simulator().evaluate()
+        elif name == "tick":
+            self._simulator().tick()
+            self.ticked = True
+        elif name == "tock":
+            self._simulator().tock()
+            self.time += 1
+            self.ticked = False
+        elif name == "output":
+            self._output("|" + "|".join(self._cell(column) for column in self.columns) + "|")
+        elif name in ("echo", "clear-echo"):
+            pass
+        elif len(words) == 3 and words[1] == "load":
+            self._simulator().load(name, os.path.join(self.directory, words[2]))
+        else:
+            raise ScriptError(f"Unknown command {' '.join(words)}")
+
+    def _set(self, target: str, value: int) -> None:
+        simulator: HardwareSimulator = self._simulator()
+        match: typing.Optional[re.Match[str]] = re.match(r'^(\w+)\[(\d*)\]$', target)
+        if match is not None:
+            try:
+                simulator.write_state(match.group(1), int(match.group(2)) if match.group(2) else None, value)
+            except IndexError:
+                raise ScriptError(f"{target} is out of range") from None
+        elif target in simulator.netlist.inputs:
+            simulator.set_input(target, value & ((1 << len(simulator.netlist.inputs[target])) - 1))
+        else:
+            raise ScriptError(f"{simulator.netlist.name} has no input {target}")
+
+    def _value(self, name: str, index: typing.Optional[str]) -> tuple[int, int]:
+        # The unsigned value of a pin or a state, and its width
+        simulator: HardwareSimulator = self._simulator()
+        if index is not None:
+            try:
+                return simulator.read_state(name, int(index) if index else None), 16
+            except IndexError:
+                raise ScriptError(f"{name}[{index}] is out of range") from None
+        if name in simulator.netlist.outputs or name in simulator.netlist.inputs:
+            lanes: list[int] = simulator.get_lanes(name)
+            return sum((bit & 1) << position for position, bit in enumerate(lanes)), len(lanes)
+        match: typing.Optional[re.Match[str]] = re.match(r'^(\w+)\[(\d*)\]$', name)
+        if match is not None:
+            return self._value(match.group(1), match.group(2))
+        raise ScriptError(f"{simulator.netlist.name} has no pin {name}")
+
+    def _signed_value(self, name: str, index: typing.Optional[str]) -> int:
+        value, width = self._value(name, index)
+        return value - (1 << width) if width == 16 and value >> 15 else value
+
+    def _header(self, column: Column) -> str:
+        total: int = column.left + column.width + column.right
+        name: str = column.name + (f"[{column.index}]" if column.index is not None else "")
+        name = name[:total]
+        return " " * ((total - len(name)) // 2) + name + " " * (total - len(name) - (total - len(name)) // 2)
+
+    def _cell(self, column: Column) -> str:
+        if column.name == "time" and column.index is None:
+            text: str = (str(self.time) + ("+" if self.ticked else "")).ljust(column.width)
+        else:
+            value, width = self._value(column.name, column.index)
+            if column.format == "B":
+                text = format(value, f"0{width}b")[-column.width:].rjust(column.width, "0")
+            elif column.format == "X":
+                text = format(value, f"0{column.width}X")[-column.width:]
+            elif column.format == "D":
+                text = str(self._signed_value(column.name, column.index)).rjust(column.width)
+            else:
+                text = str(value).ljust(column.width)
+        return " " * column.left + text + " " * column.right
+
+    def _output(self, line: str) -> None:
+        if self.compare_lines is not None:
+            line_number: int = len(self.output_lines)
+            if line_number >= len(self.compare_lines):
+                raise ScriptError(f"Output line {line_number + 1} isn't in the compare file: {line}")
+            expected: str = self.compare_lines[line_number]
+            if len(expected) != len(line.rstrip()) or \
+                    any(wanted not in ("*", actual) for wanted, actual in zip(expected, line)):
+                self.output_lines.append(line)
+                raise ScriptError(f"Comparison failure at line {line_number + 1}:\n"
+                                  f"    expected {expected}\n    output   {line}")
+        self.output_lines.append(line)
+
+
+def run_script(path: str, options: RunOptions = RunOptions()) -> ScriptResult:
+    """
+    Args:
+        path (str): the path of a test script.
+        options (RunOptions): how to run the script.
+
+    Returns:
+        ScriptResult: whether the script passed, and how long it took.
+    """
+    start: float = time.perf_counter()
+    script: typing.Optional[TestScript] = None
+    try:
+        script = TestScript(path, options)
+        script.run()
+        message: str = f"{len(script.output_lines)} lines"
+        if script.fast_paths:
+            message += f", fast paths {', '.join(sorted(script.fast_paths))}"
+        result: ScriptResult = ScriptResult(path, True, message, time.perf_counter() - start)
+    except (ScriptError, ValueError, IndexError, KeyError, OSError) as error:
+        # A failing script must not abort the other scripts of the run
+        result = ScriptResult(path, False, str(error), time.perf_counter() - start)
+    if options.write_output and script is not None:
+        script.write_output()
+    return result
+
+
+def verify_chip(path: str, options: RunOptions) -> bool:
+    """A chip is verified when its own test script passes with every part
+    simulated by its gates, and its gates match its reference model on
+    every input, or on random inputs if it has too many input bits.
+
+    Args:
+        path (str): the path of the .hdl file of a chip with a reference
+            model.
+        options (RunOptions): how the netlists are loaded.
+
+    Returns:
+        bool: whether the chip was verified, checked once per process.
+    """
+    if options.verified_chips is not None:
+        return path in options.verified_chips
+    if path not in VERIFIED_CHIPS:
+        script: str = os.path.splitext(path)[0] + ".tst"
+        gate_level: RunOptions = RunOptions(memory_arrays=options.memory_arrays, use_cache=options.use_cache,
+                                            fast_paths=False)
+        verified: bool = os.path.isfile(script) and os.path.isfile(os.path.splitext(path)[0] + ".cmp") and \
+            script_chip(script) == path and run_script(script, gate_level).passed
+        if verified:
+            netlist: Netlist = cached_netlist(path, options.memory_arrays, options.use_cache)
+            verified = not check_netlist(netlist, REFERENCE_MODELS[netlist.name], VERIFICATION_VECTORS)[1]
+        VERIFIED_CHIPS[path] = verified
+    return VERIFIED_CHIPS[path]
+
+
+def verified_fast_paths(path: str, options: RunOptions) -> frozenset[str]:
+    """Finds the parts of a chip, at any depth, that have fast paths and
+    were verified. The parts of a verified part aren't checked, since it's
+    replaced as a whole.
+
+    Args:
+        path (str): the path of an .hdl file.
+        options (RunOptions): how the netlists are loaded.
+
+    Returns:
+        frozenset[str]: the names of the parts to replace by fast paths.
+    """
+    library: ChipLibrary = library_for(path, options.memory_arrays)
+    verified: set[str] = set()
+    seen: set[str] = set()
+    pending: list[str] = [os.path.splitext(os.path.basename(path))[0]]
+    while pending:
+        for part in library.definition(pending.pop()).parts:
+            name: str = ALIASES.get(part.chip, part.chip)
+            if name in seen or name in PRIMITIVES or library.builtin(name) is not None:
+                continue
+            seen.add(name)
+            word_chip: typing.Optional[type[WordChip]] = fast_path(name)
+            if word_chip is not None and library.pins_of_definition(name) == (word_chip.inputs, word_chip.outputs) \
+                    and verify_chip(library.path(name), options):
+                verified.add(name)
+            else:
+                pending.append(name)
+    return frozenset(verified)
+
+
+def run_scripts_of_chip(paths: list[str], options: RunOptions) -> list[ScriptResult]:
+    """Runs the scripts that load the same chip in one process, so the chip
+    is elaborated once.
+
+    Returns:
+        list[ScriptResult]: the result of each script.
+    """
+    return [run_script(path, options) for path in paths]
+
+
+def run_scripts(paths: list[str], options: RunOptions = RunOptions(), jobs: int = 1) -> list[ScriptResult]:
+    """Runs many test scripts, in parallel if jobs is more than 1. The
+    scripts are grouped by the chip they load, and each group runs in one
+    process.
+
+    Args:
+        paths (list[str]): the paths of the test scripts.
+        options (RunOptions): how to run the scripts.
+        jobs (int): the number of processes to run the scripts in.
+
+    Returns:
+        list[ScriptResult]: the result of each script, in the given order.
+    """
+    groups: dict[str, list[str]] = {}
+    for path in paths:
+        try:
+            chip: str = script_chip(path)
+        except (ScriptError, OSError):
+            chip = path
+        groups.setdefault(chip, []).append(path)
+    if jobs > 1 and len(groups) > 1:
+        if options.fast_paths and options.verified_chips is None:
+            # Verifies the parts once here, instead of once in every process
+            for chip in groups:
+                try:
+                    verified_fast_paths(chip, options)
+                except (ValueError, OSError):
+                    pass  # The script reports the error
+            verified_chips: frozenset[str] = frozenset(path for path, verified in VERIFIED_CHIPS.items() if verified)
+            options = options._replace(verified_chips=verified_chips)
+        # The largest chips first, so they don't run last
+        ordered: list[list[str]] = sorted(groups.values(), key=len, reverse=True)
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            group_results: list[list[ScriptResult]] = list(executor.map(
+                run_scripts_of_chip, ordered, itertools.repeat(options)))
+    else:
+        group_results = [run_scripts_of_chip(group, options) for group in groups.values()]
+    results: dict[str, ScriptResult] = {result.path: result for group in group_results for result in group}
+    return [results[path] for path in paths]
+
+
+if "__main__" == __name__:
+    # Runs the .tst scripts in the input paths and compares their output with
+    # their .cmp files, for example the whole hardware of projects 01-05 with
+    # python TestRunner.py ../01 ../02 . --keys 75 89 --jobs 4
+    # Parts that aren't in the directory of a chip are taken from the
+    # built-in chips or from projects 01-05. Memory.tst waits for the keys K
+    # and Y, which are pressed by --keys 75 89.
+    # RAM parts are modelled as arrays unless --gate-level-memory is given,
+    # and with --cache netlists are cached on disk until their chips change.
+    # With --event-driven, only the gates whose inputs changed are evaluated.
+    # Parts like the ALU are computed by their reference models once their
+    # own scripts pass and their gates match the models, unless --gate-level
+    # is given, which also simulates RAM parts by their gates.
+    argument_parser = argparse.ArgumentParser(prog="TestRunner")
+    argument_parser.add_argument("input_paths", nargs="+", metavar="input_path",
+                                 help="a .tst file or a directory of .tst files")
+    argument_parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                                 help="run the scripts in N processes")
+    argument_parser.add_argument("--keys", type=int, nargs="*", default=[],
+                                 help="the key codes held down in the while loops of the scripts")
+    argument_parser.add_argument("--write-output", action="store_true",
+                                 help="write the output file of every script")
+    argument_parser.add_argument("--gate-level-memory", action="store_true",
+                                 help="simulate RAM parts by their gates instead of as arrays")
+    argument_parser.add_argument("--cache", action="store_true",
+                                 help="cache the netlists on disk until their .hdl files change")
+    argument_parser.add_argument("--event-driven", action="store_true",
+                                 help="only evaluate the gates whose inputs changed")
+    argument_parser.add_argument("--gate-level", action="store_true",
+                                 help="simulate every part by its gates, without fast paths or memory arrays")
+    arguments = argument_parser.parse_args()
+    scripts: list[str] = []
+    for argument_path in map(os.path.abspath, arguments.input_paths):
+        if os.path.isdir(argument_path):
+            scripts += sorted(os.path.join(argument_path, filename) for filename in os.listdir(argument_path))
+        else:
+            scripts.append(argument_path)
+    scripts = [script for script in scripts if os.path.splitext(script)[1].lower() == ".tst"]
+    start_time: float = time.perf_counter()
+    script_results: list[ScriptResult] = run_scripts(
+        scripts, RunOptions(tuple(arguments.keys), arguments.write_output,
+                            not (arguments.gate_level_memory or arguments.gate_level), arguments.cache,
+                            arguments.event_driven, not arguments.gate_level), arguments.jobs)
+    for script_result in script_results:
+        status: str = "PASS" if script_result.passed else "FAIL"
+        print(f"{status} {os.path.relpath(script_result.path)} ({script_result.seconds:.2f}s): "
+              f"{script_result.message}")
+    failures: int = sum(not script_result.passed for script_result in script_results)
+    print(f"{len(script_results) - failures} passed, {failures} failed, "
+          f"in {time.perf_counter() - start_time:.2f}s", file=sys.stderr)
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,90 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import filecmp
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+from Main import assemble_file, assemble_file_streaming, assemble_file_two_pass
+
+AssembleFunction = typing.Callable[[typing.TextIO, typing.TextIO], None]
+ASSEMBLERS: dict[str, AssembleFunction] = {"two-pass": assemble_file_two_pass, "one-pass": assemble_file,
+                                           "streaming": assemble_file_streaming}
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns:
+        float: the peak resident set size of this process, in MB.
+    """
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_assembler(name: str, input_path: str, output_path: str) -> tuple[float, float]:
+    """Assembles a file in a new process, so its peak memory use is measured
+    separately from the other assemblers.
+
+    Args:
+        name (str): the name of the assembler in ASSEMBLERS.
+        input_path (str): the .asm file to assemble.
+        output_path (str): where to write the output.
+
+    Returns:
+        tuple[float, float]: the time in seconds and the peak RSS in MB.
+    """
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), input_path, "--run", name,
+                             "--output", output_path], check=True, capture_output=True, text=True)
+    elapsed, peak = result.stdout.split()
+    return float(elapsed), float(peak)
+
+
+if "__main__" == __name__:
+    # Compares the assemblers on a large .asm file, such as the output of the
+    # VM translator for a program linked with the OS
+    # (python ../08/Main.py ../12/_pong). --scale concatenates the file with
+    # itself to make it larger. Every assembler runs in its own process, and
+    # its best time and peak RSS are reported.
+    argument_parser = argparse.ArgumentParser(prog="Benchmark")
+    argument_parser.add_argument("input_path", help="an .asm file")
+    argument_parser.add_argument("--scale", type=int, default=1, help="concatenate the file N times")
+    argument_parser.add_argument("--repeats", type=int, default=3, help="report the best of N runs")
+    argument_parser.add_argument("--run", choices=ASSEMBLERS, help=argparse.SUPPRESS)
+    argument_parser.add_argument("--output", help=argparse.SUPPRESS)
+    arguments = argument_parser.parse_args()
+    if arguments.run:
+        # Runs a single assembler and prints its time and peak RSS
+        with open(arguments.input_path, 'r') as input_file, open(arguments.output, 'w') as output_file:
+            start: float = time.perf_counter()
+            ASSEMBLERS[arguments.run](input_file, output_file)
+        print(time.perf_counter() - start, peak_rss_mb())
+        sys.exit()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        input_path: str = os.path.join(temp_dir, "input.asm")
+        with open(arguments.input_path, 'r') as input_file, open(input_path, 'w') as scaled_file:
+            text: str = input_file.read()
+            for _ in range(arguments.scale):
+                scaled_file.write(text)
+        size: int = os.path.getsize(input_path)
+        print(f"{os.path.basename(arguments.input_path)}: {size / 1e6:.1f} MB, "
+              f"{text.count(chr(10)) * arguments.scale} lines")
+        del text
+        output_paths: dict[str, str] = {}
+        for name in ASSEMBLERS:
+            output_paths[name] = os.path.join(temp_dir, f"{name}.hack")
+            runs = [run_assembler(name, input_path, output_paths[name]) for _ in range(arguments.repeats)]
+            elapsed = min(run[0] for run in runs)
+            peak = max(run[1] for run in runs)
+            print(f"{name}: {elapsed:.3f} s, {size / 1e6 / elapsed:.2f} MB/s, peak RSS {peak:.1f} MB")
+        if not all(filecmp.cmp(output_paths["two-pass"], path, shallow=False) for path in output_paths.values()):
+            sys.exit("The outputs of the assemblers differ")
+        print("Outputs are identical")
@@ -1,12 +1,55 @@
 """This file is part of nand2tetris, as taught in The Hebrew University,
-and was written by Aviv Yaish according to the specifications given in  
+and was written by Aviv Yaish according to the specifications given in
 https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
-and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 
+DEST_CODES: dict[str, str] = {"": "000", "M": "001", "D": "010", "MD": "011",
+                              "A": "100", "AM": "101", "AD": "110", "AMD": "111"}
+JUMP_CODES: dict[str, str] = {"": "000", "JGT": "001", "JEQ": "010", "JGE": "011",
+                              "JLT": "100", "JNE": "101", "JLE": "110", "JMP": "111"}
+# The comp codes with a=0. Each comp using A has an M form with a=1.
+A_COMP_CODES: dict[str, str] = {
+    "0": "101010", "1": "111111", "-1": "111010", "D": "001100", "A": "110000", "!D": "001101",
+    "!A": "110001", "-D": "001111", "-A": "110011", "D+1": "011111", "A+1": "110111", "D-1": "001110",
+    "A-1": "110010", "D+A": "000010", "D-A": "010011", "A-D": "000111", "D&A": "000000", "D|A": "010101",
+    "A+D": "000010", "A&D": "000000", "A|D": "010101",
+    "D<<": "110000", "D>>": "010000", "A>>": "000000", "A<<": "100000"}
+COMP_CODES: dict[str, str] = {
+    **{mnemonic: "0" + code for mnemonic, code in A_COMP_CODES.items()},
+    **{mnemonic.replace("A", "M"): "1" + code for mnemonic, code in A_COMP_CODES.items() if "A" in mnemonic}}
+SHIFT_COMPS: frozenset[str] = frozenset(mnemonic for mnemonic in COMP_CODES if "<" in mnemonic or ">" in mnemonic)
+C_PREFIX: int = 0b111 << 13
+# The largest value an A-instruction can load, since its top bit is 0
+MAX_ADDRESS: int = 0x7FFF
+SHIFT_PREFIX: int = 0b101 << 13
 
-import symbol
+
+class InvalidInstruction(ValueError):
+    """Raised for a C-instruction with an illegal dest, comp or jump, or an
+    A-instruction whose value doesn't fit in 15 bits.
+    """
+
+
+def build_c_instructions() -> dict[tuple[str, str, str], int]:
+    """
+    Returns:
+        dict[tuple[str, str, str], int]: the encoding of every legal
+        (dest, comp, jump) combination.
+    """
+    instructions: dict[tuple[str, str, str], int] = {}
+    for comp, comp_code in COMP_CODES.items():
+        prefix: int = SHIFT_PREFIX if comp in SHIFT_COMPS else C_PREFIX
+        for dest, dest_code in DEST_CODES.items():
+            for jump, jump_code in JUMP_CODES.items():
+                instructions[dest, comp, jump] = prefix | int(comp_code + dest_code + jump_code, 2)
+    return instructions
+
+
+C_INSTRUCTIONS: dict[tuple[str, str, str], int] = build_c_instructions()
+# Encodings of whole C-instruction strings, added as they are first seen
+INSTRUCTION_CACHE: dict[str, int] = {}
 
 
 class Code:
@@ -21,9 +64,7 @@ class Code:
         Returns:
             str: 3-bit long binary code of the given mnemonic.
         """
-        CODES: dict[str, str] = {"": "000", "M": "001", "D": "010", "MD": "011",
-                 "A": "100", "AM": "101", "AD": "110", "AMD": "111"}
-        return CODES[mnemonic]
+        return DEST_CODES[mnemonic]
 
     @staticmethod
     def comp(mnemonic: str) -> str:
@@ -34,12 +75,7 @@ class Code:
         Returns:
             str: the binary code of the given mnemonic.
         """
-        letter_code:str = '1' if 'M' in mnemonic else '0'
-        CODES: dict[str, str] = {"":"000000","0": "101010", "1": "111111", "-1": "111010", "D": "001100", "A": "110000", "!D": "001101",
-                 "!A": "110001", "-D": "001111", "-A": "110011", "D+1": "011111", "A+1": "110111", "D-1": "001110",
-                 "A-1": "110010", "D+A": "000010", "D-A": "010011", "A-D": "000111", "D&A": "000000", "D|A": "010101",
-                 "D<<":"110000","D>>":"010000","A>>":"000000","A<<":"100000"}
-        return letter_code+CODES[mnemonic.replace("M", "A")]
+        return COMP_CODES[mnemonic]
 
     @staticmethod
     def jump(mnemonic: str) -> str:
@@ -50,6 +86,70 @@ class Code:
         Returns:
             str: 3-bit long binary code of the given mnemonic.
         """
-        CODES: dict[str, str] = {"": "000", "JGT": "001", "JEQ": "010", "JGE": "011",
-                 "JLT": "100", "JNE": "101", "JLE": "110", "JMP": "111"}
-        return CODES[mnemonic]
+        return JUMP_CODES[mnemonic]
+
+    @staticmethod
+    def encode(dest: str, comp: str, jump: str) -> int:
+        """
+        Args:
+            dest (str): the dest mnemonic of a C-instruction.
+            comp (str): the comp mnemonic of a C-instruction.
+            jump (str): the jump mnemonic of a C-instruction.
+
+        Returns:
+            int: the 16-bit encoding of the instruction.
+
+        Raises:
+            InvalidInstruction: if a mnemonic is illegal.
+        """
+        word = C_INSTRUCTIONS.get((dest, comp, jump))
+        if word is None:
+            for field, mnemonic, codes in (("dest", dest, DEST_CODES), ("comp", comp, COMP_CODES),
+                                           ("jump", jump, JUMP_CODES)):
+                if mnemonic not in codes:
+                    raise InvalidInstruction(f"Illegal {field} mnemonic {mnemonic!r}")
+        return word
+
+    @staticmethod
+    def address(value: int, symbol: str) -> int:
+        """
+        Args:
+            value (int): the value loaded by an A-instruction.
+            symbol (str): the constant or symbol of the instruction.
+
+        Returns:
+            int: the 16-bit encoding of the instruction.
+
+        Raises:
+            InvalidInstruction: if the value doesn't fit in 15 bits.
+        """
+        if value > MAX_ADDRESS:
+            if symbol.isnumeric():
+                raise InvalidInstruction(f"@{symbol}: the constant is larger than {MAX_ADDRESS}")
+            raise InvalidInstruction(f"@{symbol}: its address {value} is larger than {MAX_ADDRESS}")
+        return value
+
+    @staticmethod
+    def instruction(text: str) -> int:
+        """
+        Args:
+            text (str): a C-instruction without whitespace, dest=comp;jump.
+
+        Returns:
+            int: the 16-bit encoding of the instruction.
+
+        Raises:
+            InvalidInstruction: if the instruction is illegal.
+        """
+        word = INSTRUCTION_CACHE.get(text)
+        if word is None:
+            dest, equals, rest = text.partition("=")
+            if not equals:
+                dest, rest = "", text
+            comp, semicolon, jump = rest.partition(";")
+            try:
+                word = Code.encode(dest, comp, jump)
+            except InvalidInstruction as error:
+                raise InvalidInstruction(f"{error} in {text!r}") from None
+            INSTRUCTION_CACHE[text] = word
+        return word
@@ -0,0 +1,264 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import array
+import functools
+import time
+import typing
+from RomImage import FORMATS, load_image, numpy
+
+ROM_SIZE: int = 0x8000
+RAM_SIZE: int = 0x8000  # RAM, the screen and the keyboard
+WORD_MASK: int = 0xFFFF
+SIGN_BIT: int = 0x8000
+# Bits of a C-instruction: 1 1 1 a c1 c2 c3 c4 c5 c6 d1 d2 d3 j1 j2 j3, where
+# bits 14 and 13 are 0 1 for a shift instruction
+C_BIT: int = 0x8000
+ALU_BIT: int = 0x4000
+M_BIT: int = 0x1000
+DEST_A: int = 0x20
+DEST_D: int = 0x10
+DEST_M: int = 0x8
+JUMP_NEGATIVE: int = 0x4
+JUMP_ZERO: int = 0x2
+JUMP_POSITIVE: int = 0x1
+# The control bits of a shift: c1 shifts left instead of right, c2 shifts D
+# instead of A or M
+SHIFT_LEFT: int = 0x20
+SHIFT_D: int = 0x10
+
+Compute = typing.Callable[[int, int], int]
+# A decoded C-instruction: (compute, reads M, writes A, writes D, writes M,
+# jump bits). An A-instruction is decoded as its value.
+Decoded = typing.Union[int, tuple[Compute, bool, bool, bool, bool, int]]
+
+
+def alu(x: int, y: int, control: int) -> int:
+    """The Hack ALU.
+
+    Args:
+        x (int): the D register, as an unsigned 16-bit word.
+        y (int): the A register or M, as an unsigned 16-bit word.
+        control (int): the bits zx nx zy ny f no.
+
+    Returns:
+        int: the output of the ALU, as an unsigned 16-bit word.
+    """
+    if control & 0x20:
+        x = 0
+    if control & 0x10:
+        x ^= WORD_MASK
+    if control & 0x8:
+        y = 0
+    if control & 0x4:
+        y ^= WORD_MASK
+    out: int = (x + y) & WORD_MASK if control & 0x2 else x & y
+    return out ^ WORD_MASK if control & 0x1 else out
+
+
+# The controls the assembler emits, computed without going through alu()
+ALU_FUNCTIONS: dict[int, Compute] = {
+    0b101010: lambda x, y: 0, 0b111111: lambda x, y: 1, 0b111010: lambda x, y: WORD_MASK,
+    0b001100: lambda x, y: x, 0b110000: lambda x, y: y,
+    0b001101: lambda x, y: x ^ WORD_MASK, 0b110001: lambda x, y: y ^ WORD_MASK,
+    0b001111: lambda x, y: -x & WORD_MASK, 0b110011: lambda x, y: -y & WORD_MASK,
+    0b011111: lambda x, y: (x + 1) & WORD_MASK, 0b110111: lambda x, y: (y + 1) & WORD_MASK,
+    0b001110: lambda x, y: (x - 1) & WORD_MASK, 0b110010: lambda x, y: (y - 1) & WORD_MASK,
+    0b000010: lambda x, y: (x + y) & WORD_MASK, 0b010011: lambda x, y: (x - y) & WORD_MASK,
+    0b000111: lambda x, y: (y - x) & WORD_MASK, 0b000000: lambda x, y: x & y, 0b010101: lambda x, y: x | y}
+SHIFT_FUNCTIONS: dict[int, Compute] = {
+    SHIFT_LEFT | SHIFT_D: lambda x, y: (x << 1) & WORD_MASK, SHIFT_D: lambda x, y: (x >> 1) | (x & SIGN_BIT),
+    SHIFT_LEFT: lambda x, y: (y << 1) & WORD_MASK, 0: lambda x, y: (y >> 1) | (y & SIGN_BIT)}
+
+
+def decode(word: int) -> Decoded:
+    """
+    Args:
+        word (int): an instruction.
+
+    Returns:
+        Decoded: the instruction, decoded for Emulator.run.
+    """
+    if not word & C_BIT:
+        return word
+    control: int = (word >> 6) & 0x3F
+    if word & ALU_BIT or not word & 0x2000:
+        compute: Compute = ALU_FUNCTIONS.get(control) or functools.partial(alu, control=control)
+    else:
+        compute = SHIFT_FUNCTIONS[control & (SHIFT_LEFT | SHIFT_D)]
+    return (compute, bool(word & M_BIT), bool(word & DEST_A), bool(word & DEST_D), bool(word & DEST_M),
+            word & 0x7)
+
+
+class Emulator:
+    """Runs Hack machine code. Every ROM word is decoded once, when the ROM is
+    loaded. RAM is kept as a list of unsigned words, which the interpreter
+    works on directly. The ram attribute views it as a NumPy int16 array if
+    NumPy is installed, and an array('h') otherwise, holding signed values.
+    The view is made when ram is read, and copied back before the next run,
+    so changes to it are kept. The registers are kept as unsigned 16-bit
+    words.
+    """
+
+    def __init__(self, rom: typing.Iterable[int]) -> None:
+        """
+        Args:
+            rom: the words of the program.
+        """
+        self._words: list[int] = [0] * RAM_SIZE
+        # The signed view of RAM handed out since the last run, if any
+        self._ram_view: typing.Any = None
+        self._program: list[Decoded] = [decode(word) for word in rom]
+        if len(self._program) > ROM_SIZE:
+            raise ValueError(f"The program has {len(self._program)} words, the ROM has {ROM_SIZE}")
+        # Past the end of the program, the ROM holds zeros
+        self._program += [0] * (ROM_SIZE - len(self._program))
+        self.a: int = 0
+        self.d: int = 0
+        self.pc: int = 0
+        self.cycles: int = 0
+
+    @classmethod
+    def from_file(cls, path: str, image_format: str = "text") -> "Emulator":
+        """
+        Args:
+            path (str): the path of a ROM image.
+            image_format (str): one of RomImage.FORMATS.
+
+        Returns:
+            Emulator: an emulator running the image.
+        """
+        return cls(load_image(path, image_format))
+
+    @property
+    def ram(self) -> typing.Any:
+        """
+        Returns:
+            the signed words of RAM, as a NumPy int16 array or an array('h').
+        """
+        if self._ram_view is None:
+            self._ram_view = numpy.array(self._words, dtype=numpy.uint16).view(numpy.int16) \
+                if numpy is not None else array.array('h', array.array('H', self._words).tobytes())
+        return self._ram_view
+
+    def reset(self) -> None:
+        """Sets the PC to 0. The registers and RAM keep their values."""
+        self.pc = 0
+
+    def run(self, cycles: int, stop_pc: typing.Optional[int] = None) -> int:
+        """Runs the program for a number of cycles, or until it reaches an
+        address. If ram was read since the last run, it's copied back to the
+        words of RAM first, so reading ram between short runs is slower than
+        running many cycles at once.
+
+        Args:
+            cycles (int): the maximal number of instructions to run.
+            stop_pc (int): if given, stops before running the instruction at
+                this address.
+
+        Returns:
+            int: the number of instructions run.
+        """
+        if self._ram_view is not None:
+            self._store_ram_view()
+        executed: int = self._execute(self._words, cycles, stop_pc)
+        self.cycles += executed
+        return executed
+
+    def _execute(self, ram: list[int], cycles: int, stop_pc: typing.Optional[int]) -> int:
+        return self._interpret(ram, cycles, stop_pc)
+
+    def _interpret(self, ram: list[int], cycles: int, stop_pc: typing.Optional[int]) -> int:
+        """Runs the program an instruction at a time, from the registers of
+        the emulator, and updates them.
+
+        Returns:
+            int: the number of instructions run.
+        """
+        program: list[Decoded] = self._program
+        a, d, pc = self.a, self.d, self.pc
+        executed: int = 0
+        if stop_pc is not None:
+            # Marks the address, and stops when it's reached
+            stop_instruction, program[stop_pc] = program[stop_pc], None
+        try:
+            while executed < cycles:
+                instruction = program[pc]
+                if instruction.__class__ is int:
+                    a = instruction
+                    pc += 1
+                    executed += 1
+                    continue
+                if instruction is None:
+                    break
+                executed += 1
+                compute, reads_m, writes_a, writes_d, writes_m, jump = instruction
+                out: int = compute(d, ram[a] if reads_m else a)
+                if writes_m:
+                    ram[a] = out
+                if writes_d:
+                    d = out
+                if jump and jump & (JUMP_ZERO if out == 0 else JUMP_NEGATIVE if out & SIGN_BIT else JUMP_POSITIVE):
+                    pc = a & 0x7FFF
+                else:
+                    pc += 1
+                if writes_a:
+                    a = out
+        except IndexError:
+            raise IndexError(f"Address out of range at PC {pc}, A={a}") from None
+        finally:
+            if stop_pc is not None:
+                program[stop_pc] = stop_instruction
+            self.a, self.d, self.pc = a, d, pc
+        return executed
+
+    def run_until(self, stop_pc: int, max_cycles: int) -> bool:
+        """Runs the program until it reaches an address.
+
+        Args:
+            stop_pc (int): the address to stop at.
+            max_cycles (int): the maximal number of instructions to run.
+
+        Returns:
+            bool: True if the address was reached, False otherwise.
+        """
+        self.run(max_cycles, stop_pc)
+        return self.pc == stop_pc
+
+    def _store_ram_view(self) -> None:
+        if numpy is not None:
+            self._words = self._ram_view.view(numpy.uint16).tolist()
+        else:
+            self._words = array.array('H', self._ram_view.tobytes()).tolist()
+        self._ram_view = None
+
+
+if "__main__" == __name__:
+    # Runs a ROM image and prints the registers, a range of RAM and the
+    # number of instructions run per second. With --jit, the program is run
+    # by JitEmulator.
+    argument_parser = argparse.ArgumentParser(prog="Emulator")
+    argument_parser.add_argument("input_path", help="a .hack, .le.bin or .be.bin file")
+    argument_parser.add_argument("--format", choices=FORMATS, default="text", help="the format of the file")
+    argument_parser.add_argument("--cycles", type=int, default=1_000_000, help="the number of instructions to run")
+    argument_parser.add_argument("--stop-pc", type=int, help="stop when the PC reaches this address")
+    argument_parser.add_argument("--jit", action="store_true", help="translate the program into Python functions")
+    argument_parser.add_argument("--ram", type=int, nargs=2, default=[0, 16], metavar=("START", "END"),
+                                 help="the range of RAM to print")
+    arguments = argument_parser.parse_args()
+    if arguments.jit:
+        from JitEmulator import JitEmulator
+        emulator: Emulator = JitEmulator.from_file(arguments.input_path, arguments.format)
+    else:
+        emulator = Emulator.from_file(arguments.input_path, arguments.format)
+    start: float = time.perf_counter()
+    executed: int = emulator.run(arguments.cycles, arguments.stop_pc)
+    elapsed: float = time.perf_counter() - start
+    print(f"Ran {executed} instructions in {elapsed:.3f} s ({executed / elapsed / 1e6:.2f} MIPS)")
+    print(f"PC={emulator.pc} A={emulator.a} D={emulator.d}")
+    for address in range(*arguments.ram):
+        print(f"RAM[{address}] = {emulator.ram[address]}")
@@ -0,0 +1,65 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import array
+import os
+import sys
+import time
+from Emulator import Emulator
+from JitEmulator import JitEmulator
+from Main import assemble_words
+from RomImage import load_image
+
+
+def load_program(path: str) -> array.array:
+    """
+    Args:
+        path (str): an .asm file, which is assembled, or a .hack file.
+
+    Returns:
+        array.array: the words of the program.
+    """
+    if os.path.splitext(path)[1].lower() == ".asm":
+        with open(path, 'r') as input_file:
+            return assemble_words(input_file)
+    return load_image(path)
+
+
+def time_emulator(emulator: Emulator, cycles: int) -> float:
+    """
+    Returns:
+        float: the time in seconds it took to run the emulator.
+    """
+    start: float = time.perf_counter()
+    emulator.run(cycles)
+    return time.perf_counter() - start
+
+
+if "__main__" == __name__:
+    # Runs programs on the interpreter and on the JIT, and compares their
+    # speed. The programs of projects/12 can be translated with
+    # python ../08/Main.py ../12/_drive_tests/MathTest --compact-calls
+    # and then benchmarked with
+    # python EmulatorBenchmark.py ../12/_drive_tests/MathTest/MathTest.asm
+    # Both emulators must end in the same state.
+    argument_parser = argparse.ArgumentParser(prog="EmulatorBenchmark")
+    argument_parser.add_argument("input_paths", nargs="+", metavar="input_path", help="an .asm or .hack file")
+    argument_parser.add_argument("--cycles", type=int, default=10_000_000, help="the number of instructions to run")
+    arguments = argument_parser.parse_args()
+    for input_path in arguments.input_paths:
+        program: array.array = load_program(input_path)
+        interpreter: Emulator = Emulator(program)
+        jit: JitEmulator = JitEmulator(program)
+        interpreter_time: float = time_emulator(interpreter, arguments.cycles)
+        jit_time: float = time_emulator(jit, arguments.cycles)
+        print(f"{os.path.basename(input_path)}: {len(program)} words, {interpreter.cycles} cycles, "
+              f"interpreter {interpreter.cycles / interpreter_time / 1e6:.2f} MIPS, "
+              f"JIT {jit.cycles / jit_time / 1e6:.2f} MIPS ({jit.blocks_translated()} blocks), "
+              f"speedup {interpreter_time / jit_time:.2f}x")
+        if (interpreter.a, interpreter.d, interpreter.pc, interpreter.cycles, bytes(interpreter.ram)) != \
+                (jit.a, jit.d, jit.pc, jit.cycles, bytes(jit.ram)):
+            sys.exit(f"{input_path}: the emulators ended in different states")
@@ -0,0 +1,168 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Emulator import (ALU_BIT, C_BIT, DEST_A, DEST_D, DEST_M, M_BIT, ROM_SIZE, SHIFT_D, SHIFT_LEFT, Emulator,
+                      alu)
+
+# Instructions translated into a block at most, so the blocks of long
+# straight-line code still fit the remaining cycles of a run
+MAX_BLOCK_SIZE: int = 64
+# A translated block takes RAM and the A and D registers, and returns the
+# next PC and the new A and D
+Block = typing.Callable[[list[int], int, int], tuple[int, int, int]]
+
+# Python expressions of the comps, where x is D and y is A or M
+ALU_EXPRESSIONS: dict[int, str] = {
+    0b101010: "0", 0b111111: "1", 0b111010: "65535", 0b001100: "{x}", 0b110000: "{y}",
+    0b001101: "{x} ^ 65535", 0b110001: "{y} ^ 65535", 0b001111: "-{x} & 65535", 0b110011: "-{y} & 65535",
+    0b011111: "({x} + 1) & 65535", 0b110111: "({y} + 1) & 65535",
+    0b001110: "({x} - 1) & 65535", 0b110010: "({y} - 1) & 65535",
+    0b000010: "({x} + {y}) & 65535", 0b010011: "({x} - {y}) & 65535", 0b000111: "({y} - {x}) & 65535",
+    0b000000: "{x} & {y}", 0b010101: "{x} | {y}"}
+SHIFT_EXPRESSIONS: dict[int, str] = {
+    SHIFT_LEFT | SHIFT_D: "({x} << 1) & 65535", SHIFT_D: "({x} >> 1) | ({x} & 32768)",
+    SHIFT_LEFT: "({y} << 1) & 65535", 0: "({y} >> 1) | ({y} & 32768)"}
+# Conditions on out of the jumps JGT, JEQ, JGE, JLT, JNE, JLE and JMP
+JUMP_CONDITIONS: dict[int, str] = {
+    1: "0 < out < 32768", 2: "out == 0", 3: "out < 32768", 4: "out >= 32768", 5: "out != 0",
+    6: "out == 0 or out >= 32768", 7: "True"}
+
+
+def comp_expression(word: int) -> str:
+    """
+    Args:
+        word (int): a C-instruction.
+
+    Returns:
+        str: a Python expression of its comp, using d, a and ram.
+    """
+    control: int = (word >> 6) & 0x3F
+    y: str = "ram[a]" if word & M_BIT else "a"
+    if word & ALU_BIT or not word & 0x2000:
+        template: str = ALU_EXPRESSIONS.get(control, f"alu({{x}}, {{y}}, {control})")
+    else:
+        template = SHIFT_EXPRESSIONS[control & (SHIFT_LEFT | SHIFT_D)]
+    return template.format(x="d", y=y)
+
+
+def translate_block(rom: list[int], entry: int) -> tuple[str, int]:
+    """Translates the straight-line code starting at an address into the
+    source of a Python function. The block ends after its first jump, or
+    after MAX_BLOCK_SIZE instructions.
+
+    Args:
+        rom (list[int]): the words of the program.
+        entry (int): the address of the first instruction of the block.
+
+    Returns:
+        tuple[str, int]: the source of the function, named block, and the
+        number of instructions in the block.
+    """
+    lines: list[str] = ["def block(ram, a, d):"]
+    address: int = entry
+    while address < min(entry + MAX_BLOCK_SIZE, ROM_SIZE):
+        word: int = rom[address]
+        address += 1
+        if not word & C_BIT:
+            lines.append(f"    a = {word}")
+            continue
+        expression: str = comp_expression(word)
+        jump: int = word & 0x7
+        destinations: list[str] = [target for bit, target in ((DEST_M, "ram[a]"), (DEST_D, "d"))
+                                   if word & bit]
+        if not jump:
+            # Without a jump, the value only matters if it's stored
+            if word & DEST_A and not destinations:
+                lines.append(f"    a = {expression}")
+            elif word & DEST_A or len(destinations) > 1:
+                lines.append(f"    out = {expression}")
+                lines += [f"    {target} = out" for target in destinations]
+                if word & DEST_A:
+                    lines.append("    a = out")
+            elif destinations:
+                lines.append(f"    {destinations[0]} = {expression}")
+            continue
+        if jump != 7 or destinations or word & DEST_A:
+            lines.append(f"    out = {expression}")
+            lines += [f"    {target} = out" for target in destinations]
+        next_a: str = "out" if word & DEST_A else "a"
+        if jump == 7:
+            lines.append(f"    return a & 32767, {next_a}, d")
+        else:
+            lines.append(f"    if {JUMP_CONDITIONS[jump]}:")
+            lines.append(f"        return a & 32767, {next_a}, d")
+            lines.append(f"    return {address}, {next_a}, d")
+        return "\n".join(lines) + "\n", address - entry
+    lines.append(f"    return {address}, a, d")
+    return "\n".join(lines) + "\n", address - entry
+
+
+class JitEmulator(Emulator):
+    """Runs Hack machine code by translating it into Python functions. Each
+    basic block is translated when the PC first reaches it, compiled once and
+    cached by its address. A block is straight-line code, so it runs as a
+    single call, and the number of instructions run stays exact. When fewer
+    cycles remain than a block has, or the block passes the address a run
+    stops at, the instructions are interpreted one at a time instead.
+    """
+
+    def __init__(self, rom: typing.Iterable[int]) -> None:
+        """
+        Args:
+            rom: the words of the program.
+        """
+        words: list[int] = list(rom)
+        super().__init__(words)
+        self._rom: list[int] = words + [0] * (ROM_SIZE - len(words))
+        # The translated block and its size, for every address a block
+        # started at
+        self._blocks: list[typing.Optional[tuple[Block, int]]] = [None] * ROM_SIZE
+
+    def translate(self, entry: int) -> tuple[Block, int]:
+        """Translates and compiles the block starting at an address.
+
+        Args:
+            entry (int): the address of the first instruction of the block.
+
+        Returns:
+            tuple[Block, int]: the function of the block and its size.
+        """
+        source, size = translate_block(self._rom, entry)
+        namespace: dict[str, typing.Any] = {"alu": alu}
+        exec(compile(source, f"<block {entry}>", "exec"), namespace)
+        self._blocks[entry] = namespace["block"], size
+        return namespace["block"], size
+
+    def blocks_translated(self) -> int:
+        """
+        Returns:
+            int: the number of blocks translated so far.
+        """
+        return len(self._blocks) - self._blocks.count(None)
+
+    def _execute(self, ram: list[int], cycles: int, stop_pc: typing.Optional[int]) -> int:
+        blocks: list[typing.Optional[tuple[Block, int]]] = self._blocks
+        a, d, pc = self.a, self.d, self.pc
+        executed: int = 0
+        stop: int = -1 if stop_pc is None else stop_pc
+        while executed < cycles and pc != stop:
+            block = blocks[pc]
+            if block is None:
+                block = self.translate(pc)
+            function, size = block
+            if executed + size > cycles or pc < stop < pc + size:
+                # Interprets the part of the block that may run
+                self.a, self.d, self.pc = a, d, pc
+                return executed + self._interpret(ram, min(cycles - executed, size), stop_pc)
+            try:
+                pc, a, d = function(ram, a, d)
+            except IndexError:
+                self.a, self.d, self.pc = a, d, pc
+                raise IndexError(f"Address out of range in the block at PC {pc}") from None
+            executed += size
+        self.a, self.d, self.pc = a, d, pc
+        return executed
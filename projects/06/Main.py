@@ -4,17 +4,116 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import array
+import concurrent.futures
+import hashlib
+import itertools
+import json
 import os
 import sys
+import time
 import typing
 from SymbolTable import SymbolTable
-from Parser import Parser
+from Parser import A_COMMAND, C_COMMAND, L_COMMAND, Parser
 from Code import Code
+from RomImage import EXTENSIONS, FORMATS, new_image, write_packed, write_text
+
+# Hashes of the files assembled with --cache, kept in each directory
+CACHE_FILENAME: str = ".assembler_cache.json"
+# The modules of the assembler, whose sources are part of the cache keys
+ASSEMBLER_SOURCES: list[str] = ["Main.py", "Parser.py", "Code.py", "SymbolTable.py", "RomImage.py"]
+# Lines written at once by the streaming assembler
+WRITE_BATCH: int = 4096
 
 
 def assemble_file(
         input_file: typing.TextIO, output_file: typing.TextIO) -> None:
-    """Assembles a single file.
+    """Assembles a single file into the .hack format.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+        output_file (typing.TextIO): writes all output to this file.
+    """
+    write_text(encode_file(input_file), output_file)
+
+
+def assemble_words(input_file: typing.TextIO) -> array.array:
+    """Assembles a single file into memory.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+
+    Returns:
+        array.array: the assembled words, as unsigned 16-bit integers. Use
+            RomImage.as_numpy to view them as a NumPy array.
+    """
+    words: list[int] = encode_file(input_file)
+    image: array.array = new_image()
+    image.fromlist(words)
+    return image
+
+
+def encode_file(input_file: typing.TextIO) -> list[int]:
+    """Assembles a single file in one pass. Every line is classified and
+    encoded once. A-instructions with a symbol are encoded as placeholders
+    and backpatched at the end, when all the labels are known.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble.
+
+    Returns:
+        list[int]: the assembled words.
+    """
+    parser: Parser = Parser(input_file)
+    symbol_table: SymbolTable = SymbolTable()
+    words: list[int] = []
+    # (index in words, symbol) of every A-instruction with a symbol
+    references: list[tuple[int, str]] = []
+    line_num: int = 0  # Line numbers start at 0
+    while parser.has_more_commands():
+        parser.advance()
+        kind: int = parser.kind()
+        if kind == L_COMMAND:
+            symbol_table.add_entry(parser.symbol(), line_num)
+            continue
+        line_num += 1
+        if kind == A_COMMAND:
+            symbol: str = parser.symbol()
+            if symbol.isnumeric():
+                words.append(Code.address(int(symbol), symbol))
+            else:
+                references.append((len(words), symbol))
+                words.append(0)
+        elif kind == C_COMMAND:
+            words.append(Code.instruction(parser.instruction()))
+    backpatch(references, symbol_table, words)
+    return words
+
+
+def backpatch(references: list[tuple[int, str]], symbol_table: SymbolTable, words: list[int]) -> None:
+    """Writes the addresses of the symbols referenced by A-instructions. A
+    symbol that isn't a label is a variable, and variables are allocated
+    from RAM[16] in the order they are first referenced.
+
+    Args:
+        references (list[tuple[int, str]]): (index in words, symbol) of every
+            A-instruction with a symbol, in order.
+        symbol_table (SymbolTable): holds all the labels of the file.
+        words (list[int]): the assembled words to patch.
+    """
+    address: int = 16  # Variable address starts with RAM[16]
+    for line, symbol in references:
+        if not symbol_table.contains(symbol):
+            symbol_table.add_entry(symbol, address)
+            address += 1
+        words[line] = Code.address(int(symbol_table.get_address(symbol)), symbol)
+
+
+def assemble_file_two_pass(
+        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+    """Assembles a single file, finding the labels in a first pass and
+    encoding the instructions in a second one.
 
     Args:
         input_file (typing.TextIO): the file to assemble.
@@ -29,6 +128,26 @@ def assemble_file(
     output_file.writelines(assembled_lines)
 
 
+def assemble_file_streaming(
+        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+    """Assembles a single file without keeping it in memory. The first pass
+    reads the file for its labels, and the second pass reads it again and
+    writes the encoded instructions in batches, so memory use depends on the
+    symbol table and not on the size of the program.
+
+    Args:
+        input_file (typing.TextIO): the file to assemble, must be seekable.
+        output_file (typing.TextIO): writes all output to this file.
+    """
+    parser: Parser = Parser(input_file, stream=True)
+    symbol_table: SymbolTable = SymbolTable()
+    assembled_lines: list[str] = []
+    first_pass(parser, symbol_table)
+    parser.reset()
+    second_pass(parser, symbol_table, assembled_lines, output_file)
+    output_file.writelines(assembled_lines)
+
+
 def first_pass(parser: Parser, symbol_table: SymbolTable) -> None:
     line_num: int = 0  # Line numbers start at 0
     while parser.has_more_commands():
@@ -38,7 +157,11 @@ def first_pass(parser: Parser, symbol_table: SymbolTable) -> None:
             symbol_table.add_entry(parser.symbol(), line_num)
 
 
-def second_pass(parser: Parser, symbol_table: SymbolTable, assembled_lines: list[str]) -> None:
+def second_pass(parser: Parser, symbol_table: SymbolTable, assembled_lines: list[str],
+                output_file: typing.Optional[typing.TextIO] = None) -> None:
+    """Encodes the instructions into assembled_lines. If output_file is given,
+    assembled_lines is written to it and emptied every WRITE_BATCH lines.
+    """
     address: int = 16  # Variable address starts with RAM[16]
     while parser.has_more_commands():
         parser.advance()
@@ -46,13 +169,13 @@ def second_pass(parser: Parser, symbol_table: SymbolTable, assembled_lines: list
             address += proccess_A(parser, symbol_table,assembled_lines, address)
         elif parser.command_type() == "C_COMMAND":
             proccess_C(parser, assembled_lines)
+        if output_file and len(assembled_lines) >= WRITE_BATCH:
+            output_file.writelines(assembled_lines)
+            assembled_lines.clear()
 
 
 def proccess_C(parser: Parser, assembled_lines) -> None:
-    dest, comp, jump = Code.dest(parser.dest()), Code.comp(
-            parser.comp()), Code.jump(parser.jump())
-    shift: str = "0" if "<" in parser.comp() or ">" in parser.comp() else "1"
-    assembled_lines.append("1"+shift+"1"+comp+dest+jump+"\n")
+    assembled_lines.append(f'{Code.encode(parser.dest(), parser.comp(), parser.jump()):016b}\n')
 
 
 def proccess_A(parser: Parser, symbol_table, assembled_lines, address) -> int:
@@ -60,37 +183,153 @@ def proccess_A(parser: Parser, symbol_table, assembled_lines, address) -> int:
     # If symbol is a Jump reference or declared variable
     if symbol_table.contains(symbol):
         assembled_lines.append(
-            f'{int(symbol_table.get_address(symbol)):016b}\n')
+            f'{Code.address(int(symbol_table.get_address(symbol)), symbol):016b}\n')
         return 0
     elif not symbol.isnumeric():  # Symbol is a new variable
         # print(symbol,address)
-        assembled_lines.append(f'{address:016b}\n')
+        assembled_lines.append(f'{Code.address(address, symbol):016b}\n')
         symbol_table.add_entry(symbol, address)
         return 1
-    assembled_lines.append(f'{int(symbol):016b}\n')
+    assembled_lines.append(f'{Code.address(int(symbol), symbol):016b}\n')
     return 0
 
 
+def assemble_path(input_path: str, image_format: str = "text", stream: bool = False) -> str:
+    """Assembles a single .asm file into a file next to it, with the same
+    name and the extension of the format.
+
+    Args:
+        input_path (str): the path of the file to assemble.
+        image_format (str): one of RomImage.FORMATS.
+        stream (bool): if this is True, the file isn't read into memory.
+
+    Returns:
+        str: the path of the output file.
+    """
+    output_path: str = os.path.splitext(input_path)[0] + EXTENSIONS[image_format]
+    if image_format != "text":
+        with open(input_path, 'r') as input_file, open(output_path, 'wb') as binary_file:
+            write_packed(assemble_words(input_file), binary_file, image_format)
+        return output_path
+    assemble = assemble_file_streaming if stream else assemble_file
+    with open(input_path, 'r') as input_file, open(output_path, 'w') as output_file:
+        assemble(input_file, output_file)
+    return output_path
+
+
+def assembler_version() -> str:
+    """
+    Returns:
+        str: a hash of the assembler's own source files, so any change to the
+        assembler invalidates everything it assembled before.
+    """
+    digest = hashlib.sha256()
+    for filename in ASSEMBLER_SOURCES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), filename), 'rb') as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+def content_key(input_path: str, image_format: str, version: str) -> str:
+    """
+    Args:
+        input_path (str): the path of an .asm file.
+        image_format (str): one of RomImage.FORMATS.
+        version (str): the assembler_version.
+
+    Returns:
+        str: a hash of the contents of the file, the output format and the
+        assembler, which changes whenever the output would.
+    """
+    with open(input_path, 'rb') as input_file:
+        return hashlib.sha256(f"{version}:{image_format}:".encode() + input_file.read()).hexdigest()
+
+
+def assemble_paths(input_paths: list[str], image_format: str = "text", stream: bool = False,
+                   jobs: int = 1, use_cache: bool = False) -> tuple[int, int]:
+    """Assembles many .asm files, in parallel if jobs is more than 1. With
+    use_cache, a file is skipped if it is unchanged since it was last
+    assembled and its output still exists. The hashes of the files each
+    output was assembled from are kept in a CACHE_FILENAME file in each directory.
+
+    Args:
+        input_paths (list[str]): the paths of the files to assemble.
+        image_format (str): one of RomImage.FORMATS.
+        stream (bool): if this is True, files aren't read into memory.
+        jobs (int): the number of processes to assemble with.
+        use_cache (bool): if this is True, unchanged files are skipped.
+
+    Returns:
+        tuple[int, int]: the number of files assembled and the number skipped.
+    """
+    caches: dict[str, dict[str, str]] = {}
+    keys: dict[str, str] = {}
+    pending: list[str] = input_paths
+    if use_cache:
+        pending = []
+        version: str = assembler_version()
+        for input_path in input_paths:
+            directory: str = os.path.dirname(input_path)
+            if directory not in caches:
+                cache_path: str = os.path.join(directory, CACHE_FILENAME)
+                caches[directory] = {}
+                if os.path.exists(cache_path):
+                    with open(cache_path, 'r') as cache_file:
+                        caches[directory] = json.load(cache_file)
+            keys[input_path] = content_key(input_path, image_format, version)
+            output_path: str = os.path.splitext(input_path)[0] + EXTENSIONS[image_format]
+            if caches[directory].get(os.path.basename(output_path)) != keys[input_path] or \
+                    not os.path.exists(output_path):
+                pending.append(input_path)
+    if jobs > 1 and len(pending) > 1:
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            list(executor.map(assemble_path, pending, itertools.repeat(image_format), itertools.repeat(stream)))
+    else:
+        for input_path in pending:
+            assemble_path(input_path, image_format, stream)
+    if use_cache:
+        for input_path in pending:
+            output_path = os.path.splitext(input_path)[0] + EXTENSIONS[image_format]
+            caches[os.path.dirname(input_path)][os.path.basename(output_path)] = keys[input_path]
+        for directory, cache in caches.items():
+            with open(os.path.join(directory, CACHE_FILENAME), 'w') as cache_file:
+                json.dump(cache, cache_file, indent=1, sort_keys=True)
+    return len(pending), len(input_paths) - len(pending)
+
+
 if "__main__" == __name__:
-    # Parses the input path and calls assemble_file on each input file.
-    # This opens both the input and the output files!
-    # Both are closed automatically when the code finishes running.
-    # If the output file does not exist, it is created automatically in the
-    # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: Assembler <input path>")
-    argument_path: str = os.path.abspath(sys.argv[1])
+    # Parses the input paths and assembles every .asm file in them.
+    # The output of each file is written next to it, with the same name.
+    # With --stream, files are assembled without being read into memory.
+    # With --format little or big, the output is written as packed 16-bit
+    # words instead, to a .le.bin or a .be.bin file.
+    # With --jobs or --cache, a summary of the files assembled, the files
+    # skipped because they didn't change and the time it took is reported.
+    argument_parser = argparse.ArgumentParser(prog="Assembler")
+    argument_parser.add_argument("input_paths", nargs="+", metavar="input_path",
+                                 help="an .asm file or a directory of .asm files")
+    argument_parser.add_argument("--stream", action="store_true",
+                                 help="read the input twice instead of keeping it in memory")
+    argument_parser.add_argument("--format", choices=FORMATS, default="text",
+                                 help="write text or packed words in the given byte order")
+    argument_parser.add_argument("--jobs", type=int, default=1, help="assemble files in N processes")
+    argument_parser.add_argument("--cache", action="store_true",
+                                 help="skip files that didn't change since they were last assembled")
+    arguments = argument_parser.parse_args()
+    if arguments.stream and arguments.format != "text":
+        argument_parser.error("--stream only writes the text format")
     files_to_assemble: list[str] = []
-    if os.path.isdir(argument_path):
-        files_to_assemble = [os.path.join(
-            argument_path, filename) for filename in os.listdir(argument_path)]
-    else:
-        files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".asm":
-            continue
-        output_path: str = filename + ".hack"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            assemble_file(input_file, output_file)
+    for argument_path in map(os.path.abspath, arguments.input_paths):
+        if os.path.isdir(argument_path):
+            files_to_assemble += sorted(os.path.join(
+                argument_path, filename) for filename in os.listdir(argument_path))
+        else:
+            files_to_assemble.append(argument_path)
+    files_to_assemble = [input_path for input_path in files_to_assemble
+                         if os.path.splitext(input_path)[1].lower() == ".asm"]
+    start: float = time.perf_counter()
+    assembled, cached = assemble_paths(files_to_assemble, arguments.format, arguments.stream,
+                                       arguments.jobs, arguments.cache)
+    if arguments.jobs > 1 or arguments.cache:
+        print(f"Assembled {assembled} files, {cached} unchanged, in {time.perf_counter() - start:.2f} s",
+              file=sys.stderr)
@@ -10,32 +10,99 @@ import typing
 from re import Match, Pattern
 
 COMMENT_WHITESPACE_REGEX: Pattern[str] = re.compile(r'\/[\/]+.*|[^\S+]+')
-A_COMMAND_REGEX: Pattern[str] = re.compile(r'@.+')
 C_COMMAND_REGEX: Pattern[str] = re.compile(r'(\S+[;].*)|(\S+[=].*)')
 L_COMMAND_REGEX: Pattern[str] = re.compile(r'[(][a-zA-Z0-9.$_:]+[)]')
-SYMBOL_REGEX: Pattern[str] = re.compile(r'(?<=[(])[a-zA-Z0-9.$_:]+(?<![)])|(?<=@).+')
+
+# Command kinds
+A_COMMAND: int = 0
+C_COMMAND: int = 1
+L_COMMAND: int = 2
+NO_COMMAND: int = 3  # A line that isn't a valid command
+COMMAND_TYPES: tuple[str, ...] = ("A_COMMAND", "C_COMMAND", "L_COMMAND", "")
+
+
+class Command:
+    """A decoded line of assembly code. symbol is set for A and L commands,
+    text, dest, comp and jump are set for C commands, and are empty otherwise.
+    """
+    __slots__ = ("kind", "symbol", "text", "dest", "comp", "jump")
+
+    def __init__(self, kind: int, symbol: str = "", text: str = "", dest: str = "", comp: str = "",
+                 jump: str = "") -> None:
+        self.kind: int = kind
+        self.symbol: str = symbol
+        self.text: str = text
+        self.dest: str = dest
+        self.comp: str = comp
+        self.jump: str = jump
+
+
+def decode(line: str) -> Command:
+    """Decodes a line without comments and whitespace.
+
+    Args:
+        line (str): the line to decode.
+
+    Returns:
+        Command: the decoded line.
+    """
+    if line[0] == "@" and len(line) > 1:
+        return Command(A_COMMAND, line[1:])
+    label: typing.Optional[Match[str]] = L_COMMAND_REGEX.match(line)
+    if label:
+        return Command(L_COMMAND, label.group()[1:-1])
+    if not C_COMMAND_REGEX.match(line):
+        return Command(NO_COMMAND)
+    parts: list[str] = line.split('=')
+    comp: str = parts[1] if len(parts) > 1 else parts[0]
+    return Command(C_COMMAND, text=line, dest=parts[0] if len(parts) > 1 else "",
+                   comp=comp.split(';')[0], jump=line.split(';')[-1] if ';' in line else "")
+
+
+def read_commands(input_file: typing.TextIO) -> typing.Iterator[Command]:
+    """
+    Args:
+        input_file (typing.TextIO): input file.
+
+    Yields:
+        The decoded commands of the file, reading it line by line.
+    """
+    for line in input_file:
+        formatted_line: str = COMMENT_WHITESPACE_REGEX.sub("", line)
+        if formatted_line:
+            yield decode(formatted_line)
 
 
 class Parser:
     """Encapsulates access to the input code. Reads an assembly language 
     command, parses it, and provides convenient access to the commands 
     components (fields and symbols). In addition, removes all white space and 
-    comments.
+    comments. Every line is decoded once, when the file is read. In streaming
+    mode, the lines are read and decoded as the parser advances instead, and
+    only the current and the next command are kept in memory.
     """
 
-    def __init__(self, input_file: typing.TextIO) -> None:
+    def __init__(self, input_file: typing.TextIO, stream: bool = False) -> None:
         """Opens the input file and gets ready to parse it.
         Args:
             input_file (typing.TextIO): input file.
+            stream (bool): if this is True, the file is read while parsing it.
+                The file must be seekable for reset() to work.
         """
-        self._formated_lines: list = []
+        self._input_file: typing.TextIO = input_file
+        self._stream: bool = stream
+        if stream:
+            self._stream_commands: typing.Iterator[Command] = read_commands(input_file)
+            self._next_command: typing.Optional[Command] = next(self._stream_commands, None)
+            return
+        self._commands: list[Command] = []
         input_lines: list[str] = input_file.read().splitlines()
         # Remove all comment lines and comments and all whitespace letters in line
         for line in input_lines:
-            formatted_line: str = re.sub(COMMENT_WHITESPACE_REGEX, "", line)
+            formatted_line: str = COMMENT_WHITESPACE_REGEX.sub("", line)
             if formatted_line:
-                self._formated_lines.append(formatted_line)
-        self._line_num: int = len(self._formated_lines)
+                self._commands.append(decode(formatted_line))
+        self._line_num: int = len(self._commands)
         self._current_line: int = 0
 
     def has_more_commands(self) -> bool:
@@ -44,20 +111,47 @@ class Parser:
         Returns:
             bool: True if there are more commands, False otherwise.
         """
+        if self._stream:
+            return self._next_command is not None
         return self._current_line < self._line_num
 
     def advance(self) -> None:
         """Reads the next command from the input and makes it the current command.
         Should be called only if has_more_commands() is true.
         """
-        self._current_command: str = self._formated_lines[self._current_line]
+        if self._stream:
+            self._current_command = self._next_command
+            self._next_command = next(self._stream_commands, None)
+            return
+        self._current_command: Command = self._commands[self._current_line]
         self._current_line += 1
 
     def reset(self) -> None:
         """Resets current pass back to the beginning of the file
         """
+        if self._stream:
+            self._input_file.seek(0)
+            self._stream_commands = read_commands(self._input_file)
+            self._next_command = next(self._stream_commands, None)
+            return
         self._current_line = 0
-        self._current_command = self._formated_lines[self._current_line]
+        self._current_command = self._commands[self._current_line]
+
+    def commands(self) -> list[Command]:
+        """
+        Returns:
+            list[Command]: all the decoded commands of the file. Should not
+            be called in streaming mode.
+        """
+        return self._commands
+
+    def kind(self) -> int:
+        """
+        Returns:
+            int: the kind of the current command, A_COMMAND, C_COMMAND,
+            L_COMMAND or NO_COMMAND.
+        """
+        return self._current_command.kind
 
     def command_type(self) -> str:
         """
@@ -67,13 +161,7 @@ class Parser:
             "C_COMMAND" for dest=comp;jump
             "L_COMMAND" (actually, pseudo-command) for (Xxx) where Xxx is a symbol
         """
-        if re.match(L_COMMAND_REGEX, self._current_command):
-            return "L_COMMAND"
-        if re.match(A_COMMAND_REGEX, self._current_command):
-            return "A_COMMAND"
-        if re.match(C_COMMAND_REGEX, self._current_command):
-            return "C_COMMAND"
-        return ""
+        return COMMAND_TYPES[self._current_command.kind]
 
     def symbol(self) -> str:
         """
@@ -82,9 +170,15 @@ class Parser:
             (Xxx). Should be called only when command_type() is "A_COMMAND" or 
             "L_COMMAND".
         """
-        match: typing.Optional[Match[str]] = re.search(
-            SYMBOL_REGEX, self._current_command)
-        return match.group() if match else ""
+        return self._current_command.symbol
+
+    def instruction(self) -> str:
+        """
+        Returns:
+            str: the current C-command, dest=comp;jump, without whitespace.
+            Should be called only when commandType() is "C_COMMAND".
+        """
+        return self._current_command.text
 
     def dest(self) -> str:
         """
@@ -92,7 +186,7 @@ class Parser:
             str: the dest mnemonic in the current C-command. Should be called 
             only when commandType() is "C_COMMAND".
         """
-        return self._current_command.split('=')[0] if '=' in self._current_command else ""
+        return self._current_command.dest
 
     def comp(self) -> str:
         """
@@ -100,9 +194,7 @@ class Parser:
             str: the comp mnemonic in the current C-command. Should be called 
             only when commandType() is "C_COMMAND".
         """
-        parts: list[str] = self._current_command.split('=')
-        location:int = 1 if len(parts) > 1 else 0
-        return parts[location].split(';')[0] if ';' in self._current_command else parts[location]
+        return self._current_command.comp
 
     def jump(self) -> str:
         """
@@ -110,4 +202,4 @@ class Parser:
             str: the jump mnemonic in the current C-command. Should be called 
             only when commandType() is "C_COMMAND".
         """
-        return self._current_command.split(';')[-1] if ';' in self._current_command else ""
+        return self._current_command.jump
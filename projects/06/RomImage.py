@@ -0,0 +1,115 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import array
+import sys
+import typing
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Output formats: 16 characters of text per word, or packed 16-bit words in
+# the given byte order. A packed image has no header, so each byte order has
+# its own extension.
+FORMATS: tuple[str, ...] = ("text", "little", "big")
+EXTENSIONS: dict[str, str] = {"text": ".hack", "little": ".le.bin", "big": ".be.bin"}
+
+
+def new_image() -> array.array:
+    """
+    Returns:
+        array.array: an empty ROM image of unsigned 16-bit words.
+    """
+    return array.array('H')
+
+
+def write_text(words: typing.Iterable[int], output_file: typing.TextIO) -> None:
+    """Writes a ROM image in the .hack format, a word per line.
+
+    Args:
+        words: the words of the image.
+        output_file (typing.TextIO): writes all output to this file.
+    """
+    output_file.writelines([f'{word:016b}\n' for word in words])
+
+
+def write_packed(words: array.array, output_file: typing.BinaryIO, byteorder: str) -> None:
+    """Writes a ROM image as packed 16-bit words.
+
+    Args:
+        words (array.array): the words of the image.
+        output_file (typing.BinaryIO): writes all output to this file.
+        byteorder (str): "little" or "big".
+    """
+    if byteorder != sys.byteorder:
+        words = array.array('H', words)
+        words.byteswap()
+    words.tofile(output_file)
+
+
+def load_text(input_file: typing.TextIO) -> array.array:
+    """
+    Args:
+        input_file (typing.TextIO): a file in the .hack format.
+
+    Returns:
+        array.array: the words of the image.
+    """
+    return array.array('H', [int(line, 2) for line in input_file if line.strip()])
+
+
+def load_packed(input_file: typing.BinaryIO, byteorder: str) -> array.array:
+    """
+    Args:
+        input_file (typing.BinaryIO): a file of packed 16-bit words.
+        byteorder (str): "little" or "big".
+
+    Returns:
+        array.array: the words of the image.
+    """
+    words: array.array = new_image()
+    words.frombytes(input_file.read())
+    if byteorder != sys.byteorder:
+        words.byteswap()
+    return words
+
+
+def load_image(path: str, image_format: str = "text") -> array.array:
+    """
+    Args:
+        path (str): the path of a ROM image.
+        image_format (str): one of FORMATS.
+
+    Returns:
+        array.array: the words of the image.
+
+    Raises:
+        ValueError: if the extension of the path is that of another format.
+    """
+    for other_format, extension in EXTENSIONS.items():
+        if other_format != image_format and path.lower().endswith(extension):
+            raise ValueError(f"{path} is in the {other_format} format, not {image_format}")
+    if image_format == "text":
+        with open(path, 'r') as input_file:
+            return load_text(input_file)
+    with open(path, 'rb') as input_file:
+        return load_packed(input_file, image_format)
+
+
+def as_numpy(words: array.array) -> typing.Any:
+    """Views a ROM image as a NumPy array, without copying it.
+
+    Args:
+        words (array.array): the words of the image.
+
+    Returns:
+        numpy.ndarray: a uint16 array sharing the memory of words.
+    """
+    if numpy is None:
+        raise ImportError("NumPy is required to view a ROM image as a NumPy array")
+    return numpy.frombuffer(words, dtype=numpy.uint16)
@@ -12,18 +12,41 @@ from typing import List, Dict, TextIO
 STACK_POP = ["@SP", "AM=M-1", "D=M"]
 # ["@SP", "A=M", "M=D", "@SP", "M=M+1"]
 STACK_PUSH = ["@SP", "M=M+1", "A=M-1", "M=D"]
+# Arithmetic on the stack top held in D, the second value is popped into M
+CACHED_OPERATIONS: Dict[str, str] = {"add": "D=D+M", "sub": "D=M-D", "neg": "D=-D", "and": "D=D&M",
+                                     "or": "D=D|M", "not": "D=!D", "shiftleft": "D=D<<", "shiftright": "D=D>>"}
+UNARY_COMMANDS: List[str] = ["neg", "not", "shiftleft", "shiftright"]
+# Pops into base segment indices up to this step A to the address, higher
+# indices store D above the stack while the address is computed
+MAX_STEPPED_INDEX: int = 7
+BASE_SEGMENTS: Dict[str, str] = {"local": "@1", "argument": "@2", "this": "@3", "that": "@4"}
+
+
+def count_instructions(code: List[str]) -> int:
+    """
+    Returns:
+        int: the number of instructions in the code, without comments and
+        labels.
+    """
+    return sum(1 for line in code if not line.startswith(("//", "(")))
 
 
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
-    def __init__(self, output_stream: TextIO) -> None:
+    def __init__(self, output_stream: TextIO, cache_stack_top: bool = False) -> None:
         """Initializes the CodeWriter.
         Args:
             output_stream (typing.TextIO): output stream.
+            cache_stack_top (bool): if this is True, the top of the stack is
+                kept in D between commands instead of being stored and loaded.
         """
         self._output_stream: TextIO = output_stream
         self._total_lines_written: int = 0
+        self._rom_size: int = 0
+        self._cache_stack_top: bool = cache_stack_top
+        # The top of the stack is in D and not in RAM
+        self._top_in_d: bool = False
         self._call_dict: Dict[str, int] = dict()
         self.comp_code: Dict[str, List] = {"eq": [6, 0, "JEQ"], "gt": [22, 0, "JGT"],
                                            "lt": [70, 0, "JLT"]}
@@ -33,6 +56,7 @@ class CodeWriter:
 
     def write_code(self, code) -> None:
         self._total_lines_written += len(code)
+        self._rom_size += count_instructions(code)
         self._output_stream.writelines(f"{line}\n" for line in code)
 
     def write_bootstrap(self) -> None:
@@ -48,6 +72,22 @@ class CodeWriter:
         self.write_code(code+["(COMP_INIT)"])
         # self.write_call("Sys.init", 0)
 
+    def spill(self) -> None:
+        """Stores the top of the stack from D back into RAM, if it is cached.
+        This is done before labels, jumps, calls and returns, so the stack is
+        in RAM wherever control flow meets.
+        """
+        if self._top_in_d:
+            self.write_code(["// SPILL"]+STACK_PUSH)
+            self._top_in_d = False
+
+    def rom_size(self) -> int:
+        """
+        Returns:
+            int: the number of instructions written so far.
+        """
+        return self._rom_size
+
     def set_file_name(self, filename: str) -> None:
         """Informs the code writer that the translation of a new VM file is
         started.
@@ -80,9 +120,16 @@ class CodeWriter:
         """
         # Handle comparator operations
         if command in self.comp_code:
+            self.spill()
             self.write_comp(command)
             return
         code: list[str] = [f"// ARITMETIC {command}"]
+        if self._top_in_d:
+            # The first argument is in D, leave the result there as well
+            code += [CACHED_OPERATIONS[command]] if command in UNARY_COMMANDS else \
+                ["@SP", "AM=M-1", CACHED_OPERATIONS[command]]
+            self.write_code(code)
+            return
         # Pop one argument from Stack into D  (D=Y)
         code += STACK_POP
         # If arithmetic command requires two paramaters,Pop from stack into M (M=X)
@@ -106,6 +153,9 @@ class CodeWriter:
         # be translated to the assembly symbol "Xxx.i". In the subsequent
         # assembly process, the Hack assembler will allocate these symbolic
         # variables to the RAM, starting at address 16.
+        if self._cache_stack_top:
+            self.write_cached_push_pop(command, segment, index)
+            return
         memory_segments: dict[str, list[str]] = {"local": ["@1", "D=M", f"@{index}", "A=A+D"],
                                                  "argument": ["@2", "D=M", f"@{index}", "A=A+D"],
                                                  "this": ["@3", "D=M", f"@{index}", "A=A+D"],
@@ -129,6 +179,42 @@ class CodeWriter:
                      "M=D"]
         self.write_code(code)
 
+    def write_cached_push_pop(self, command: str, segment: str, index: int) -> None:
+        """Writes a push that leaves the value in D, or a pop that takes the
+        value from D, when the stack top is cached.
+
+        Args:
+            command (str): "C_PUSH" or "C_POP".
+            segment (str): the memory segment to operate on.
+            index (int): the index in the memory segment.
+        """
+        fixed_addresses: dict[str, str] = {"temp": f"@{5+index}", "static": f"@{self._file_name}.{index}",
+                                           "pointer": f"@{3+index}"}
+        if command == "C_PUSH":
+            self.spill()
+            code: list[str] = [f"// PUSH {segment} {index}"]
+            if segment in BASE_SEGMENTS:
+                code += [BASE_SEGMENTS[segment], "D=M", f"@{index}", "A=A+D", "D=M"]
+            elif segment == "constant":
+                code += [f"@{index}", "D=A"]
+            else:
+                code += [fixed_addresses[segment], "D=M"]
+            self._top_in_d = True
+            self.write_code(code)
+            return
+        code = [f"// POP {segment} {index}"]
+        code += [] if self._top_in_d else STACK_POP
+        if segment in BASE_SEGMENTS and index <= MAX_STEPPED_INDEX:
+            code += [BASE_SEGMENTS[segment], "A=M"]+["A=A+1"]*index+["M=D"]
+        elif segment in BASE_SEGMENTS:
+            # Store D above the stack, then swap it with the address
+            code += ["@SP", "A=M", "M=D", f"@{index}", "D=A", BASE_SEGMENTS[segment], "D=D+M",
+                     "@SP", "A=M", "D=D+M", "A=D-M", "M=D-A"]
+        else:
+            code += [fixed_addresses[segment], "M=D"]
+        self._top_in_d = False
+        self.write_code(code)
+
     def write_label(self, label: str) -> None:
         """Writes assembly code that affects the label command.
         Let "foo" be a function within the file Xxx.vm. The handling of
@@ -140,6 +226,7 @@ class CodeWriter:
         Args:
             label (str): the label to write.
         """
+        self.spill()
         code: list[str] = [f"//LABEL {label}"]
         code += [f"({self._function_name}${label})"] if self._function_name else [f"({label})"]
         self.write_code(code)
@@ -150,6 +237,7 @@ class CodeWriter:
         Args:
             label (str): the label to go to.
         """
+        self.spill()
         code: list[str] = [f"//GOTO {label}"]
         code += [f"@{self._function_name}${label}",
                  "0;JMP"] if self._function_name else [f"@{label}", "0;JMP"]
@@ -162,7 +250,8 @@ class CodeWriter:
             label (str): the label to go to.
         """
         code: list[str] = [f"// IF {label}"]
-        code += STACK_POP
+        code += [] if self._top_in_d else STACK_POP
+        self._top_in_d = False
         code += [f"@{self._function_name}${label}",
                  "D;JNE"] if self._function_name else [f"@{label}", "D;JNE"]
         self.write_code(code)
@@ -179,6 +268,7 @@ class CodeWriter:
             function_name (str): the name of the function.
             n_vars (int): the number of local variables of the function.
         """
+        self.spill()
         code: list[str] = [f"// FUNCTION {function_name} vars:{n_vars}"]
         self._function_name = function_name
         if function_name not in self._call_dict:
@@ -203,6 +293,7 @@ class CodeWriter:
             function_name (str): the name of the function to call.
             n_args (int): the number of arguments of the function.
         """
+        self.spill()
         code: list[str] = [f"// CALL {function_name} vars:{n_args}"]
         # Push return address into stack
         if function_name not in self._call_dict:
@@ -230,6 +321,7 @@ class CodeWriter:
 
     def write_return(self) -> None:
         """Writes assembly code that affects the return command."""
+        self.spill()
         code: list[str] = [f"// RETURN {self._function_name}"]
         # Put frame(R14) = LCL
         code += ["@LCL", "D=M", "@R14", "M=D"]
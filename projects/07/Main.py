@@ -4,6 +4,8 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import io
 import os
 import sys
 import typing
@@ -12,15 +14,21 @@ from CodeWriter import CodeWriter
 
 
 def translate_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        cache_stack_top: bool = False) -> int:
     """Translates a single file.
 
     Args:
         input_file (typing.TextIO): the file to translate.
         output_file (typing.TextIO): writes all output to this file.
+        cache_stack_top (bool): if this is True, the top of the stack is kept
+            in the D register between commands.
+
+    Returns:
+        int: the number of ROM instructions written.
     """
     parser: Parser = Parser(input_file)
-    code_writer: CodeWriter = CodeWriter(output_file)
+    code_writer: CodeWriter = CodeWriter(output_file, cache_stack_top)
     code_writer.set_file_name(input_file.name)
     while parser.has_more_commands():
         parser.advance()
@@ -29,6 +37,8 @@ def translate_file(
         elif parser.command_type() in ["C_PUSH", "C_POP"]:
             code_writer.write_push_pop(
                 parser.command_type(), parser.arg1(), parser.arg2())
+    code_writer.spill()
+    return code_writer.rom_size()
 
 
 if "__main__" == __name__:
@@ -37,9 +47,13 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    # With --cache-stack-top, the ROM size is reported with and without it.
+    argument_parser = argparse.ArgumentParser(prog="VMtranslator")
+    argument_parser.add_argument("input_path", help="a .vm file or a directory of .vm files")
+    argument_parser.add_argument("--cache-stack-top", action="store_true",
+                                 help="keep the top of the stack in the D register between commands")
+    arguments = argument_parser.parse_args()
+    argument_path = os.path.abspath(arguments.input_path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
@@ -50,10 +64,17 @@ if "__main__" == __name__:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
     output_path += ".asm"
+    files_to_translate = [input_path for input_path in files_to_translate
+                          if os.path.splitext(input_path)[1].lower() == ".vm"]
+    rom_size = 0
     with open(output_path, 'w') as output_file:
         for input_path in files_to_translate:
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
             with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file)
+                rom_size += translate_file(input_file, output_file, arguments.cache_stack_top)
+    if arguments.cache_stack_top:
+        unoptimized_rom_size = 0
+        for input_path in files_to_translate:
+            with open(input_path, 'r') as input_file:
+                unoptimized_rom_size += translate_file(input_file, io.StringIO())
+        print(f"ROM size: {unoptimized_rom_size} instructions without optimizations, {rom_size} with "
+              f"cache stack top ({unoptimized_rom_size - rom_size} saved)", file=sys.stderr)
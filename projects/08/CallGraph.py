@@ -0,0 +1,120 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from PeepholeOptimizer import Command
+
+ENTRY_FUNCTION: str = "Sys.init"
+# Commands that jump to a label, and commands after which the next command
+# only runs if something jumps to it
+JUMPS: tuple[str, ...] = ("C_GOTO", "C_IF", "C_IF_NOT")
+UNCONDITIONAL_JUMPS: tuple[str, ...] = ("C_GOTO", "C_RETURN")
+
+
+class CallGraph:
+    """The functions of a whole program and the functions each of them calls,
+    built from the function and call commands of all its files.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, set[str]] = dict()
+        # Functions called by code outside of any function
+        self._top_level_calls: set[str] = set()
+
+    def add_commands(self, commands: typing.Iterable[Command]) -> None:
+        """Adds the functions of a single file to the graph.
+
+        Args:
+            commands: the commands of the file.
+        """
+        calls: set[str] = self._top_level_calls
+        for command in commands:
+            if command[0] == "C_FUNCTION":
+                calls = self._calls.setdefault(command[1], set())
+            elif command[0] == "C_CALL":
+                calls.add(command[1])
+
+    def functions(self) -> set[str]:
+        """
+        Returns:
+            set[str]: the names of all the functions in the program.
+        """
+        return set(self._calls)
+
+    def reachable(self, entry: str = ENTRY_FUNCTION) -> set[str]:
+        """
+        Args:
+            entry (str): the function the program starts from.
+
+        Returns:
+            set[str]: the functions that may be called when the program runs.
+        """
+        reachable: set[str] = set()
+        pending: list[str] = [entry, *self._top_level_calls]
+        while pending:
+            function = pending.pop()
+            if function not in reachable:
+                reachable.add(function)
+                pending += self._calls.get(function, ())
+        return reachable
+
+
+def live_commands(commands: typing.Iterable[Command], live_functions: set[str]) -> typing.Iterator[Command]:
+    """
+    Args:
+        commands: the commands of a single file.
+        live_functions: the functions to keep.
+
+    Yields:
+        The commands, without the functions that aren't live. Commands
+        outside of any function are kept.
+    """
+    live: bool = True
+    for command in commands:
+        if command[0] == "C_FUNCTION":
+            live = command[1] in live_functions
+        if live:
+            yield command
+
+
+def reachable_commands(commands: typing.Iterable[Command]) -> list[Command]:
+    """Removes the commands that can never run, like the branch of a
+    constant-false if-goto once the optimizer dropped it. The commands after
+    a goto or a return are removed up to the next label that a remaining
+    jump of the same function targets, or up to the next function. Removing
+    a jump may leave its label unused, so this repeats until nothing changes.
+
+    Args:
+        commands: the commands of a single file.
+
+    Returns:
+        list[Command]: the commands that may run.
+    """
+    remaining: list[Command] = list(commands)
+    while True:
+        # Labels are local to their function
+        targets: set[tuple[typing.Optional[str], str]] = set()
+        function: typing.Optional[str] = None
+        for command in remaining:
+            if command[0] == "C_FUNCTION":
+                function = command[1]
+            elif command[0] in JUMPS:
+                targets.add((function, command[1]))
+        kept: list[Command] = []
+        reachable: bool = True
+        function = None
+        for command in remaining:
+            if command[0] == "C_FUNCTION":
+                function = command[1]
+                reachable = True
+            elif command[0] == "C_LABEL" and (function, command[1]) in targets:
+                reachable = True
+            if reachable:
+                kept.append(command)
+                reachable = command[0] not in UNCONDITIONAL_JUMPS
+        if len(kept) == len(remaining):
+            return kept
+        remaining = kept
@@ -12,18 +12,60 @@ from typing import List, Dict, TextIO
 STACK_POP: list[str] = ["@SP", "AM=M-1", "D=M"]
 # Push value into stack from D
 STACK_PUSH: list[str] = ["@SP", "M=M+1", "A=M-1", "M=D"]
+# Shared call and return routines used by compact calls
+CALL_ROUTINE: str = "CALL_ROUTINE"
+RETURN_ROUTINE: str = "RETURN_ROUTINE"
+# Arithmetic on the stack top held in D, the second value is popped into M
+CACHED_OPERATIONS: Dict[str, str] = {"add": "D=D+M", "sub": "D=M-D", "neg": "D=-D", "and": "D=D&M",
+                                     "or": "D=D|M", "not": "D=!D", "shiftleft": "D=D<<", "shiftright": "D=D>>"}
+UNARY_COMMANDS: List[str] = ["neg", "not", "shiftleft", "shiftright"]
+# Pops into base segment indices up to this step A to the address, higher
+# indices store D above the stack while the address is computed
+MAX_STEPPED_INDEX: int = 7
+MAX_CONSTANT: int = 0x7FFF
+WORD_MASK: int = 0xFFFF
+
+
+def count_instructions(code: List[str]) -> int:
+    """
+    Returns:
+        int: the number of instructions in the code, without comments and
+        labels.
+    """
+    return sum(1 for line in code if not line.startswith(("//", "(")))
+
+
+def constant_code(value: int) -> List[str]:
+    """
+    Returns:
+        List[str]: code that loads a 16-bit word into D. Words above 32767
+        can't be loaded into A, so their complement is loaded instead.
+    """
+    if value <= MAX_CONSTANT:
+        return [f"@{value}", "D=A"]
+    return [f"@{~value & WORD_MASK}", "D=!A"]
 
 
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
-    def __init__(self, output_stream: TextIO) -> None:
+    def __init__(self, output_stream: TextIO, compact_calls: bool = False,
+                 cache_stack_top: bool = False) -> None:
         """Initializes the CodeWriter.
         Args:
             output_stream (typing.TextIO): output stream.
+            compact_calls (bool): if this is True, calls and returns jump to
+                routines shared by the whole program instead of being inlined.
+            cache_stack_top (bool): if this is True, the top of the stack is
+                kept in D between commands instead of being stored and loaded.
         """
         self._output_stream = output_stream
         self._total_lines_written = 0
+        self._rom_size: int = 0
+        self._compact_calls: bool = compact_calls
+        self._cache_stack_top: bool = cache_stack_top
+        # The top of the stack is in D and not in RAM
+        self._top_in_d: bool = False
         self._call_dict: Dict[str, int] = dict()
         self.comp_code: Dict[str, List] = {"eq": [6, 0, "JEQ"], "gt": [22, 0, "JGT"],
                                            "lt": [70, 0, "JLT"]}
@@ -32,6 +74,7 @@ class CodeWriter:
 
     def write_code(self, code) -> None:
         self._total_lines_written += len(code)
+        self._rom_size += count_instructions(code)
         self._output_stream.writelines(f"{line}\n" for line in code)
 
     def write_bootstrap(self) -> None:
@@ -67,6 +110,25 @@ class CodeWriter:
         # Return label
         self.write_code(code)
         #self.write_call(f"Sys.init", 0)
+        if self._compact_calls:
+            self.write_call_routine()
+            self.write_return_routine()
+
+    def spill(self) -> None:
+        """Stores the top of the stack from D back into RAM, if it is cached.
+        This is done before labels, jumps, calls and returns, so the stack is
+        in RAM wherever control flow meets.
+        """
+        if self._top_in_d:
+            self.write_code(["// SPILL"]+STACK_PUSH)
+            self._top_in_d = False
+
+    def rom_size(self) -> int:
+        """
+        Returns:
+            int: the number of instructions written so far.
+        """
+        return self._rom_size
 
     def set_file_name(self, filename: str) -> None:
         """Informs the code writer that the translation of a new VM file is
@@ -80,11 +142,13 @@ class CodeWriter:
     def write_comp(self, command: str) -> None:
         # self.comp_code = { COMMAND : [ROW_NUM,OCCURENCES,SYMBOL] }
         code: list[str] = [f"// COMP {command}"]
-        code += [f"@RET_COMP_{self.comp_code[command][2]}{self.comp_code[command][1]}",
+        # Every file has its own code writer, so labels are prefixed by the file name
+        return_label: str = f"{self._file_name}$RET_COMP_{self.comp_code[command][2]}{self.comp_code[command][1]}"
+        code += [f"@{return_label}",
                  "D=A",
                  f"@{self.comp_code[command][0]}",
                  "0;JMP",
-                 f"(RET_COMP_{self.comp_code[command][2]}{self.comp_code[command][1]})"]
+                 f"({return_label})"]
         # Increase call count
         self.comp_code[command][1] += 1
         self.write_code(code)
@@ -100,9 +164,16 @@ class CodeWriter:
         """
         # Handle comparator operations
         if command in self.comp_code:
+            self.spill()
             self.write_comp(command)
             return
         code: list[str] = [f"// ARITMETIC {command}"]
+        if self._top_in_d:
+            # The first argument is in D, leave the result there as well
+            code += [CACHED_OPERATIONS[command]] if command in UNARY_COMMANDS else \
+                ["@SP", "AM=M-1", CACHED_OPERATIONS[command]]
+            self.write_code(code)
+            return
         # Pop one argument from Stack into D  (D=Y)
         code += STACK_POP
         # If arithmetic command requires two paramaters,Pop from stack into M (M=X)
@@ -122,13 +193,16 @@ class CodeWriter:
             segment (str): the memory segment to operate on.
             index (int): the index in the memory segment.
         """
+        if self._cache_stack_top:
+            self.write_cached_push_pop(command, segment, index)
+            return
         code=[]
         segments=["local","argument","this","that"]
         if command=="C_PUSH":
             if segment in segments:
                 code+=[f"@{index}", "D=A",f"@{segments.index(segment)+1}", "A=M+D", "D=M"]
             elif segment=="constant":
-                code+=[f"@{index}", "D=A"]
+                code+=constant_code(index)
             elif segment=="temp":
                 code+=[f"@{index+5}", "D=M"]
             elif segment=="static":
@@ -147,6 +221,74 @@ class CodeWriter:
                 code+=["@SP","AM=M-1","D=M",f"@{4 if index else 3}", "M=D"]
         self.write_code(code)
 
+    def write_cached_push_pop(self, command: str, segment: str, index: int) -> None:
+        """Writes a push that leaves the value in D, or a pop that takes the
+        value from D, when the stack top is cached.
+
+        Args:
+            command (str): "C_PUSH" or "C_POP".
+            segment (str): the memory segment to operate on.
+            index (int): the index in the memory segment.
+        """
+        if command == "C_PUSH":
+            self.spill()
+            self._top_in_d = True
+            self.write_code([f"// PUSH {segment} {index}"]+self.load_code(segment, index))
+            return
+        code: list[str] = [f"// POP {segment} {index}"]
+        code += [] if self._top_in_d else STACK_POP
+        self._top_in_d = False
+        self.write_code(code+self.store_code(segment, index))
+
+    def write_move(self, segment: str, index: int, pop_segment: str, pop_index: int) -> None:
+        """Writes a push immediately followed by a pop, without going through
+        the stack.
+
+        Args:
+            segment (str): the memory segment to push from.
+            index (int): the index in the segment to push from.
+            pop_segment (str): the memory segment to pop into.
+            pop_index (int): the index in the segment to pop into.
+        """
+        self.spill()
+        code: list[str] = [f"// MOVE {segment} {index} TO {pop_segment} {pop_index}"]
+        code += self.load_code(segment, index)+self.store_code(pop_segment, pop_index)
+        self.write_code(code)
+
+    def load_code(self, segment: str, index: int) -> List[str]:
+        """
+        Returns:
+            List[str]: code that loads the value in the segment index into D.
+        """
+        segments: list[str] = ["local", "argument", "this", "that"]
+        if segment in segments:
+            return [f"@{index}", "D=A", f"@{segments.index(segment)+1}", "A=M+D", "D=M"]
+        if segment == "constant":
+            return constant_code(index)
+        if segment == "temp":
+            return [f"@{index+5}", "D=M"]
+        if segment == "static":
+            return [f"@{self._file_name}.{index}", "D=M"]
+        return [f"@{4 if index else 3}", "D=M"]  # pointer
+
+    def store_code(self, segment: str, index: int) -> List[str]:
+        """
+        Returns:
+            List[str]: code that stores D into the segment index. The word
+            above the stack may be overwritten.
+        """
+        segments: list[str] = ["local", "argument", "this", "that"]
+        if segment in segments and index <= MAX_STEPPED_INDEX:
+            return [f"@{segments.index(segment)+1}", "A=M"]+["A=A+1"]*index+["M=D"]
+        if segment in segments:
+            # Store D above the stack, then swap it with the address as in a normal pop
+            return ["@SP", "A=M", "M=D", f"@{index}", "D=A", f"@{segments.index(segment)+1}", "D=D+M",
+                    "@SP", "A=M", "D=D+M", "A=D-M", "M=D-A"]
+        if segment == "temp":
+            return [f"@{5+index}", "M=D"]
+        if segment == "static":
+            return [f"@{self._file_name}.{index}", "M=D"]
+        return [f"@{4 if index else 3}", "M=D"]  # pointer
 
     def write_label(self, label: str) -> None:
         """Writes assembly code that affects the label command.
@@ -159,6 +301,7 @@ class CodeWriter:
         Args:
             label (str): the label to write.
         """
+        self.spill()
         code: list[str] = [f"//LABEL {label}"]
         code += [f"({self._function_name}${label})"] if self._function_name else [f"({label})"]
         self.write_code(code)
@@ -169,6 +312,7 @@ class CodeWriter:
         Args:
             label (str): the label to go to.
         """
+        self.spill()
         code: list[str] = [f"//GOTO {label}"]
         code += [f"@{self._function_name}${label}",
                  "0;JMP"] if self._function_name else [f"@{label}", "0;JMP"]
@@ -181,7 +325,23 @@ class CodeWriter:
             label (str): the label to go to.
         """
         code: list[str] = [f"// IF {label}"]
-        code += STACK_POP
+        code += [] if self._top_in_d else STACK_POP
+        self._top_in_d = False
+        code += [f"@{self._function_name}${label}",
+                 "D;JNE"] if self._function_name else [f"@{label}", "D;JNE"]
+        self.write_code(code)
+
+    def write_if_not(self, label: str) -> None:
+        """Writes a "not" followed by an if-goto: jumps unless the value popped
+        from the stack is -1.
+
+        Args:
+            label (str): the label to go to.
+        """
+        code: list[str] = [f"// IF NOT {label}"]
+        code += [] if self._top_in_d else STACK_POP
+        self._top_in_d = False
+        code += ["D=D+1"]
         code += [f"@{self._function_name}${label}",
                  "D;JNE"] if self._function_name else [f"@{label}", "D;JNE"]
         self.write_code(code)
@@ -198,6 +358,7 @@ class CodeWriter:
             function_name (str): the name of the function.
             n_vars (int): the number of local variables of the function.
         """
+        self.spill()
         code: list[str] = [f"// FUNCTION {function_name} vars:{n_vars}"]
         self._function_name = function_name
         if function_name not in self._call_dict:
@@ -223,11 +384,16 @@ class CodeWriter:
             function_name (str): the name of the function to call.
             n_args (int): the number of arguments of the function.
         """
+        self.spill()
         code: list[str] = [f"// CALL {function_name} vars:{n_args}"]
         # Push return address into stack
         if function_name not in self._call_dict:
             self._call_dict[function_name] = 0
         return_address: str = f"{self._function_name}$ret{self._call_dict[self._function_name]}"
+        if self._compact_calls:
+            self._call_dict[self._function_name] += 1
+            self.write_compact_call(function_name, n_args, return_address)
+            return
         # Push return address
         code += [f"@{return_address}", "D=A"]+STACK_PUSH
         self._call_dict[self._function_name] += 1
@@ -250,9 +416,61 @@ class CodeWriter:
         code += [f"({return_address})"]
         self.write_code(code)
 
+    def write_compact_call(self, function_name: str, n_args: int, return_address: str) -> None:
+        """Writes a call that jumps to the shared call routine, with R15=n_args,
+        R13=the function address and D=the return address.
+
+        Args:
+            function_name (str): the name of the function to call.
+            n_args (int): the number of arguments of the function.
+            return_address (str): the label the function returns to.
+        """
+        code: list[str] = [f"// COMPACT CALL {function_name} vars:{n_args}"]
+        code += [f"@{n_args}", "D=A", "@R15", "M=D"]
+        code += [f"@{function_name}", "D=A", "@R13", "M=D"]
+        code += [f"@{return_address}", "D=A", f"@{CALL_ROUTINE}", "0;JMP"]
+        code += [f"({return_address})"]
+        self.write_code(code)
+
+    def write_call_routine(self) -> None:
+        """Writes the call routine shared by compact calls. It pushes the
+        return address from D and the frame of the caller, repositions ARG and
+        LCL and jumps to the function address in R13.
+        """
+        code: list[str] = ["// CALL ROUTINE", f"({CALL_ROUTINE})"]
+        # Push return address from D
+        code += STACK_PUSH
+        # Push LCL, ARG, THIS and THAT into stack
+        for pointer in ["LCL", "ARG", "THIS", "THAT"]:
+            code += [f"@{pointer}", "D=M"]+STACK_PUSH
+        # Set ARG = SP-5-n_args
+        code += ["@R15", "D=M", "@5", "D=D+A", "@SP", "D=M-D", "@ARG", "M=D"]
+        # Set LCL = SP
+        code += ["@SP", "D=M", "@LCL", "M=D"]
+        # Go to function
+        code += ["@R13", "A=M", "0;JMP"]
+        self.write_code(code)
+
+    def write_return_routine(self) -> None:
+        """Writes the return routine shared by compact returns."""
+        self.write_code(["// RETURN ROUTINE", f"({RETURN_ROUTINE})"] + self.return_code())
+
     def write_return(self) -> None:
         """Writes assembly code that affects the return command."""
+        self.spill()
         code: list[str] = [f"// RETURN {self._function_name}"]
+        if self._compact_calls:
+            code += [f"@{RETURN_ROUTINE}", "0;JMP"]
+        else:
+            code += self.return_code()
+        self.write_code(code)
+
+    def return_code(self) -> List[str]:
+        """
+        Returns:
+            List[str]: the code that returns from the current function.
+        """
+        code: list[str] = []
         # Put frame(R14) = LCL
         code += ["@LCL", "D=M", "@R14", "M=D"]
         # Put retAddress(R15) = frame - 5
@@ -271,4 +489,4 @@ class CodeWriter:
         code += ["@R14", "AM=M-1", "D=M", "@LCL", "M=D"]
         # Go to return address
         code += ["@R15", "A=M", "0;JMP"]
-        self.write_code(code)
+        return code
@@ -4,16 +4,23 @@ https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
 and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0 
 Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import io
 import os
 import sys
 import typing
 from Parser import Parser
 from CodeWriter import CodeWriter
+from PeepholeOptimizer import Command, PeepholeOptimizer, read_commands
+from CallGraph import ENTRY_FUNCTION, CallGraph, live_commands, reachable_commands
 
 
 def translate_file(
         input_file: typing.TextIO, output_file: typing.TextIO,
-        bootstrap: bool) -> None:
+        bootstrap: bool, compact_calls: bool = False,
+        cache_stack_top: bool = False,
+        optimizer: typing.Optional[PeepholeOptimizer] = None,
+        live_functions: typing.Optional[set[str]] = None) -> int:
     """Translates a single file.
 
     Args:
@@ -21,33 +28,110 @@ def translate_file(
         output_file (typing.TextIO): writes all output to this file.
         bootstrap (bool): if this is True, the current file is the 
             first file we are translating.
+        compact_calls (bool): if this is True, calls and returns jump to
+            shared routines instead of being inlined.
+        cache_stack_top (bool): if this is True, the top of the stack is kept
+            in the D register between commands.
+        optimizer (PeepholeOptimizer): if given, rewrites the commands of the
+            file before they are translated.
+        live_functions (set[str]): if given, only these functions are
+            translated, without the commands that can never run.
+
+    Returns:
+        int: the number of ROM instructions written.
     """
     parser: Parser = Parser(input_file)
-    code_writer: CodeWriter = CodeWriter(output_file)
+    code_writer: CodeWriter = CodeWriter(output_file, compact_calls, cache_stack_top)
     code_writer.set_file_name(input_file.name)
     if(bootstrap):
         code_writer.write_bootstrap()
-    while parser.has_more_commands():
-        parser.advance()
-        command_type=parser.command_type()
-        if  command_type== "C_ARITHMETIC":
-            code_writer.write_arithmetic(parser.arg1())
-        elif command_type in ["C_PUSH", "C_POP"]:
-            code_writer.write_push_pop(
-                command_type, parser.arg1(), parser.arg2())
-        elif command_type == "C_LABEL":
-            code_writer.write_label(parser.arg1())
-        elif command_type == "C_GOTO":
-            code_writer.write_goto(parser.arg1())
-        elif command_type == "C_IF":
-            code_writer.write_if(parser.arg1())
-        elif command_type == "C_FUNCTION":
-            code_writer.write_function(parser.arg1(),parser.arg2())
-        elif command_type == "C_CALL":
-            code_writer.write_call(parser.arg1(),parser.arg2())
-        elif command_type == "C_RETURN":
-            code_writer.write_return()
-            
+    commands: typing.Iterable[Command] = read_commands(parser)
+    if live_functions is not None:
+        commands = live_commands(commands, live_functions)
+    if optimizer:
+        commands = optimizer.optimize(commands)
+    if live_functions is not None:
+        # Calls left in unreachable code may name functions that were removed
+        commands = reachable_commands(commands)
+    for command in commands:
+        write_command(code_writer, command)
+    code_writer.spill()
+    return code_writer.rom_size()
+
+
+def write_command(code_writer: CodeWriter, command: Command) -> None:
+    """Writes the translation of a single command.
+
+    Args:
+        code_writer (CodeWriter): writes the translation.
+        command (Command): the command to translate.
+    """
+    command_type, *args = command
+    if command_type == "C_ARITHMETIC":
+        code_writer.write_arithmetic(*args)
+    elif command_type in ["C_PUSH", "C_POP"]:
+        code_writer.write_push_pop(command_type, *args)
+    elif command_type == "C_LABEL":
+        code_writer.write_label(*args)
+    elif command_type == "C_GOTO":
+        code_writer.write_goto(*args)
+    elif command_type == "C_IF":
+        code_writer.write_if(*args)
+    elif command_type == "C_FUNCTION":
+        code_writer.write_function(*args)
+    elif command_type == "C_CALL":
+        code_writer.write_call(*args)
+    elif command_type == "C_RETURN":
+        code_writer.write_return()
+    elif command_type == "C_MOVE":
+        code_writer.write_move(*args)
+    elif command_type == "C_IF_NOT":
+        code_writer.write_if_not(*args)
+
+
+def translate_program(
+        files_to_translate: list[str], output_file: typing.TextIO,
+        **options: typing.Any) -> int:
+    """Translates the files of a program into a single output file, with the
+    bootstrap code before the first one.
+
+    Args:
+        files_to_translate (list[str]): paths of the .vm files to translate.
+        output_file (typing.TextIO): writes all output to this file.
+        options: passed on to translate_file.
+
+    Returns:
+        int: the number of ROM instructions written.
+    """
+    rom_size: int = 0
+    bootstrap: bool = True
+    for input_path in files_to_translate:
+        with open(input_path, 'r') as input_file:
+            rom_size += translate_file(input_file, output_file, bootstrap, **options)
+        bootstrap = False
+    return rom_size
+
+
+def build_call_graph(
+        files_to_translate: list[str],
+        optimizer: typing.Optional[PeepholeOptimizer] = None) -> CallGraph:
+    """Builds the call graph of a program.
+
+    Args:
+        files_to_translate (list[str]): paths of the .vm files of the program.
+        optimizer (PeepholeOptimizer): if given, the graph is built from the
+            optimized commands, where branches on constants were removed.
+            Calls in commands that can never run aren't counted.
+
+    Returns:
+        CallGraph: the call graph of the program.
+    """
+    call_graph: CallGraph = CallGraph()
+    for input_path in files_to_translate:
+        with open(input_path, 'r') as input_file:
+            commands: typing.Iterable[Command] = read_commands(Parser(input_file))
+            call_graph.add_commands(reachable_commands(optimizer.optimize(commands) if optimizer else commands))
+    return call_graph
 
 
 if "__main__" == __name__:
@@ -56,9 +140,25 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    # If any optimization is selected, the ROM size of the program is reported
+    # with and without the optimizations. With --peephole, the number of times
+    # each rule was applied is reported as well. With --remove-dead-functions,
+    # the functions that can't be called are reported.
+    argument_parser = argparse.ArgumentParser(prog="VMtranslator")
+    argument_parser.add_argument("input_path", help="a .vm file or a directory of .vm files")
+    argument_parser.add_argument("--compact-calls", action="store_true",
+                                 help="jump to shared call and return routines instead of inlining them")
+    argument_parser.add_argument("--cache-stack-top", action="store_true",
+                                 help="keep the top of the stack in the D register between commands")
+    argument_parser.add_argument("--peephole", action="store_true",
+                                 help="rewrite common sequences of VM commands before translating them")
+    argument_parser.add_argument("--remove-dead-functions", action="store_true",
+                                 help="don't translate functions that can't be reached from Sys.init")
+    arguments = argument_parser.parse_args()
+    options: dict[str, bool] = {"compact_calls": arguments.compact_calls,
+                                "cache_stack_top": arguments.cache_stack_top}
+    optimizer: typing.Optional[PeepholeOptimizer] = PeepholeOptimizer() if arguments.peephole else None
+    argument_path = os.path.abspath(arguments.input_path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
@@ -69,12 +169,31 @@ if "__main__" == __name__:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
     output_path += ".asm"
-    bootstrap = True
+    files_to_translate = [input_path for input_path in files_to_translate
+                          if os.path.splitext(input_path)[1].lower() == ".vm"]
+    live_functions: typing.Optional[set[str]] = None
+    if arguments.remove_dead_functions:
+        call_graph: CallGraph = build_call_graph(files_to_translate, PeepholeOptimizer() if optimizer else None)
+        if ENTRY_FUNCTION in call_graph.functions():
+            live_functions = call_graph.reachable()
     with open(output_path, 'w') as output_file:
-        for input_path in files_to_translate:
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
-            with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file, bootstrap)
-            bootstrap = False
+        rom_size = translate_program(files_to_translate, output_file, **options, optimizer=optimizer,
+                                     live_functions=live_functions)
+    if optimizer:
+        for name, count in optimizer.rule_counts.items():
+            print(f"{name}: applied {count} times", file=sys.stderr)
+    if live_functions is not None:
+        removed_functions = sorted(call_graph.functions() - live_functions)
+        full_rom_size = translate_program(files_to_translate, io.StringIO(), **options,
+                                          optimizer=PeepholeOptimizer() if optimizer else None)
+        print(f"Removed {len(removed_functions)} unreachable functions, saving {full_rom_size - rom_size} "
+              f"ROM words", file=sys.stderr)
+        for function in removed_functions:
+            print(f"  {function}", file=sys.stderr)
+    if any(options.values()) or optimizer or live_functions is not None:
+        unoptimized_rom_size = translate_program(files_to_translate, io.StringIO())
+        selected = ", ".join([option.replace("_", " ") for option, selected in options.items() if selected] +
+                             (["peephole"] if optimizer else []) +
+                             (["dead function removal"] if live_functions is not None else []))
+        print(f"ROM size: {unoptimized_rom_size} instructions without optimizations, {rom_size} with "
+              f"{selected} ({unoptimized_rom_size - rom_size} saved)", file=sys.stderr)
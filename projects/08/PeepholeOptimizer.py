@@ -0,0 +1,147 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Parser
+
+# A VM command is its type followed by its arguments, for example
+# ("C_PUSH", "local", 0) or ("C_ARITHMETIC", "add"). The optimizer adds two
+# command types the CodeWriter lowers directly:
+# ("C_MOVE", segment, index, pop_segment, pop_index) for a push and a pop,
+# ("C_IF_NOT", label) for a not and an if-goto.
+Command = typing.Tuple[typing.Any, ...]
+Rewrite = typing.Callable[[list[Command]], typing.Optional[list[Command]]]
+
+WORD_MASK: int = 0xFFFF
+UNARY_OPERATIONS: dict[str, typing.Callable[[int], int]] = {
+    "neg": lambda x: -x, "not": lambda x: ~x}
+BINARY_OPERATIONS: dict[str, typing.Callable[[int, int], int]] = {
+    "add": lambda x, y: x + y, "sub": lambda x, y: x - y, "and": lambda x, y: x & y, "or": lambda x, y: x | y}
+
+
+def read_commands(parser: Parser) -> typing.Iterator[Command]:
+    """
+    Yields:
+        The commands of the parsed file, in order.
+    """
+    while parser.has_more_commands():
+        parser.advance()
+        command_type: str = parser.command_type()
+        if command_type in ["C_PUSH", "C_POP", "C_FUNCTION", "C_CALL"]:
+            yield command_type, parser.arg1(), parser.arg2()
+        elif command_type == "C_RETURN":
+            yield command_type,
+        else:
+            yield command_type, parser.arg1()
+
+
+def is_constant(command: Command) -> bool:
+    return command[0] == "C_PUSH" and command[1] == "constant"
+
+
+def move(window: list[Command]) -> typing.Optional[list[Command]]:
+    """push X; pop Y -> a direct move from X to Y."""
+    push, pop = window
+    return [("C_MOVE", push[1], push[2], pop[1], pop[2])]
+
+
+def fold_unary(window: list[Command]) -> typing.Optional[list[Command]]:
+    """push constant a; neg/not -> push constant -a/~a. This turns
+    push constant 0; not into a push of -1.
+    """
+    push, operation = window
+    if not is_constant(push) or operation[1] not in UNARY_OPERATIONS:
+        return None
+    return [("C_PUSH", "constant", UNARY_OPERATIONS[operation[1]](push[2]) & WORD_MASK)]
+
+
+def fold_binary(window: list[Command]) -> typing.Optional[list[Command]]:
+    """push constant a; push constant b; add/sub/and/or -> push constant a op b."""
+    first, second, operation = window
+    if not is_constant(first) or not is_constant(second) or operation[1] not in BINARY_OPERATIONS:
+        return None
+    return [("C_PUSH", "constant", BINARY_OPERATIONS[operation[1]](first[2], second[2]) & WORD_MASK)]
+
+
+def inverted_branch(window: list[Command]) -> typing.Optional[list[Command]]:
+    """not; if-goto L -> a single branch taken unless the value is -1."""
+    operation, branch = window
+    return [("C_IF_NOT", branch[1])] if operation[1] == "not" else None
+
+
+def constant_branch(window: list[Command]) -> typing.Optional[list[Command]]:
+    """push constant c; if-goto L -> goto L if c isn't 0, nothing otherwise."""
+    push, branch = window
+    if not is_constant(push):
+        return None
+    return [("C_GOTO", branch[1])] if push[2] else []
+
+
+def goto_next_label(window: list[Command]) -> typing.Optional[list[Command]]:
+    """goto L; label L -> label L."""
+    goto, label = window
+    return [label] if goto[1] == label[1] else None
+
+
+# (rule name, command types of the window, rewrite), tried in order. A rewrite
+# returns the commands replacing the window, or None if it doesn't apply.
+RULES: list[tuple[str, tuple[str, ...], Rewrite]] = [
+    ("push/pop move", ("C_PUSH", "C_POP"), move),
+    ("constant unary", ("C_PUSH", "C_ARITHMETIC"), fold_unary),
+    ("constant binary", ("C_PUSH", "C_PUSH", "C_ARITHMETIC"), fold_binary),
+    ("inverted branch", ("C_ARITHMETIC", "C_IF"), inverted_branch),
+    ("constant branch", ("C_PUSH", "C_IF"), constant_branch),
+    ("goto next label", ("C_GOTO", "C_LABEL"), goto_next_label),
+]
+
+
+class PeepholeOptimizer:
+    """Rewrites short windows of VM commands into cheaper equivalent ones,
+    before they are translated. Every command is appended to the output, and
+    the rules are applied to the end of the output until none of them
+    applies, so rewritten commands are matched again.
+    """
+
+    def __init__(self, rules: list[tuple[str, tuple[str, ...], Rewrite]] = RULES) -> None:
+        """
+        Args:
+            rules: the rules to apply.
+        """
+        self._rules: list[tuple[str, tuple[str, ...], Rewrite]] = rules
+        self.rule_counts: dict[str, int] = {name: 0 for name, pattern, rewrite in rules}
+
+    def optimize(self, commands: typing.Iterable[Command]) -> list[Command]:
+        """
+        Args:
+            commands: the commands of a single file.
+
+        Returns:
+            list[Command]: the optimized commands.
+        """
+        output: list[Command] = []
+        for command in commands:
+            output.append(command)
+            while self.rewrite_tail(output):
+                pass
+        return output
+
+    def rewrite_tail(self, output: list[Command]) -> bool:
+        """Applies the first rule that matches the end of the output.
+
+        Returns:
+            bool: True if a rule was applied, False otherwise.
+        """
+        for name, pattern, rewrite in self._rules:
+            window: list[Command] = output[-len(pattern):]
+            if len(window) != len(pattern) or \
+                    any(command[0] != command_type for command, command_type in zip(window, pattern)):
+                continue
+            replacement = rewrite(window)
+            if replacement is not None:
+                output[-len(pattern):] = replacement
+                self.rule_counts[name] += 1
+                return True
+        return False
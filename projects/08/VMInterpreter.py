@@ -0,0 +1,343 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import time
+import typing
+from Parser import Parser
+from PeepholeOptimizer import Command, read_commands
+from CallGraph import ENTRY_FUNCTION
+
+RAM_SIZE: int = 0x8000  # RAM, the screen and the keyboard
+WORD_MASK: int = 0xFFFF
+SIGN_BIT: int = 0x8000
+STACK_BASE: int = 256
+STATIC_BASE: int = 16
+# The pointers of the base segments and the addresses of the fixed ones
+SP, LCL, ARG, THIS, THAT = range(5)
+BASE_SEGMENTS: dict[str, int] = {"local": LCL, "argument": ARG, "this": THIS, "that": THAT}
+FIXED_SEGMENTS: dict[str, int] = {"temp": 5, "pointer": 3}
+
+# Opcodes
+(PUSH_CONSTANT, PUSH_FIXED, PUSH_BASE, POP_FIXED, POP_BASE, ADD, SUB, NEG, EQ, GT, LT, AND, OR, NOT,
+ SHIFT_LEFT, SHIFT_RIGHT, GOTO, IF_GOTO, FUNCTION, CALL, RETURN, HALT) = range(22)
+ARITHMETIC_OPCODES: dict[str, int] = {
+    "add": ADD, "sub": SUB, "neg": NEG, "eq": EQ, "gt": GT, "lt": LT, "and": AND, "or": OR, "not": NOT,
+    "shiftleft": SHIFT_LEFT, "shiftright": SHIFT_RIGHT}
+
+
+class VMInterpreter:
+    """Runs VM programs directly, without translating them into assembly.
+    The commands of all the files are loaded into a single program, where
+    every command is an opcode and two integer arguments, kept in three
+    parallel lists. Labels and function names are resolved to command
+    indices when the program is loaded, and push and pop are resolved to
+    the address or the base pointer they use.
+
+    Memory has the layout of the Hack memory map: the pointers, temp and
+    static segments, the stack from 256, the screen at 16384 and the
+    keyboard at 24576. RAM holds unsigned 16-bit words. Static variables are
+    allocated from RAM[16], in the order they first appear in the program.
+    The stack pointer is kept in a local variable while running, and stored
+    in RAM[0] when a run ends. A return address pushed by a call is the
+    index of the command after it. A command that takes more values than the
+    stack holds raises a ValueError instead of reading below it.
+
+    SP starts at 256. A program with a Sys.init function starts with the
+    bootstrap, which calls it, and other programs start at their first
+    command.
+    """
+
+    def __init__(self, files: typing.Iterable[tuple[str, typing.Iterable[Command]]]) -> None:
+        """
+        Args:
+            files: (file name, commands) of every file of the program.
+        """
+        self.ram: list[int] = [0] * RAM_SIZE
+        self.opcodes: list[int] = []
+        self.firsts: list[int] = []
+        self.seconds: list[int] = []
+        # The command each opcode was loaded from
+        self.commands: list[Command] = []
+        self.function_indices: dict[str, int] = {}
+        self._statics: dict[str, int] = {}
+        label_indices: dict[str, int] = {}
+        # (command index, label) of every jump and (command index, function)
+        # of every call, resolved once all the commands are loaded
+        jumps: list[tuple[int, str]] = []
+        calls: list[tuple[int, str]] = []
+        for file_name, commands in files:
+            scope: str = file_name
+            for command in commands:
+                command_type, *args = command
+                if command_type == "C_LABEL":
+                    label_indices[f"{scope}${args[0]}"] = len(self.opcodes)
+                    continue
+                self.commands.append(command)
+                if command_type in ("C_GOTO", "C_IF"):
+                    jumps.append((len(self.opcodes), f"{scope}${args[0]}"))
+                    self._append(GOTO if command_type == "C_GOTO" else IF_GOTO)
+                elif command_type == "C_FUNCTION":
+                    scope = args[0]
+                    self.function_indices[args[0]] = len(self.opcodes)
+                    self._append(FUNCTION, args[1])
+                elif command_type == "C_CALL":
+                    calls.append((len(self.opcodes), args[0]))
+                    self._append(CALL, 0, args[1])
+                elif command_type == "C_RETURN":
+                    self._append(RETURN)
+                elif command_type == "C_ARITHMETIC":
+                    self._append(ARITHMETIC_OPCODES[args[0]])
+                else:
+                    self._append_push_pop(command_type, file_name, *args)
+        for index, label in jumps:
+            if label not in label_indices:
+                raise ValueError(f"Unknown label {label.split('$', 1)[1]} in {label.split('$', 1)[0]}")
+            self.firsts[index] = label_indices[label]
+        for index, function in calls:
+            if function not in self.function_indices:
+                raise ValueError(f"Call to undefined function {function}")
+            self.firsts[index] = self.function_indices[function]
+        self.ram[SP] = STACK_BASE
+        self.pc: int = 0
+        self.steps: int = 0
+        # The number of commands loaded from the files, the bootstrap and
+        # the final halt follow them
+        self.program_length: int = len(self.opcodes)
+        if ENTRY_FUNCTION in self.function_indices:
+            # The bootstrap calls Sys.init, and halts if it returns
+            self.pc = len(self.opcodes)
+            self.commands.append(("C_CALL", ENTRY_FUNCTION, 0))
+            self._append(CALL, self.function_indices[ENTRY_FUNCTION], 0)
+        self.commands.append(("C_HALT",))
+        self._append(HALT)
+
+    @classmethod
+    def from_paths(cls, input_paths: list[str]) -> "VMInterpreter":
+        """
+        Args:
+            input_paths (list[str]): paths of the .vm files of the program.
+
+        Returns:
+            VMInterpreter: an interpreter running the program.
+        """
+        files: list[tuple[str, list[Command]]] = []
+        for input_path in input_paths:
+            with open(input_path, 'r') as input_file:
+                files.append((os.path.splitext(os.path.basename(input_path))[0],
+                              list(read_commands(Parser(input_file)))))
+        return cls(files)
+
+    def _append(self, opcode: int, first: int = 0, second: int = 0) -> None:
+        self.opcodes.append(opcode)
+        self.firsts.append(first)
+        self.seconds.append(second)
+
+    def _append_push_pop(self, command_type: str, file_name: str, segment: str, index: int) -> None:
+        push: bool = command_type == "C_PUSH"
+        if segment == "constant":
+            self._append(PUSH_CONSTANT, index & WORD_MASK)
+        elif segment in BASE_SEGMENTS:
+            self._append(PUSH_BASE if push else POP_BASE, BASE_SEGMENTS[segment], index)
+        elif segment == "static":
+            address: int = self._statics.setdefault(f"{file_name}.{index}", STATIC_BASE + len(self._statics))
+            self._append(PUSH_FIXED if push else POP_FIXED, address)
+        else:
+            self._append(PUSH_FIXED if push else POP_FIXED, FIXED_SEGMENTS[segment] + index)
+
+    def read(self, address: int) -> int:
+        """
+        Returns:
+            int: the word at an address of RAM, as a signed integer.
+        """
+        word: int = self.ram[address]
+        return word - 0x10000 if word & SIGN_BIT else word
+
+    def write(self, address: int, value: int) -> None:
+        """Writes a signed or unsigned integer to an address of RAM."""
+        self.ram[address] = value & WORD_MASK
+
+    def run(self, steps: int, stop_function: typing.Optional[str] = None) -> int:
+        """Runs the program for a number of commands, until the entry function
+        returns, or until a function is called.
+
+        Args:
+            steps (int): the maximal number of commands to run.
+            stop_function (str): if given, stops before running this
+                function, for example Sys.halt.
+
+        Returns:
+            int: the number of commands run.
+
+        Raises:
+            ValueError: if the stop function isn't defined, or the stack
+                underflows.
+        """
+        opcodes, firsts, seconds, ram = self.opcodes, self.firsts, self.seconds, self.ram
+        if stop_function and stop_function not in self.function_indices:
+            raise ValueError(f"Unknown function {stop_function}")
+        stop_index: int = self.function_indices[stop_function] if stop_function else -1
+        if stop_function:
+            stop_opcode, opcodes[stop_index] = opcodes[stop_index], HALT
+        sp, pc = ram[SP], self.pc
+        executed: int = 0
+        try:
+            while executed < steps:
+                opcode: int = opcodes[pc]
+                if opcode == PUSH_CONSTANT:
+                    ram[sp] = firsts[pc]
+                    sp += 1
+                elif opcode == PUSH_BASE:
+                    ram[sp] = ram[ram[firsts[pc]] + seconds[pc]]
+                    sp += 1
+                elif opcode == POP_BASE:
+                    if sp <= STACK_BASE:
+                        raise self._underflow(pc)
+                    sp -= 1
+                    ram[ram[firsts[pc]] + seconds[pc]] = ram[sp]
+                elif opcode == PUSH_FIXED:
+                    ram[sp] = ram[firsts[pc]]
+                    sp += 1
+                elif opcode == POP_FIXED:
+                    if sp <= STACK_BASE:
+                        raise self._underflow(pc)
+                    sp -= 1
+                    ram[firsts[pc]] = ram[sp]
+                elif opcode == IF_GOTO:
+                    if sp <= STACK_BASE:
+                        raise self._underflow(pc)
+                    sp -= 1
+                    if ram[sp]:
+                        pc = firsts[pc]
+                        executed += 1
+                        continue
+                elif opcode == GOTO:
+                    pc = firsts[pc]
+                    executed += 1
+                    continue
+                elif opcode == ADD:
+                    if sp <= STACK_BASE + 1:
+                        raise self._underflow(pc)
+                    sp -= 1
+                    ram[sp - 1] = (ram[sp - 1] + ram[sp]) & WORD_MASK
+                elif opcode == SUB:
+                    if sp <= STACK_BASE + 1:
+                        raise self._underflow(pc)
+                    sp -= 1
+                    ram[sp - 1] = (ram[sp - 1] - ram[sp]) & WORD_MASK
+                elif opcode == CALL:
+                    # Pushes the return address and the caller's frame
+                    ram[sp] = pc + 1
+                    ram[sp + 1:sp + 5] = ram[LCL:THAT + 1]
+                    sp += 5
+                    ram[ARG] = sp - 5 - seconds[pc]
+                    ram[LCL] = sp
+                    pc = firsts[pc]
+                    executed += 1
+                    continue
+                elif opcode == FUNCTION:
+                    ram[sp:sp + firsts[pc]] = [0] * firsts[pc]
+                    sp += firsts[pc]
+                elif opcode == RETURN:
+                    if sp <= STACK_BASE:
+                        raise self._underflow(pc)
+                    frame: int = ram[LCL]
+                    pc = ram[frame - 5]
+                    ram[ram[ARG]] = ram[sp - 1]
+                    sp = ram[ARG] + 1
+                    ram[LCL:THAT + 1] = ram[frame - 4:frame]
+                    executed += 1
+                    continue
+                elif opcode == EQ:
+                    if sp <= STACK_BASE + 1:
+                        raise self._underflow(pc)
+                    sp -= 1
+                    ram[sp - 1] = WORD_MASK if ram[sp - 1] == ram[sp] else 0
+                elif opcode == LT:
+                    # Flipping the sign bit orders the words as signed integers
+                    if sp <= STACK_BASE + 1:
+                        raise self._underflow(pc)
+                    sp -= 1
+                    ram[sp - 1] = WORD_MASK if ram[sp - 1] ^ SIGN_BIT < ram[sp] ^ SIGN_BIT else 0
+                elif opcode == GT:
+                    if sp <= STACK_BASE + 1:
+                        raise self._underflow(pc)
+                    sp -= 1
+                    ram[sp - 1] = WORD_MASK if ram[sp - 1] ^ SIGN_BIT > ram[sp] ^ SIGN_BIT else 0
+                elif opcode == NOT:
+                    if sp <= STACK_BASE:
+                        raise self._underflow(pc)
+                    ram[sp - 1] ^= WORD_MASK
+                elif opcode == NEG:
+                    if sp <= STACK_BASE:
+                        raise self._underflow(pc)
+                    ram[sp - 1] = -ram[sp - 1] & WORD_MASK
+                elif opcode == AND:
+                    if sp <= STACK_BASE + 1:
+                        raise self._underflow(pc)
+                    sp -= 1
+                    ram[sp - 1] &= ram[sp]
+                elif opcode == OR:
+                    if sp <= STACK_BASE + 1:
+                        raise self._underflow(pc)
+                    sp -= 1
+                    ram[sp - 1] |= ram[sp]
+                elif opcode == SHIFT_LEFT:
+                    if sp <= STACK_BASE:
+                        raise self._underflow(pc)
+                    ram[sp - 1] = (ram[sp - 1] << 1) & WORD_MASK
+                elif opcode == SHIFT_RIGHT:
+                    if sp <= STACK_BASE:
+                        raise self._underflow(pc)
+                    ram[sp - 1] = (ram[sp - 1] >> 1) | (ram[sp - 1] & SIGN_BIT)
+                else:  # HALT
+                    break
+                pc += 1
+                executed += 1
+        except IndexError:
+            raise IndexError(f"Address out of range at command {pc}") from None
+        finally:
+            if stop_function:
+                opcodes[stop_index] = stop_opcode
+            ram[SP], self.pc = sp, pc
+            self.steps += executed
+        return executed
+
+    def _underflow(self, pc: int) -> ValueError:
+        return ValueError(f"Stack underflow at command {pc}, {' '.join(map(str, self.commands[pc]))}")
+
+    def halted(self) -> bool:
+        """
+        Returns:
+            bool: True if the entry function returned, False otherwise.
+        """
+        return self.opcodes[self.pc] == HALT
+
+
+if "__main__" == __name__:
+    # Runs a .vm file or a directory of .vm files, and prints a range of RAM
+    # and the number of commands run per second.
+    argument_parser = argparse.ArgumentParser(prog="VMInterpreter")
+    argument_parser.add_argument("input_path", help="a .vm file or a directory of .vm files")
+    argument_parser.add_argument("--steps", type=int, default=10_000_000, help="the number of commands to run")
+    argument_parser.add_argument("--stop-function", help="stop when this function is called, e.g. Sys.halt")
+    argument_parser.add_argument("--ram", type=int, nargs=2, default=[0, 16], metavar=("START", "END"),
+                                 help="the range of RAM to print")
+    arguments = argument_parser.parse_args()
+    argument_path: str = os.path.abspath(arguments.input_path)
+    if os.path.isdir(argument_path):
+        files_to_run = [os.path.join(argument_path, filename) for filename in sorted(os.listdir(argument_path))]
+    else:
+        files_to_run = [argument_path]
+    interpreter: VMInterpreter = VMInterpreter.from_paths(
+        [input_path for input_path in files_to_run if os.path.splitext(input_path)[1].lower() == ".vm"])
+    start: float = time.perf_counter()
+    executed: int = interpreter.run(arguments.steps, arguments.stop_function)
+    elapsed: float = time.perf_counter() - start
+    print(f"Ran {executed} commands in {elapsed:.3f} s ({executed / elapsed / 1e6:.2f} M commands/s)")
+    for address in range(*arguments.ram):
+        print(f"RAM[{address}] = {interpreter.read(address)}")
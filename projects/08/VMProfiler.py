@@ -0,0 +1,215 @@
+"""This file is part of nand2tetris, as taught in The Hebrew University,
+and was written by Aviv Yaish according to the specifications given in
+https://www.nand2tetris.org (Shimon Schocken and Noam Nisan, 2017)
+and as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported License (https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import collections
+import io
+import os
+import sys
+import typing
+from CodeWriter import CodeWriter
+from Main import write_command
+from PeepholeOptimizer import Command
+from VMInterpreter import CALL, HALT, RETURN, VMInterpreter
+
+BOOTSTRAP: str = "(bootstrap)"
+TOP_LEVEL: str = "(top level)"
+
+
+def command_costs(commands: list[Command]) -> list[int]:
+    """Estimates the Hack cycles of every command by translating it alone.
+    The code of a command is counted once, so loops in it aren't counted
+    again, and neither are the routines shared by comparisons.
+
+    Args:
+        commands (list[Command]): the commands of the program.
+
+    Returns:
+        list[int]: the number of Hack instructions of each command.
+    """
+    code_writer: CodeWriter = CodeWriter(io.StringIO())
+    code_writer.set_file_name("Profile.vm")
+    costs: list[int] = []
+    for command in commands:
+        rom_size: int = code_writer.rom_size()
+        write_command(code_writer, command)
+        costs.append(code_writer.rom_size() - rom_size)
+    return costs
+
+
+def command_functions(interpreter: VMInterpreter) -> list[str]:
+    """
+    Returns:
+        list[str]: the name of the function each command of the program
+        belongs to.
+    """
+    functions: list[str] = []
+    function: str = TOP_LEVEL
+    for index, command in enumerate(interpreter.commands):
+        if index >= interpreter.program_length:
+            function = BOOTSTRAP
+        elif command[0] == "C_FUNCTION":
+            function = command[1]
+        functions.append(function)
+    return functions
+
+
+class VMProfiler:
+    """Profiles a program run by a VMInterpreter, a command at a time. For
+    every function it counts the calls, and the VM commands and estimated
+    Hack cycles run by the function itself (exclusive) and with the
+    functions it calls (inclusive). Cycles of recursive calls are counted
+    once in the inclusive counts. The cycles of every call stack are kept
+    for a flame graph.
+    """
+
+    def __init__(self, interpreter: VMInterpreter) -> None:
+        """
+        Args:
+            interpreter (VMInterpreter): runs the program.
+        """
+        self.interpreter: VMInterpreter = interpreter
+        self.costs: list[int] = command_costs(interpreter.commands)
+        self.functions: list[str] = command_functions(interpreter)
+        self.calls: collections.Counter[str] = collections.Counter()
+        self.exclusive_commands: collections.Counter[str] = collections.Counter()
+        self.exclusive_cycles: collections.Counter[str] = collections.Counter()
+        self._inclusive_commands: collections.Counter[str] = collections.Counter()
+        self._inclusive_cycles: collections.Counter[str] = collections.Counter()
+        self.stack_cycles: collections.Counter[str] = collections.Counter()
+        self.total_commands: int = 0
+        self.total_cycles: int = 0
+        # (function, total commands and cycles when it was called) of every
+        # function on the call stack
+        self._stack: list[tuple[str, int, int]] = [(self.functions[interpreter.pc], 0, 0)]
+        self._stack_key: str = self._stack[0][0]
+        # How many times each function is on the call stack
+        self._depths: collections.Counter[str] = collections.Counter([self._stack_key])
+
+    def run(self, steps: int, stop_function: typing.Optional[str] = None) -> int:
+        """Runs the program for a number of commands, until the entry function
+        returns, or until a function is called.
+
+        Args:
+            steps (int): the maximal number of commands to run.
+            stop_function (str): if given, stops before running this
+                function, for example Sys.halt.
+
+        Returns:
+            int: the number of commands run.
+
+        Raises:
+            ValueError: if the stop function isn't defined, or the stack
+                underflows.
+        """
+        interpreter: VMInterpreter = self.interpreter
+        opcodes, firsts, costs, functions = interpreter.opcodes, interpreter.firsts, self.costs, self.functions
+        if stop_function and stop_function not in interpreter.function_indices:
+            raise ValueError(f"Unknown function {stop_function}")
+        stop_index: int = interpreter.function_indices[stop_function] if stop_function else -1
+        executed: int = 0
+        while executed < steps:
+            pc: int = interpreter.pc
+            opcode: int = opcodes[pc]
+            if opcode == HALT or pc == stop_index:
+                break
+            interpreter.run(1)
+            executed += 1
+            cost: int = costs[pc]
+            function: str = functions[pc]
+            self.total_commands += 1
+            self.total_cycles += cost
+            self.exclusive_commands[function] += 1
+            self.exclusive_cycles[function] += cost
+            self.stack_cycles[self._stack_key] += cost
+            if opcode == CALL:
+                callee: str = functions[firsts[pc]]
+                self.calls[callee] += 1
+                self._depths[callee] += 1
+                self._stack.append((callee, self.total_commands, self.total_cycles))
+                self._stack_key += ";" + callee
+            elif opcode == RETURN and len(self._stack) > 1:
+                self._add_inclusive(*self._stack.pop(), self._depths, self._inclusive_commands,
+                                    self._inclusive_cycles)
+                self._stack_key = self._stack_key.rsplit(";", 1)[0]
+        return executed
+
+    def _add_inclusive(self, function: str, commands: int, cycles: int, depths: collections.Counter[str],
+                       inclusive_commands: collections.Counter[str],
+                       inclusive_cycles: collections.Counter[str]) -> None:
+        # Only the outermost call of a recursive function is counted
+        depths[function] -= 1
+        if not depths[function]:
+            inclusive_commands[function] += self.total_commands - commands
+            inclusive_cycles[function] += self.total_cycles - cycles
+
+    def inclusive(self) -> tuple[collections.Counter[str], collections.Counter[str]]:
+        """
+        Returns:
+            tuple[Counter[str], Counter[str]]: the inclusive commands and
+            cycles of every function, including the calls still running.
+        """
+        inclusive_commands = self._inclusive_commands.copy()
+        inclusive_cycles = self._inclusive_cycles.copy()
+        depths: collections.Counter[str] = self._depths.copy()
+        for frame in reversed(self._stack):
+            self._add_inclusive(*frame, depths, inclusive_commands, inclusive_cycles)
+        return inclusive_commands, inclusive_cycles
+
+    def table(self, limit: typing.Optional[int] = None) -> str:
+        """
+        Args:
+            limit (int): if given, only this many functions are listed.
+
+        Returns:
+            str: a table of the functions, sorted by their exclusive cycles.
+        """
+        inclusive_commands, inclusive_cycles = self.inclusive()
+        rows: list[str] = [f"{'Function':<32} {'Calls':>9} {'Excl. cmds':>12} {'Incl. cmds':>12} "
+                           f"{'Excl. cycles':>13} {'Incl. cycles':>13} {'Excl. %':>7}"]
+        for function, cycles in self.exclusive_cycles.most_common(limit):
+            rows.append(f"{function:<32} {self.calls[function]:>9} {self.exclusive_commands[function]:>12} "
+                        f"{inclusive_commands[function]:>12} {cycles:>13} {inclusive_cycles[function]:>13} "
+                        f"{100 * cycles / max(self.total_cycles, 1):>6.1f}%")
+        return "\n".join(rows)
+
+    def write_collapsed(self, output_file: typing.TextIO) -> None:
+        """Writes the cycles of every call stack in the collapsed format of
+        flamegraph.pl, a stack of functions separated by semicolons and its
+        cycles on each line.
+
+        Args:
+            output_file (typing.TextIO): writes all output to this file.
+        """
+        for stack, cycles in sorted(self.stack_cycles.items()):
+            if cycles:
+                output_file.write(f"{stack} {cycles}\n")
+
+
+if "__main__" == __name__:
+    # Profiles a .vm file or a directory of .vm files. Prints a table of the
+    # functions that used the most Hack cycles, and with --collapsed writes
+    # the cycles of every call stack for flamegraph.pl.
+    argument_parser = argparse.ArgumentParser(prog="VMProfiler")
+    argument_parser.add_argument("input_path", help="a .vm file or a directory of .vm files")
+    argument_parser.add_argument("--steps", type=int, default=1_000_000, help="the number of commands to run")
+    argument_parser.add_argument("--stop-function", help="stop when this function is called, e.g. Sys.halt")
+    argument_parser.add_argument("--collapsed", help="write the call stacks to this file")
+    argument_parser.add_argument("--top", type=int, default=20, help="the number of functions to list")
+    arguments = argument_parser.parse_args()
+    argument_path: str = os.path.abspath(arguments.input_path)
+    if os.path.isdir(argument_path):
+        files_to_run = [os.path.join(argument_path, filename) for filename in sorted(os.listdir(argument_path))]
+    else:
+        files_to_run = [argument_path]
+    profiler: VMProfiler = VMProfiler(VMInterpreter.from_paths(
+        [input_path for input_path in files_to_run if os.path.splitext(input_path)[1].lower() == ".vm"]))
+    executed: int = profiler.run(arguments.steps, arguments.stop_function)
+    print(f"Ran {executed} commands, about {profiler.total_cycles} Hack cycles", file=sys.stderr)
+    print(profiler.table(arguments.top))
+    if arguments.collapsed:
+        with open(arguments.collapsed, 'w') as collapsed_file:
+            profiler.write_collapsed(collapsed_file)
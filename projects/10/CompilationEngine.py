@@ -5,7 +5,7 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
-from JackTokenizer import JackTokenizer
+from TokenStream import TokenStream
 
 COMMA_SEPERATOR = ","
 BACK_SLASH = "/"
@@ -14,11 +14,11 @@ SPECIAL_CHARS_DICT = {'&': "<symbol> &amp; </symbol>", '<': "<symbol> &lt; </sym
 
 
 class CompilationEngine:
-    """Gets input from a JackTokenizer and emits its parsed structure into an
+    """Gets input from a TokenStream and emits its parsed structure into an
     output stream.
     """
 
-    def __init__(self, input_stream: JackTokenizer, output_stream) -> None:
+    def __init__(self, input_stream: TokenStream, output_stream) -> None:
         """
         Creates a new compilation engine with the given input and output. The
         next routine called must be compileClass()
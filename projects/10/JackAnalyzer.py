@@ -9,7 +9,7 @@ import os
 import sys
 import typing
 from CompilationEngine import CompilationEngine
-from JackTokenizer import JackTokenizer
+from TokenStream import TokenStream, load_tokens
 
 
 def analyze_file(
@@ -20,7 +20,7 @@ def analyze_file(
         input_file (typing.TextIO): the file to analyze.
         output_file (typing.TextIO): writes all output to this file.
     """
-    tokenizer = JackTokenizer(input_file)
+    tokenizer = TokenStream(load_tokens(input_file))
     compilation_engine = CompilationEngine(tokenizer, output_file)
     tokenizer.advance()  # Advance first step into code
     compilation_engine.compile_class()
@@ -0,0 +1,144 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import sys
+import typing
+from array import array
+from JackTokenizer import scan_tokens
+
+# Token types in the order of their codes in TokenBuffer.types
+TOKEN_TYPES: tuple[str, ...] = ("keyword", "symbol", "identifier", "integerConstant", "stringConstant")
+TOKEN_TYPE_CODES: dict[str, int] = {token_type: code for code, token_type in enumerate(TOKEN_TYPES)}
+
+
+class TokenBuffer:
+    """All the tokens of a single class, stored in parallel arrays: the i-th
+    token is tokens[i], its type code is types[i] and it starts at
+    lines[i], columns[i] in the source.
+    """
+    __slots__ = ("types", "tokens", "lines", "columns")
+
+    def __init__(self, text: str) -> None:
+        """Tokenizes the given source code once.
+
+        Args:
+            text (str): the Jack source code.
+        """
+        self.types: array = array('B')
+        self.tokens: list[str] = []
+        self.lines: array = array('I')
+        self.columns: array = array('I')
+        for token_type, token, line, column in scan_tokens(text):
+            self.types.append(TOKEN_TYPE_CODES[token_type])
+            self.tokens.append(sys.intern(token))
+            self.lines.append(line)
+            self.columns.append(column)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+
+def load_tokens(input_file: typing.TextIO) -> TokenBuffer:
+    """Tokenizes the given file.
+
+    Args:
+        input_file (typing.TextIO): the file to tokenize.
+
+    Returns:
+        TokenBuffer: the tokens of the file.
+    """
+    return TokenBuffer(input_file.read())
+
+
+class TokenStream:
+    """A cursor over a TokenBuffer. Offers the same API as JackTokenizer, with
+    the addition of arbitrary lookahead through peek().
+    """
+
+    def __init__(self, token_buffer: TokenBuffer) -> None:
+        """Creates a cursor placed before the first token of the buffer.
+        Initially there is no current token.
+        """
+        self._buffer: TokenBuffer = token_buffer
+        self._tokens: list[str] = token_buffer.tokens
+        self._length: int = len(token_buffer)
+        self._position: int = -1
+        self._token: str = ""
+        self._token_type: str = ""
+
+    def has_more_tokens(self) -> bool:
+        """
+        Returns True if there are more tokens in the input.
+        """
+        return self._position + 1 < self._length
+
+    def advance(self) -> None:
+        """Makes the next token the current token. Does nothing if there are
+        no more tokens.
+        """
+        if not self.has_more_tokens():
+            return
+        self._position += 1
+        self._token = self._tokens[self._position]
+        self._token_type = TOKEN_TYPES[self._buffer.types[self._position]]
+
+    def reset(self) -> None:
+        """Moves the cursor back before the first token."""
+        self._position = -1
+        self._token = ""
+        self._token_type = ""
+
+    def peek(self, k: int = 1) -> str:
+        """
+        Args:
+            k (int): how many tokens to look ahead, 0 is the current token.
+
+        Returns:
+            str: the k-th token after the current token, or "" if the input
+            ends before it.
+        """
+        position: int = self._position + k
+        return self._tokens[position] if 0 <= position < self._length else ""
+
+    def peek_type(self, k: int = 1) -> str:
+        """
+        Args:
+            k (int): how many tokens to look ahead, 0 is the current token.
+
+        Returns:
+            str: the type of the k-th token after the current token, or "" if
+            the input ends before it.
+        """
+        position: int = self._position + k
+        return TOKEN_TYPES[self._buffer.types[position]] if 0 <= position < self._length else ""
+
+    def token_type(self) -> str:
+        """
+        Returns:
+            str: the type of the current token, can be
+            "keyword", "symbol", "identifier", "integerConstant", "stringConstant"
+        """
+        return self._token_type
+
+    def token_output_xml(self) -> str:
+        """
+        Returns:
+            str: the current token in proper xml format
+        """
+        return f"<{self._token_type}> {self._token} </{self._token_type}>"
+
+    def token(self) -> str:
+        """
+        Returns: The current token
+        """
+        return self._token
+
+    def line(self) -> int:
+        """
+        Returns: The source line of the current token, 0 if there is none
+        """
+        return self._buffer.lines[self._position] if self._position >= 0 else 0
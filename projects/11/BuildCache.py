@@ -0,0 +1,132 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import glob
+import hashlib
+import os
+import shutil
+
+CACHE_ENTRY_EXTENSION: str = ".vm"
+DEFAULT_MAX_BYTES: int = 64 * 1024 * 1024
+
+
+def compiler_version() -> str:
+    """
+    Returns:
+        str: a hash of the compiler's own source files, so any change to the
+        compiler invalidates everything it compiled before.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py"))):
+        with open(path, 'rb') as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """A persistent cache of compiled .vm files. Each entry is keyed by the
+    SHA-256 of a .jack file's contents, the compiler version and the options
+    it was compiled with. Once the cache directory grows past its size limit,
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES, options: str = "") -> None:
+        """Opens the cache directory, creating it if needed.
+
+        Args:
+            cache_dir (str): the directory the entries are stored in.
+            max_bytes (int): the size limit of the cache directory.
+            options (str): the compiler options, entries compiled with other
+            options are never reused.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self._cache_dir: str = cache_dir
+        self._max_bytes: int = max_bytes
+        self._salt: bytes = f"{compiler_version()}:{options}:".encode()
+        self._pending_keys: dict[str, str] = dict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.bytes_saved: int = 0
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._cache_dir, key + CACHE_ENTRY_EXTENSION)
+
+    def key(self, input_path: str) -> str:
+        """
+        Args:
+            input_path (str): path of a .jack file.
+
+        Returns:
+            str: the cache key of the file's current contents.
+        """
+        with open(input_path, 'rb') as input_file:
+            return hashlib.sha256(self._salt + input_file.read()).hexdigest()
+
+    def fetch(self, input_path: str, output_path: str) -> bool:
+        """Writes the cached output of the given .jack file, if there is one.
+
+        Args:
+            input_path (str): path of the .jack file.
+            output_path (str): path of the .vm file to write.
+
+        Returns:
+            bool: True if the output was taken from the cache, False if the
+            file must be compiled and then stored().
+        """
+        key: str = self.key(input_path)
+        entry_path: str = self._entry_path(key)
+        if not os.path.exists(entry_path):
+            self._pending_keys[input_path] = key
+            self.misses += 1
+            return False
+        temp_path: str = f"{output_path}.{os.getpid()}.tmp"
+        shutil.copyfile(entry_path, temp_path)
+        os.replace(temp_path, output_path)
+        os.utime(entry_path)  # Mark the entry as recently used
+        self.hits += 1
+        self.bytes_saved += os.path.getsize(entry_path)
+        return True
+
+    def store(self, input_path: str, output_path: str) -> None:
+        """Stores the output of a .jack file that fetch() missed.
+
+        Args:
+            input_path (str): path of the .jack file.
+            output_path (str): path of the .vm file it was compiled into.
+        """
+        key: str = self._pending_keys.pop(input_path)
+        entry_path: str = self._entry_path(key)
+        temp_path: str = f"{entry_path}.{os.getpid()}.tmp"
+        shutil.copyfile(output_path, temp_path)
+        os.replace(temp_path, entry_path)
+
+    def evict(self) -> int:
+        """Removes the least recently used entries until the cache directory
+        fits within its size limit.
+
+        Returns:
+            int: the number of entries removed.
+        """
+        entries: list[os.DirEntry] = [entry for entry in os.scandir(self._cache_dir)
+                                      if entry.name.endswith(CACHE_ENTRY_EXTENSION)]
+        entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+        total_bytes: int = sum(entry.stat().st_size for entry in entries)
+        n_evicted: int = 0
+        for entry in entries:
+            if total_bytes <= self._max_bytes:
+                break
+            total_bytes -= entry.stat().st_size
+            os.remove(entry.path)
+            n_evicted += 1
+        return n_evicted
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: the cache statistics of this build.
+        """
+        return f"Cache: {self.hits} hits, {self.misses} misses, {self.bytes_saved} bytes saved"
@@ -0,0 +1,276 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+from SyntaxTree import (ArrayAccess, Binary, Call, Class, Do, Expression, If, IntConst, KeywordConst, Let,
+                        Return, Statement, StringConst, Subroutine, Unary, Var, While)
+from VMWriter import VMWriter
+
+NEG: str = "neg"
+NOT: str = "not"
+ADD: str = "add"
+AND: str = "and"
+SHIFT_LEFT: str = "shiftleft"
+OPERATORS: dict[str, str] = {'+': "add", '-': "sub", '*': "call Math.multiply 2", '/': "call Math.divide 2", '&': "and",
+                             '|': "or", '<': "lt", '>': "gt", '=': "eq"}
+UNARY_OPERATORS: dict[str, str] = {'-': "neg", '~': "not", '^': "shiftleft", '#': "shiftright"}
+MULTIPLY: str = '*'
+DIVIDE: str = '/'
+# Multiplying by a constant with more set bits than this still calls Math.multiply
+MAX_SHIFT_ADD_TERMS: int = 3
+WORD_MASK: int = 0xFFFF
+MAX_CONSTANT: int = 0x7FFF
+
+MEMORY_ALLOC: str = "Memory.alloc"
+APPEND_CHAR: str = "String.appendChar"
+STRING_NEW: str = "String.new"
+
+# SEGMENTS
+CONSTANT: str = "constant"
+POINTER: str = "pointer"
+ARG: str = "argument"
+THAT: str = "that"
+TEMP: str = "temp"
+
+CONSTRUCTOR: str = "constructor"
+METHOD: str = "method"
+WHILE_STATEMENT: str = "while"
+IF_STATEMENT: str = "if"
+
+
+class CodeGenerator:
+    """Walks the syntax tree of a class and writes its VM code."""
+
+    def __init__(self, output: VMWriter, strength_reduction: bool = True) -> None:
+        """
+        :param output: The VMWriter the code is written to.
+        :param strength_reduction: Whether multiplications and divisions by
+        integer constants are reduced to shifts and additions.
+        """
+        self._output: VMWriter = output
+        self._strength_reduction: bool = strength_reduction
+        self._class_name: str = ""
+        self._conditional_suffix: dict[str, int] = dict()
+
+    def generate_class(self, class_node: Class) -> None:
+        self._class_name = class_node.name
+        for subroutine in class_node.subroutines:
+            self.generate_subroutine(subroutine)
+
+    def generate_subroutine(self, subroutine: Subroutine) -> None:
+        self._conditional_suffix = {WHILE_STATEMENT: 0, IF_STATEMENT: 0}
+        self._output.write_function(f"{self._class_name}.{subroutine.name}", subroutine.n_vars)
+        if subroutine.kind == METHOD:
+            self._output.write_push(ARG, 0)
+            self._output.write_pop(POINTER, 0)
+        elif subroutine.kind == CONSTRUCTOR:
+            self._output.write_push(CONSTANT, subroutine.n_fields)
+            self._output.write_call(MEMORY_ALLOC, 1)
+            self._output.write_pop(POINTER, 0)
+        self.generate_statements(subroutine.statements)
+
+    def generate_statements(self, statements: list[Statement]) -> None:
+        for statement in statements:
+            if isinstance(statement, Let):
+                self.generate_let(statement)
+            elif isinstance(statement, If):
+                self.generate_if(statement)
+            elif isinstance(statement, While):
+                self.generate_while(statement)
+            elif isinstance(statement, Do):
+                self.generate_expression(statement.call)
+                self._output.write_pop(TEMP, 0)
+            elif isinstance(statement, Return):
+                if statement.value is None:
+                    self._output.write_push(CONSTANT, 0)
+                else:
+                    self.generate_expression(statement.value)
+                self._output.write_return()
+
+    def generate_let(self, statement: Let) -> None:
+        target = statement.target
+        if isinstance(target, Var):
+            self.generate_expression(statement.value)
+            self._output.write_pop(target.segment, target.index)
+        elif statement.reuse_target:
+            self.generate_address(target)
+            self._output.write_pop(POINTER, 1)
+            self.generate_expression(statement.value)
+            self._output.write_pop(THAT, 0)
+        else:
+            self.generate_address(target)
+            self.generate_expression(statement.value)
+            self._output.write_pop(TEMP, 0)
+            self._output.write_pop(POINTER, 1)
+            self._output.write_push(TEMP, 0)
+            self._output.write_pop(THAT, 0)
+
+    def generate_if(self, statement: If) -> None:
+        if_label = f"IF_TRUE{self._conditional_suffix[IF_STATEMENT]}"
+        else_label = f"IF_FALSE{self._conditional_suffix[IF_STATEMENT]}"
+        end_label = f"IF_END{self._conditional_suffix[IF_STATEMENT]}"
+        self._conditional_suffix[IF_STATEMENT] += 1
+        self.generate_expression(statement.condition)
+        self._output.write_if(if_label)
+        self._output.write_goto(else_label)
+        self._output.write_label(if_label)
+        self.generate_statements(statement.statements)
+        if statement.else_statements is not None:
+            self._output.write_goto(end_label)
+            self._output.write_label(else_label)
+            self.generate_statements(statement.else_statements)
+            self._output.write_label(end_label)
+        else:
+            self._output.write_label(else_label)
+
+    def generate_while(self, statement: While) -> None:
+        label = f"WHILE_EXP{self._conditional_suffix[WHILE_STATEMENT]}"
+        end_label = f"WHILE_END{self._conditional_suffix[WHILE_STATEMENT]}"
+        self._output.write_label(label)
+        self._conditional_suffix[WHILE_STATEMENT] += 1
+        self.generate_expression(statement.condition)
+        self._output.write_arithmetic(NOT)
+        self._output.write_if(end_label)
+        self.generate_statements(statement.statements)
+        self._output.write_goto(label)
+        self._output.write_label(end_label)
+
+    def generate_address(self, array_access: ArrayAccess) -> None:
+        """Pushes the address of an array element."""
+        self.generate_expression(array_access.index)
+        self._output.write_push(array_access.base.segment, array_access.base.index)
+        self._output.write_arithmetic(ADD)
+
+    def generate_expression(self, expression: Expression) -> None:
+        if isinstance(expression, IntConst):
+            self.generate_word(expression.value)
+        elif isinstance(expression, StringConst):
+            self._output.write_push(CONSTANT, len(expression.value))
+            self._output.write_call(STRING_NEW, 1)
+            for char in expression.value:
+                self._output.write_push(CONSTANT, ord(char))
+                self._output.write_call(APPEND_CHAR, 2)
+        elif isinstance(expression, KeywordConst):
+            if expression.keyword == "this":
+                self._output.write_push(POINTER, 0)
+            else:
+                self._output.write_push(CONSTANT, 0)
+                if expression.keyword == "true":
+                    self._output.write_arithmetic(NOT)
+        elif isinstance(expression, Var):
+            self._output.write_push(expression.segment, expression.index)
+        elif isinstance(expression, ArrayAccess):
+            if not expression.reuse:
+                self.generate_address(expression)
+                self._output.write_pop(POINTER, 1)
+            self._output.write_push(THAT, 0)
+        elif isinstance(expression, Call):
+            if expression.receiver is not None:
+                self.generate_expression(expression.receiver)
+            for arg in expression.args:
+                self.generate_expression(arg)
+            self._output.write_call(expression.name, len(expression.args) + (expression.receiver is not None))
+        elif isinstance(expression, Unary):
+            self.generate_expression(expression.operand)
+            self._output.write_arithmetic(UNARY_OPERATORS[expression.op])
+        elif isinstance(expression, Binary):
+            self.generate_binary(expression)
+
+    def generate_binary(self, expression: Binary) -> None:
+        """Compiles a binary operation.
+        With strength reduction, a multiplication by an integer constant is
+        compiled into shifts and additions, and a multiplication or division
+        of two integer constants is folded into a single constant.
+        """
+        op, left, right = expression.op, expression.left, expression.right
+        if self._strength_reduction and op in [MULTIPLY, DIVIDE]:
+            if isinstance(left, IntConst) and isinstance(right, IntConst):
+                self.generate_constant_operation(op, left.value, right.value)
+                return
+            # constant * expression is compiled as expression * constant
+            if op == MULTIPLY and isinstance(left, IntConst):
+                self.generate_expression(right)
+                self.generate_multiply_by_constant(left.value)
+                return
+            if isinstance(right, IntConst):
+                self.generate_expression(left)
+                if op == MULTIPLY:
+                    self.generate_multiply_by_constant(right.value)
+                elif right.value != 1:
+                    self.generate_word(right.value)
+                    self._output.write_arithmetic(OPERATORS[op])
+                return
+        self.generate_expression(left)
+        self.generate_expression(right)
+        self._output.write_arithmetic(OPERATORS[op])
+
+    def generate_constant_operation(self, op: str, left: int, right: int) -> None:
+        """Pushes the result of left op right, where op is * or /. A division
+        by zero is still compiled into a call, so it fails at runtime.
+        """
+        if op == DIVIDE and right == 0:
+            self.generate_word(left)
+            self.generate_word(right)
+            self._output.write_arithmetic(OPERATORS[op])
+        elif op == MULTIPLY:
+            self.generate_word(left * right)
+        else:
+            self.generate_word(divide(left, right))
+
+    def generate_word(self, value: int) -> None:
+        """Pushes any 16-bit value, wrapping it like the Hack ALU does."""
+        value &= WORD_MASK
+        if value <= MAX_CONSTANT:
+            self._output.write_push(CONSTANT, value)
+        elif value == MAX_CONSTANT + 1:  # -32768
+            self._output.write_push(CONSTANT, MAX_CONSTANT)
+            self._output.write_arithmetic(NOT)
+        else:
+            self._output.write_push(CONSTANT, WORD_MASK + 1 - value)
+            self._output.write_arithmetic(NEG)
+
+    def generate_multiply_by_constant(self, constant: int) -> None:
+        """Multiplies the value on top of the stack by a constant. The product
+        is built from the most significant bit of the constant down, shifting
+        left for every bit and adding the multiplicand, kept in temp 1, for
+        every set bit.
+        """
+        constant &= WORD_MASK
+        if constant == 0:
+            self._output.write_push(CONSTANT, 0)
+            self._output.write_arithmetic(AND)
+        elif constant & (constant - 1) == 0:  # power of two, no need for temp 1
+            for _ in range(constant.bit_length() - 1):
+                self._output.write_arithmetic(SHIFT_LEFT)
+        elif bin(constant).count("1") <= MAX_SHIFT_ADD_TERMS:
+            self._output.write_pop(TEMP, 1)
+            self._output.write_push(TEMP, 1)
+            for bit in bin(constant)[3:]:
+                self._output.write_arithmetic(SHIFT_LEFT)
+                if bit == "1":
+                    self._output.write_push(TEMP, 1)
+                    self._output.write_arithmetic(ADD)
+        else:
+            self.generate_word(constant)
+            self._output.write_arithmetic(OPERATORS[MULTIPLY])
+
+
+def to_signed(value: int) -> int:
+    """
+    Returns: the 16-bit word value as a signed integer
+    """
+    value &= WORD_MASK
+    return value - (WORD_MASK + 1) if value > MAX_CONSTANT else value
+
+
+def divide(left: int, right: int) -> int:
+    """
+    Returns: the 16-bit word left / right, rounded towards zero like
+    Math.divide. right must not be zero.
+    """
+    left, right = to_signed(left), to_signed(right)
+    quotient = abs(left) // abs(right)
+    return (quotient if (left < 0) == (right < 0) else -quotient) & WORD_MASK
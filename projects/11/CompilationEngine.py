@@ -5,26 +5,19 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
-from JackTokenizer import JackTokenizer
+import io
+import typing
+from CodeGenerator import CodeGenerator, OPERATORS, UNARY_OPERATORS
+from Optimizer import DEFAULT_PASSES, PassManager, PassResult
 from SymbolTable import SymbolTable
+from SyntaxTree import (ArrayAccess, Binary, Call, Class, Do, Expression, If, IntConst, KeywordConst, Let, Return,
+                        Statement, StringConst, Subroutine, Unary, Var, While)
+from TokenStream import TokenStream
 from VMWriter import VMWriter
 
 
-
-
-
-
-
 CONSTANT_KEYWORDS: list[str]  = ["true", "false", "null", "this"]
 CONSTANTS: list[str]  = ["integerConstant", "stringConstant"]
-
-
-NEG: str  = "neg"
-NOT : str = "not"
-ADD : str = "add"
-OPERATORS: dict[str, str] = {'+': "add", '-': "sub", '*': "call Math.multiply 2", '/': "call Math.divide 2", '&': "and", '|': "or",
-             '<': "lt", '>': "gt", '=': "eq"}
-UNARY_OPERATORS: dict[str, str] = {'-': "neg", '~': "not", '^': "shiftleft", '#': "shiftright"}
 CLOSE_ROUND_BRACKET : str = ")"
 
 # Statements
@@ -38,20 +31,13 @@ ELSE_STATEMENT : str = "else"
 # UNCLASSIFIED
 VOID : str = "void"
 IDENTIFIER: str  = "identifier"
-MEMORY_ALLOC: str  = "Memory.alloc"
-APPEND_CHAR : str = "String.appendChar"
-STRING_NEW: str  = "String.new"
 VAR_TYPES: list[str]  = ["int", "char", "boolean"]
 EXP: str  = "expression"
 
 # SEGMENTS
-CONSTANT: str  = "constant"
-POINTER: str  = "pointer"
-ARG: str  = "argument"
 THIS: str  = "this"
-THAT : str = "that"
 LOCAL: str  = "local"
-TEMP: str  = "temp"
+ARG: str  = "argument"
 
 # CLASSIFICATION
 FIELD: str  = "field"
@@ -73,27 +59,34 @@ SEMICOLON : str = ";"
 
 
 class CompilationEngine:
-    """Gets input from a JackTokenizer and emits its parsed structure into an
+    """Gets input from a TokenStream and emits its parsed structure into an
     output stream.
+    The class is parsed into a syntax tree, which is optimized by a sequence
+    of passes, and then written as VM code by a CodeGenerator.
     token written after any advance command is the current token before advancing.
     """
 
-    def __init__(self, input_stream: JackTokenizer, output_stream) -> None:
+    def __init__(self, input_stream: TokenStream, output_stream, strength_reduction: bool = True,
+                 optimize: bool = True, measure_passes: bool = False) -> None:
         """
         Creates a new compilation engine with the given input and output. The
         next routine called must be compileClass()
         :param input_stream: The input stream.
         :param output_stream: The output stream.
+        :param strength_reduction: Whether multiplications and divisions by
+        integer constants are reduced to shifts and additions.
+        :param optimize: Whether the optimization passes are run.
+        :param measure_passes: Whether the number of VM instructions each pass
+        removed is measured.
         """
-        self._conditional_suffix :dict[str,int]= dict()
+        self._strength_reduction: bool = strength_reduction
+        self._optimize: bool = optimize
+        self._measure_passes: bool = measure_passes
         self._class_name:str = ""
-        self._input: JackTokenizer = input_stream
+        self._input: TokenStream = input_stream
         self._output: VMWriter = VMWriter(output_stream)
         self._symbol_table: SymbolTable = SymbolTable()
-        self.reset_condition()
-
-    def reset_condition(self) -> None:
-        self._conditional_suffix = {WHILE_STATEMENT: 0, IF_STATEMENT: 0}
+        self.pass_results: list[PassResult] = []
 
     @staticmethod
     def segment_specifier(var_kind:str)->str:
@@ -101,17 +94,36 @@ class CompilationEngine:
            var_kind = THIS
         return var_kind if var_kind != VAR else LOCAL
 
+    def count_instructions(self, class_node: Class) -> int:
+        """
+        Returns: the number of VM instructions the class is compiled into.
+        """
+        output = io.StringIO()
+        CodeGenerator(VMWriter(output), self._strength_reduction).generate_class(class_node)
+        return output.getvalue().count("\n")
+
     def compile_class(self) -> None:
         """Compiles a complete class."""
+        class_node = self.parse_class()
+        if self._optimize:
+            pass_manager = PassManager([create_pass() for create_pass in DEFAULT_PASSES],
+                                       self.count_instructions if self._measure_passes else None)
+            self.pass_results = pass_manager.run(class_node)
+        CodeGenerator(self._output, self._strength_reduction).generate_class(class_node)
+
+    def parse_class(self) -> Class:
+        """Parses a complete class into a syntax tree."""
         self._input.advance()  # class
         self._class_name = self._input.token()
         self._input.advance()  # class name
         self._input.advance()  # open bracket
         while self._input.token() in CLASS_VARIABLES:
             self.compile_class_var_dec()
+        subroutines: list[Subroutine] = []
         while self._input.token() in CLASS_METHODS:
-            self.compile_subroutine()
+            subroutines.append(self.compile_subroutine())
         self._input.advance()  # close bracket
+        return Class(self._class_name, subroutines)
 
     def compile_class_var_dec(self) -> None:
         """Compiles a static declaration or a field declaration."""
@@ -120,14 +132,13 @@ class CompilationEngine:
         self.variable_declaration(var_kind)
         self._input.advance()  # ;
 
-    def compile_subroutine(self) -> None:
+    def compile_subroutine(self) -> Subroutine:
         """
         Compiles a complete method, function, or constructor.
         """
         # Init symbol table
         self._symbol_table.start_subroutine()
-        self.reset_condition()
-        
+
         # Get function declaration data
         subroutine_type = self._input.token()
         self._input.advance()  # subroutine type
@@ -146,18 +157,9 @@ class CompilationEngine:
         while self._input.token() == VAR:
             n_vars += self.compile_var_dec()
 
-        # Write function declaration and specific subroutine actions
-        self._output.write_function(f"{self._class_name}.{subroutine_name}", n_vars)
-        if subroutine_type == METHOD:
-            self._output.write_push(ARG, 0)
-            self._output.write_pop(POINTER, 0)
-        elif subroutine_type == CONSTRUCTOR:
-            self._output.write_push(CONSTANT, self._symbol_table.var_count(FIELD))
-            self._output.write_call(MEMORY_ALLOC, 1)
-            self._output.write_pop(POINTER, 0)
-
-        self.compile_statements()
+        statements = self.compile_statements()
         self._input.advance()  # body close bracket
+        return Subroutine(subroutine_type, subroutine_name, n_vars, self._symbol_table.var_count(FIELD), statements)
 
     def compile_parameter_list(self) -> int:
         """Compiles a (possibly empty) parameter list, not including the
@@ -207,223 +209,169 @@ class CompilationEngine:
         self._input.advance()  # ;
         return n_vars
 
-    def compile_statements(self) -> None:
+    def compile_statements(self) -> list[Statement]:
         """Compiles a sequence of statements, not including the enclosing
         "{}".
         """
         STATEMENTS = {LET_STATEMENT: self.compile_let, IF_STATEMENT: self.compile_if,
                       WHILE_STATEMENT: self.compile_while, DO_STATEMENT: self.compile_do,
                       RETURN_STATEMENT: self.compile_return}
+        statements: list[Statement] = []
         while self._input.token() in STATEMENTS:
-            STATEMENTS[self._input.token()]()
+            statements.append(STATEMENTS[self._input.token()]())
+        return statements
 
-    def compile_do(self) -> None:
+    def compile_do(self) -> Do:
         """Compiles a do statement."""
         self._input.advance()  # do
-        first_name, second_name = self._input.token(), None
-        self._input.advance()  # subroutineName or className or varName
-        if self._input.token() == DOT:
-            self._input.advance()  # .
-            second_name = f".{self._input.token()}"
-            self._input.advance()  # subroutineName or className or varName
-        self.compile_subroutine_call(first_name, second_name)
-        self._output.write_pop(TEMP, 0)
+        call = self.compile_subroutine_call()
         self._input.advance()  # ;
+        return Do(call)
 
-    def compile_subroutine_call(self, first_name, second_name) -> None:
-        n_args = 0
+    def compile_subroutine_call(self) -> Call:
+        """Compiles a subroutine call, starting at its first name."""
+        first_name, second_name = self._input.token(), None
+        if self._input.peek() == DOT:
+            second_name = f".{self._input.peek(2)}"
+            self._input.advance()  # className or varName
+            self._input.advance()  # .
+        self._input.advance()  # subroutineName
+        receiver: typing.Optional[Expression] = None
         # Push correct data for methods
         if self._symbol_table.contains(first_name):
-            var_index = self._symbol_table.index_of(first_name)
-            var_kind = self.segment_specifier(self._symbol_table.kind_of(first_name))
-            self._output.write_push(var_kind, var_index)
-            n_args += 1
+            receiver = self.compile_variable(first_name)
             first_name = self._symbol_table.type_of(first_name)
         elif second_name is None:  # if there doesn't exist a dot
-            self._output.write_push(POINTER, 0)
+            receiver = KeywordConst(THIS)
             second_name = f".{first_name}"
             first_name = self._class_name
-            n_args += 1
-        # elif first_name
         self._input.advance()  # open bracket
-        n_args += self.compile_expression_list()
+        args = self.compile_expression_list()
         self._input.advance()  # close bracket
-        self._output.write_call(f"{first_name}{second_name}", n_args)
+        return Call(f"{first_name}{second_name}", receiver, args)
+
+    def compile_variable(self, var_name: str) -> Var:
+        """Resolves a variable name into its segment and index."""
+        var_index = self._symbol_table.index_of(var_name)
+        var_kind = self.segment_specifier(self._symbol_table.kind_of(var_name))
+        return Var(var_kind, var_index)
 
-    def compile_let(self) -> None:
+    def compile_let(self) -> Let:
         """Compiles a let statement."""
         self._input.advance()  # let
         var_name = self._input.token()
         self._input.advance()  # varName
-        var_index = self._symbol_table.index_of(var_name)
-        var_kind = self.segment_specifier(self._symbol_table.kind_of(var_name))
-        is_array = self._input.token() == OPEN_SQUARE_BRACKET
-        if is_array:
-            self.compile_array(var_index, var_kind)
-            self._input.advance()  # =
-            self.compile_expression()
-            self._output.write_pop(TEMP, 0)
-            self._output.write_pop(POINTER, 1)
-            self._output.write_push(TEMP, 0)
-            self._output.write_pop(THAT, 0)
-            self._input.advance()  # ;
-        else:
-            self._input.advance()  # =
-            self.compile_expression()
-            self._output.write_pop(var_kind, var_index)
-            self._input.advance()  # ;
-
-    def compile_array(self, var_index, var_kind):
-        var_kind = self.segment_specifier(var_kind)
+        target: typing.Union[Var, ArrayAccess] = self.compile_variable(var_name)
+        if self._input.token() == OPEN_SQUARE_BRACKET:
+            target = self.compile_array(target)
+        self._input.advance()  # =
+        value = self.compile_expression()
+        self._input.advance()  # ;
+        return Let(target, value)
+
+    def compile_array(self, base: Var) -> ArrayAccess:
         self._input.advance()  # [ bracket
-        self.compile_expression()
-        self._output.write_push(var_kind, var_index)
-        self._output.write_arithmetic(ADD)
+        index = self.compile_expression()
         self._input.advance()  # ] bracket
+        return ArrayAccess(base, index)
 
-    def compile_while(self) -> None:
+    def compile_while(self) -> While:
         """Compiles a while statement."""
-        label = f"WHILE_EXP{self._conditional_suffix[WHILE_STATEMENT]}"
-        end_label = f"WHILE_END{self._conditional_suffix[WHILE_STATEMENT]}"
-        self._output.write_label(label)
-        self._conditional_suffix[WHILE_STATEMENT] += 1
         self._input.advance()  # while
         self._input.advance()  # open bracket
-        self.compile_expression()
-        self._output.write_arithmetic(NOT)
-        self._output.write_if(end_label)
+        condition = self.compile_expression()
         self._input.advance()  # close bracket
         self._input.advance()  # open bracket
-        self.compile_statements()
-        self._output.write_goto(label)
+        statements = self.compile_statements()
         self._input.advance()  # close bracket
-        self._output.write_label(end_label)
+        return While(condition, statements)
 
-    def compile_return(self) -> None:
+    def compile_return(self) -> Return:
         """Compiles a return statement."""
         self._input.advance()  # return
-        if self._input.token() != SEMICOLON:
-            self.compile_expression()
-        else:
-            self._output.write_push(CONSTANT, 0)
-        self._output.write_return()
+        value = self.compile_expression() if self._input.token() != SEMICOLON else None
         self._input.advance()  # ;
+        return Return(value)
 
-    def compile_if(self) -> None:
+    def compile_if(self) -> If:
         """Compiles a if statement, possibly with a trailing else clause."""
-        if_label = f"IF_TRUE{self._conditional_suffix[IF_STATEMENT]}"
-        else_label = f"IF_FALSE{self._conditional_suffix[IF_STATEMENT]}"
-        end_label = f"IF_END{self._conditional_suffix[IF_STATEMENT]}"
-        self._conditional_suffix[IF_STATEMENT] += 1
         self._input.advance()  # if
         self._input.advance()  # open bracket
-        self.compile_expression()
-        self._output.write_if(if_label)
-        self._output.write_goto(else_label)
-        self._output.write_label(if_label)
+        condition = self.compile_expression()
         self._input.advance()  # close bracket
         self._input.advance()  # open bracket
-        self.compile_statements()
+        statements = self.compile_statements()
         self._input.advance()  # close bracket
+        else_statements = None
         if self._input.token() == ELSE_STATEMENT:
-            self._output.write_goto(end_label)
-            self._output.write_label(else_label)
             self._input.advance()  # else
             self._input.advance()  # open bracket
-            self.compile_statements()
+            else_statements = self.compile_statements()
             self._input.advance()  # close bracket
-            self._output.write_label(end_label)
-        else:
-            self._output.write_label(else_label)
+        return If(condition, statements, else_statements)
 
-    def compile_expression(self) -> None:
+    def compile_expression(self) -> Expression:
         """Compiles an expression."""
-        self.compile_term()
+        term = self.compile_term()
         if self._input.token() in OPERATORS:
-            op = OPERATORS[self._input.token()]
+            op = self._input.token()
             self._input.advance()  # op
-            self.compile_expression()
-            self._output.write_arithmetic(op)
+            return Binary(op, term, self.compile_expression())
+        return term
 
-    def compile_term(self) -> None:
+    def compile_term(self) -> Expression:
         """Compiles a term.
         This routine is faced with a slight difficulty when
         trying to decide between some alternative parsing rules.
         Specifically, if the current token is an identifier, the routing must
         distinguish between a variable, an array entry, and a subroutine call.
         A single look-ahead token, which may be one of "[", "(", or "." suffices
-        to distinguish between the three possibilities. Any other token is not
-        part of this term and should not be advanced over.
+        to distinguish between the three possibilities, and is peeked at before
+        the identifier is advanced over. Any other token is not part of this
+        term and should not be advanced over.
         """
         if self._input.token_type() in CONSTANTS or self._input.token() in CONSTANT_KEYWORDS:
-            self.compile_const_term()
+            return self.compile_const_term()
         elif self._input.token() == OPEN_ROUND_BRACKET:
             self._input.advance()  # open bracket
-            self.compile_expression()
+            expression = self.compile_expression()
             self._input.advance()  # close bracket
+            return expression
 
-        elif self._input.token_type() == IDENTIFIER:
-            first_name, second_name = self._input.token(), None
-            self._input.advance()  # subroutineName or className or varName
+        elif self._input.token_type() == IDENTIFIER and self._input.peek() in [DOT, OPEN_ROUND_BRACKET]:
+            return self.compile_subroutine_call()
 
+        elif self._input.token_type() == IDENTIFIER:
+            variable = self.compile_variable(self._input.token())
+            self._input.advance()  # varName
             if self._input.token() == OPEN_SQUARE_BRACKET:  # is an array
-                var_kind, var_index = self._symbol_table.kind_of(first_name), self._symbol_table.index_of(first_name)
-                self.compile_array(var_index, var_kind)
-                self._output.write_pop(POINTER, 1)
-                self._output.write_push(THAT, 0)
-
-            elif self._input.token() in [DOT, OPEN_ROUND_BRACKET]:  # is a subroutine call
-                if self._input.token() == DOT:
-                    self._input.advance()  # .
-                    second_name = f".{self._input.token()}"
-                    self._input.advance()  # subroutineName if className or varName before
-                self.compile_subroutine_call(first_name, second_name)
-
-            else:  # is a variable
-                var_index = self._symbol_table.index_of(first_name)
-                var_kind = self.segment_specifier(self._symbol_table.kind_of(first_name))
-                self._output.write_push(var_kind, var_index)
+                return self.compile_array(variable)
+            return variable
 
         elif self._input.token() in UNARY_OPERATORS:
-            op = UNARY_OPERATORS[self._input.token()]
+            op = self._input.token()
             self._input.advance()  # op
-            self.compile_term()
-            self._output.write_arithmetic(op)
+            return Unary(op, self.compile_term())
+        raise SyntaxError(f"Unexpected token {self._input.token()!r} at line {self._input.line()}")
 
-    def compile_const_term(self):
+    def compile_const_term(self) -> Expression:
         if self._input.token_type() == CONSTANTS[0]:  # integerConstant
-            self.compile_int_const()
+            term: Expression = IntConst(int(self._input.token()))
         elif self._input.token_type() == CONSTANTS[1]:  # stringConstant
-            self.compile_str_const()
-        elif self._input.token() == CONSTANT_KEYWORDS[0]:  # true
-            self._output.write_push(CONSTANT, 0)
-            self._output.write_arithmetic(NOT)
-        elif self._input.token() == CONSTANT_KEYWORDS[1] or self._input.token() == CONSTANT_KEYWORDS[2]:  # null/false
-            self._output.write_push(CONSTANT, 0)
-        elif self._input.token() == CONSTANT_KEYWORDS[3]:  # this
-            self._output.write_push(POINTER, 0)
+            term = StringConst(self._input.token())
+        else:  # true/false/null/this
+            term = KeywordConst(self._input.token())
         self._input.advance()  # constant
+        return term
 
-    def compile_str_const(self):
-        str_len = len(self._input.token())
-        self._output.write_push(CONSTANT, str_len)
-        self._output.write_call(STRING_NEW, 1)
-        for i in range(str_len):
-            self._output.write_push(CONSTANT, ord(self._input.token()[i]))
-            self._output.write_call(APPEND_CHAR, 2)
-
-    def compile_int_const(self):
-        self._output.write_push(CONSTANT, int(self._input.token()))
-
-    def compile_expression_list(self) -> int:
+    def compile_expression_list(self) -> list[Expression]:
         """Compiles a (possibly empty) comma-separated list of expressions."""
-        n_expressions = 0
+        expressions: list[Expression] = []
         non_empty_list = self._input.token() != CLOSE_ROUND_BRACKET
         while non_empty_list or self._input.token() == COMMA_SEPERATOR:
             if non_empty_list:
                 non_empty_list = False
             else:
                 self._input.advance()  # ,
-            self.compile_expression()
-            n_expressions += 1
-        return n_expressions
+            expressions.append(self.compile_expression())
+        return expressions
@@ -5,49 +5,124 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
 import os
 import sys
+import time
 import typing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from BuildCache import BuildCache, DEFAULT_MAX_BYTES
 from CompilationEngine import CompilationEngine
-from JackTokenizer import JackTokenizer
+from TokenStream import TokenStream, load_tokens
 from SymbolTable import SymbolTable
 from VMWriter import VMWriter
 
 
 def compile_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        strength_reduction: bool = True, optimize: bool = True,
+        report_passes: bool = False) -> None:
     """Compiles a single file.
 
     Args:
         input_file (typing.TextIO): the file to compile.
         output_file (typing.TextIO): writes all output to this file.
+        strength_reduction (bool): if this is True, multiplications and
+            divisions by integer constants are reduced to shifts and additions.
+        optimize (bool): if this is True, the optimization passes are run.
+        report_passes (bool): if this is True, the time each optimization pass
+            took and the VM instructions it removed are printed.
     """
-    tokenizer: JackTokenizer = JackTokenizer(input_file)
-    compilation_engine: CompilationEngine = CompilationEngine(tokenizer, output_file)
+    tokenizer: TokenStream = TokenStream(load_tokens(input_file))
+    compilation_engine: CompilationEngine = CompilationEngine(
+        tokenizer, output_file, strength_reduction, optimize, report_passes)
     tokenizer.advance()  # Advance first step into code
     compilation_engine.compile_class()
+    if report_passes:
+        for name, elapsed, removed in compilation_engine.pass_results:
+            print(f"{os.path.basename(input_file.name)}: {name}: {elapsed * 1000:.2f} ms, "
+                  f"{removed} VM instructions removed", file=sys.stderr)
+
+
+def compile_path(input_path: str, **options: bool) -> float:
+    """Compiles a single .jack file into the .vm file next to it.
+    The output is written to a temporary file that then replaces the .vm
+    file, so a partially written .vm file is never left behind.
+
+    Args:
+        input_path (str): path of the .jack file to compile.
+        options (bool): passed on to compile_file.
+
+    Returns:
+        float: the time it took to compile the file, in seconds.
+    """
+    start: float = time.perf_counter()
+    filename, extension = os.path.splitext(input_path)
+    output_path: str = filename + ".vm"
+    temp_path: str = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with open(input_path, 'r') as input_file, \
+                open(temp_path, 'w') as output_file:
+            compile_file(input_file, output_file, **options)
+        os.replace(temp_path, output_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return time.perf_counter() - start
 
 
 if "__main__" == __name__:
-    # Parses the input path and calls compile_file on each input file.
-    # This opens both the input and the output files!
-    # Both are closed automatically when the code finishes running.
-    # If the output file does not exist, it is created automatically in the
-    # correct path, using the correct filename.
-    if len(sys.argv) != 2:
-        sys.exit("Invalid usage, please use: JackCompiler <input path>")
-    argument_path: str = os.path.abspath(sys.argv[1])
+    # Parses the input path and calls compile_path on each input file.
+    # Each output file is created next to its input file, using the correct
+    # filename. With --jobs, the files are compiled by a pool of processes and
+    # the time each file took is reported. With --cache, files whose contents
+    # didn't change since they were last compiled are taken from the cache.
+    argument_parser = argparse.ArgumentParser(prog="JackCompiler")
+    argument_parser.add_argument("input_path", help="a .jack file or a directory of .jack files")
+    argument_parser.add_argument("-j", "--jobs", type=int, default=None,
+                                 help="compile the files using N processes (0 for one per CPU)")
+    argument_parser.add_argument("--cache", metavar="DIR", default=None,
+                                 help="reuse the output of unchanged files from the cache in DIR")
+    argument_parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                                 help="size limit of the cache directory, in MB")
+    argument_parser.add_argument("--no-strength-reduction", dest="strength_reduction", action="store_false",
+                                 help="always call Math.multiply and Math.divide")
+    argument_parser.add_argument("--no-optimize", dest="optimize", action="store_false",
+                                 help="don't run the optimization passes")
+    argument_parser.add_argument("--report-passes", action="store_true",
+                                 help="print the time each optimization pass took and the VM instructions it removed")
+    arguments = argument_parser.parse_args()
+    options: dict[str, bool] = {"strength_reduction": arguments.strength_reduction,
+                                "optimize": arguments.optimize, "report_passes": arguments.report_passes}
+    argument_path: str = os.path.abspath(arguments.input_path)
     if os.path.isdir(argument_path):
         files_to_assemble: list[str] = [
             os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+            for filename in sorted(os.listdir(argument_path))]
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".jack":
-            continue
-        output_path: str = filename + ".vm"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            compile_file(input_file, output_file)
+    files_to_assemble = [input_path for input_path in files_to_assemble
+                         if os.path.splitext(input_path)[1].lower() == ".jack"]
+    build_cache: typing.Optional[BuildCache] = None
+    if arguments.cache:
+        build_cache = BuildCache(arguments.cache, arguments.cache_size * 1024 * 1024,
+                                 f"strength_reduction={arguments.strength_reduction},optimize={arguments.optimize}")
+        files_to_assemble = [input_path for input_path in files_to_assemble if not build_cache.fetch(
+            input_path, os.path.splitext(input_path)[0] + ".vm")]
+    if arguments.jobs is None:
+        for input_path in files_to_assemble:
+            compile_path(input_path, **options)
+    else:
+        start: float = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=arguments.jobs or None) as executor:
+            for input_path, elapsed in zip(files_to_assemble, executor.map(
+                    partial(compile_path, **options), files_to_assemble)):
+                print(f"{os.path.basename(input_path)}: {elapsed * 1000:.1f} ms", file=sys.stderr)
+        print(f"Compiled {len(files_to_assemble)} files in {(time.perf_counter() - start) * 1000:.1f} ms",
+              file=sys.stderr)
+    if build_cache:
+        for input_path in files_to_assemble:
+            build_cache.store(input_path, os.path.splitext(input_path)[0] + ".vm")
+        build_cache.evict()
+        print(build_cache.summary(), file=sys.stderr)
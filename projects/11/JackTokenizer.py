@@ -5,7 +5,7 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
-from re import Pattern,compile,match,DOTALL
+from re import Pattern,compile,DOTALL
 import typing
 
 # The regex matches all whitespaces, all comments starting with // and all comments starting with /* and ending with */.
@@ -21,6 +21,48 @@ TOKEN_PATTEN_DICT: dict[str, str] = {
 }
 
 
+# (token type, token, line, column) as yielded by scan_tokens
+Token = typing.Tuple[str, str, int, int]
+# A single alternation of the comments/whitespaces regex and every token pattern, tried in TOKEN_PATTEN_DICT order.
+# DOTALL is scoped to the comments so string constants still can't span lines.
+SCANNER_REGEX: Pattern[str] = compile("|".join(
+    [f"(?P<skip>(?s:{COMMENTS_WHITESPACES_REGEX.pattern}))"] +
+    [f"(?P<{token_type}>{pattern})" for token_type, pattern in TOKEN_PATTEN_DICT.items()]))
+
+
+def scan_tokens(text: str) -> typing.Iterator[Token]:
+    """Breaks the whole input into tokens in a single pass. Every match is
+    made in place at the current position, so the input is never copied.
+
+    Args:
+        text (str): the Jack source code.
+
+    Yields:
+        Token: (token type, token, line, column) for each token, line and
+        column start at 1. String constants are yielded without their quotes.
+    """
+    scan = SCANNER_REGEX.match
+    position, end = 0, len(text)
+    line, line_start = 1, 0
+    while position < end:
+        token_match = scan(text, position)
+        if not token_match:
+            raise SyntaxError(f"Unexpected character {text[position]!r} at line {line}, "
+                              f"column {position - line_start + 1}")
+        token_type, token_end = token_match.lastgroup, token_match.end()
+        if token_type == "skip":
+            newlines = text.count("\n", position, token_end)
+            if newlines:
+                line += newlines
+                line_start = text.rfind("\n", position, token_end) + 1
+        else:
+            token = token_match.group()
+            if token_type == "stringConstant":
+                token = token[1:-1]
+            yield token_type, token, line, position - line_start + 1
+        position = token_end
+
+
 class JackTokenizer:
     """Removes all comments from the input stream and breaks it
     into Jack language tokens, as specified by the Jack grammar.
@@ -106,20 +148,20 @@ class JackTokenizer:
     """
 
     def __init__(self, input_stream: typing.TextIO) -> None:
-        """It receives a file and reads it into a string.
-        It also initializes the position pointer to 0.
+        """It receives a file and starts scanning it.
+        The scanner always holds the next token, so has_more_tokens() knows
+        whether another token exists without touching the input again.
         """
-        self._input: str = input_stream.read()
-        self._position: int = 0
-        self.skip_comment_whitespaces()
-        self._token: str  = ""
-        self._token_type : str = ""
+        self._tokens: typing.Iterator[Token] = scan_tokens(input_stream.read())
+        self._next_token: typing.Optional[Token] = next(self._tokens, None)
+        self._token: str = ""
+        self._token_type: str = ""
 
     def has_more_tokens(self) -> bool:
         """
         Returns True if there are more tokens in the input.
         """
-        return self._position < len(self._input)
+        return self._next_token is not None
 
     def advance(self) -> None:
         """Gets the next token from the input and makes it the current token.
@@ -128,33 +170,8 @@ class JackTokenizer:
         """
         if not self.has_more_tokens():
             return
-        for token, pattern in TOKEN_PATTEN_DICT.items():
-            match = match(compile(pattern), self._input[self._position:])
-            if match:
-                self.tokenize(match, token)
-                return
-
-    def tokenize(self, match, token) -> None:
-        """
-        Tokenizes the current match string and the selected token
-        """
-        self._token = match.group(0)
-        self._token_type = token
-        self._position += len(self._token)
-        if token == "stringConstant":
-            self._token = self._token[1:-1]
-        self.skip_comment_whitespaces()
-
-    def skip_comment_whitespaces(self) -> None:
-        """
-        The program progresses the position pointer for the input so it doesn't read comments or whitespaces.
-        The regex matches all whitespaces and comments up to the index where somthing else appears,
-        then progresses position accordingly - group(0) is first match of the pattern.
-        """
-        # Regex matches all whitespaces and comments up to the index where somthing else appears,
-        comments_whitespaces = match(COMMENTS_WHITESPACES_REGEX, self._input[self._position:])
-        # then progresses position accordingly - group(0) is first match of the pattern
-        self._position += len(comments_whitespaces.group(0)) if comments_whitespaces else 0
+        self._token_type, self._token, _, _ = self._next_token
+        self._next_token = next(self._tokens, None)
 
     def token_type(self) -> str:
         """
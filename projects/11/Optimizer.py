@@ -0,0 +1,289 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import abc
+import time
+import typing
+from CodeGenerator import WORD_MASK, divide, to_signed
+from SyntaxTree import (ArrayAccess, Binary, Call, Class, Do, Expression, If, IntConst, KeywordConst, Let, Return,
+                        Statement, StringConst, Unary, Var, While, statement_lists, sub_expressions)
+
+TRUE: int = WORD_MASK
+FALSE: int = 0
+KEYWORD_VALUES: dict[str, int] = {"true": TRUE, "false": FALSE, "null": FALSE}
+
+# (pass name, seconds, VM instructions removed or None if not measured)
+PassResult = tuple[str, float, typing.Optional[int]]
+
+
+def constant_value(expression: Expression) -> typing.Optional[int]:
+    """
+    Returns: the 16-bit value of a constant expression, None if it isn't one.
+    """
+    if isinstance(expression, IntConst):
+        return expression.value
+    if isinstance(expression, KeywordConst):
+        return KEYWORD_VALUES.get(expression.keyword)
+    return None
+
+
+def evaluate_unary(op: str, value: int) -> int:
+    if op == '-':
+        return -value & WORD_MASK
+    if op == '~':
+        return ~value & WORD_MASK
+    if op == '^':
+        return (value << 1) & WORD_MASK
+    return (to_signed(value) >> 1) & WORD_MASK  # '#' shifts right arithmetically
+
+
+def evaluate_binary(op: str, left: int, right: int) -> typing.Optional[int]:
+    """
+    Returns: the 16-bit value of left op right, None if it must be computed at
+    runtime (a division by zero, or an overflowing division).
+    """
+    if op == '+':
+        return (left + right) & WORD_MASK
+    if op == '-':
+        return (left - right) & WORD_MASK
+    if op == '*':
+        return (left * right) & WORD_MASK
+    if op == '/':
+        return divide(left, right) if right and left != 0x8000 else None
+    if op == '&':
+        return left & right
+    if op == '|':
+        return left | right
+    if op == '<':
+        return TRUE if to_signed(left) < to_signed(right) else FALSE
+    if op == '>':
+        return TRUE if to_signed(left) > to_signed(right) else FALSE
+    return TRUE if left == right else FALSE  # '='
+
+
+def statement_expressions(statement: Statement) -> list[Expression]:
+    """
+    Returns: the expressions evaluated by the statement itself, in order.
+    """
+    if isinstance(statement, Let):
+        return [statement.target, statement.value]
+    if isinstance(statement, (If, While)):
+        return [statement.condition]
+    if isinstance(statement, Do):
+        return [statement.call]
+    return [statement.value] if isinstance(statement, Return) and statement.value is not None else []
+
+
+class OptimizationPass(abc.ABC):
+    """A transformation of the syntax tree of a class that keeps its meaning."""
+    name: str = ""
+
+    def run(self, class_node: Class) -> None:
+        for subroutine in class_node.subroutines:
+            for statements in statement_lists(subroutine.statements):
+                self.run_statements(statements)
+
+    @abc.abstractmethod
+    def run_statements(self, statements: list[Statement]) -> None:
+        """Transforms a single statement list in place. Nested lists were
+        already transformed when this is called.
+        """
+        ...
+
+
+class ConstantFolding(OptimizationPass):
+    """Replaces operations on constants with their values."""
+    name = "constant folding"
+
+    def run_statements(self, statements: list[Statement]) -> None:
+        for statement in statements:
+            if isinstance(statement, Let):
+                statement.target = self.fold(statement.target)
+                statement.value = self.fold(statement.value)
+            elif isinstance(statement, (If, While)):
+                statement.condition = self.fold(statement.condition)
+            elif isinstance(statement, Do):
+                self.fold(statement.call)
+            elif isinstance(statement, Return) and statement.value is not None:
+                statement.value = self.fold(statement.value)
+
+    def fold(self, expression: Expression) -> Expression:
+        if isinstance(expression, ArrayAccess):
+            expression.index = self.fold(expression.index)
+        elif isinstance(expression, Call):
+            if expression.receiver is not None:
+                expression.receiver = self.fold(expression.receiver)
+            expression.args = [self.fold(arg) for arg in expression.args]
+        elif isinstance(expression, Unary):
+            expression.operand = self.fold(expression.operand)
+            value = constant_value(expression.operand)
+            if value is not None:
+                return IntConst(evaluate_unary(expression.op, value))
+        elif isinstance(expression, Binary):
+            expression.left, expression.right = self.fold(expression.left), self.fold(expression.right)
+            left, right = constant_value(expression.left), constant_value(expression.right)
+            if left is not None and right is not None:
+                value = evaluate_binary(expression.op, left, right)
+                if value is not None:
+                    return IntConst(value)
+        return expression
+
+
+class DeadBranchElimination(OptimizationPass):
+    """Replaces if statements with a constant condition by the branch that is
+    taken, and removes while statements with a false condition.
+    """
+    name = "dead branch elimination"
+
+    def run_statements(self, statements: list[Statement]) -> None:
+        live_statements: list[Statement] = []
+        for statement in statements:
+            if isinstance(statement, (If, While)):
+                value = constant_value(statement.condition)
+                if isinstance(statement, If) and value is not None:
+                    live_statements += statement.statements if value else (statement.else_statements or [])
+                    continue
+                if isinstance(statement, While) and value == FALSE:
+                    continue
+            live_statements.append(statement)
+        statements[:] = live_statements
+
+
+class UnreachableCodeElimination(OptimizationPass):
+    """Removes the statements following a statement that always returns."""
+    name = "unreachable code elimination"
+
+    def run_statements(self, statements: list[Statement]) -> None:
+        for i, statement in enumerate(statements):
+            if self.always_returns(statement):
+                del statements[i + 1:]
+                return
+
+    def always_returns(self, statement: Statement) -> bool:
+        if isinstance(statement, Return):
+            return True
+        return isinstance(statement, If) and statement.else_statements is not None and \
+            any(map(self.always_returns, statement.statements)) and \
+            any(map(self.always_returns, statement.else_statements))
+
+
+def expression_key(expression: Expression) -> typing.Optional[tuple]:
+    """
+    Returns: a key that is equal for expressions that compute the same value
+    within a statement, None if the expression calls a subroutine.
+    """
+    if isinstance(expression, IntConst):
+        return "int", expression.value
+    if isinstance(expression, KeywordConst):
+        return "keyword", expression.keyword
+    if isinstance(expression, Var):
+        return "var", expression.segment, expression.index
+    if isinstance(expression, ArrayAccess):
+        index = expression_key(expression.index)
+        return None if index is None else ("[]", expression.base.segment, expression.base.index, index)
+    if isinstance(expression, Unary):
+        operand = expression_key(expression.operand)
+        return None if operand is None else (expression.op, operand)
+    if isinstance(expression, Binary):
+        left, right = expression_key(expression.left), expression_key(expression.right)
+        return None if left is None or right is None else (expression.op, left, right)
+    return None
+
+
+class ArrayIndexReuse(OptimizationPass):
+    """Common subexpression reuse for array elements. Within a statement,
+    pointer 1 is tracked in evaluation order: reading an element whose
+    address pointer 1 already holds only needs "push that 0". An array let
+    statement whose value doesn't move pointer 1 keeps the target address in
+    pointer 1, instead of passing the value through temp 0.
+    """
+    name = "array index reuse"
+
+    def __init__(self) -> None:
+        self._pointer: typing.Optional[tuple] = None  # key of the element pointer 1 holds
+        self._pointer_moved: bool = False
+
+    def run_statements(self, statements: list[Statement]) -> None:
+        for statement in statements:
+            self._pointer = None
+            if isinstance(statement, Let) and isinstance(statement.target, ArrayAccess):
+                self.evaluate(statement.target.index)
+                pointer_after_index = self._pointer
+                # Try keeping the target address in pointer 1 while evaluating the value
+                self._pointer, self._pointer_moved = expression_key(statement.target), False
+                self.evaluate(statement.value)
+                statement.reuse_target = not self._pointer_moved
+                if not statement.reuse_target:
+                    for sub_expression in sub_expressions(statement.value):
+                        if isinstance(sub_expression, ArrayAccess):
+                            sub_expression.reuse = False
+                    self._pointer = pointer_after_index
+                    self.evaluate(statement.value)
+            else:
+                for expression in statement_expressions(statement):
+                    self.evaluate(expression)
+
+    def evaluate(self, expression: Expression) -> None:
+        """Follows the evaluation of the expression, marking the array
+        elements that can be reused.
+        """
+        if isinstance(expression, ArrayAccess):
+            key = expression_key(expression)
+            if key is not None and key == self._pointer:
+                expression.reuse = True
+                return
+            self.evaluate(expression.index)
+            self._pointer, self._pointer_moved = key, True
+        elif isinstance(expression, Call):
+            if expression.receiver is not None:
+                self.evaluate(expression.receiver)
+            for arg in expression.args:
+                self.evaluate(arg)
+            self._pointer = None  # The callee may change any element
+        elif isinstance(expression, StringConst):
+            self._pointer = None
+        elif isinstance(expression, Unary):
+            self.evaluate(expression.operand)
+        elif isinstance(expression, Binary):
+            self.evaluate(expression.left)
+            self.evaluate(expression.right)
+
+
+DEFAULT_PASSES: list[typing.Callable[[], OptimizationPass]] = [
+    ConstantFolding, DeadBranchElimination, UnreachableCodeElimination, ArrayIndexReuse]
+
+
+class PassManager:
+    """Runs a sequence of optimization passes over the syntax tree of a class."""
+
+    def __init__(self, passes: list[OptimizationPass],
+                 measure: typing.Optional[typing.Callable[[Class], int]] = None) -> None:
+        """
+        :param passes: The passes to run, in order.
+        :param measure: Counts the VM instructions of a class. If given, the
+        number of instructions each pass removed is measured.
+        """
+        self._passes: list[OptimizationPass] = passes
+        self._measure: typing.Optional[typing.Callable[[Class], int]] = measure
+
+    def run(self, class_node: Class) -> list[PassResult]:
+        """Optimizes the class in place.
+
+        Returns: the time each pass took and how many VM instructions it removed.
+        """
+        results: list[PassResult] = []
+        instructions = self._measure(class_node) if self._measure else None
+        for optimization_pass in self._passes:
+            start = time.perf_counter()
+            optimization_pass.run(class_node)
+            elapsed = time.perf_counter() - start
+            removed = None
+            if self._measure:
+                remaining = self._measure(class_node)
+                removed, instructions = instructions - remaining, remaining
+            results.append((optimization_pass.name, elapsed, removed))
+        return results
@@ -0,0 +1,193 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+# Variables are resolved by the parser, so the tree only holds VM segments
+# and indices. Integer constants are stored as 16-bit words.
+
+
+class IntConst:
+    __slots__ = ("value",)
+
+    def __init__(self, value: int) -> None:
+        self.value: int = value
+
+
+class StringConst:
+    __slots__ = ("value",)
+
+    def __init__(self, value: str) -> None:
+        self.value: str = value
+
+
+class KeywordConst:
+    """One of true, false, null, this."""
+    __slots__ = ("keyword",)
+
+    def __init__(self, keyword: str) -> None:
+        self.keyword: str = keyword
+
+
+class Var:
+    __slots__ = ("segment", "index")
+
+    def __init__(self, segment: str, index: int) -> None:
+        self.segment: str = segment
+        self.index: int = index
+
+
+class ArrayAccess:
+    """base[index]. If reuse is set, pointer 1 already holds the address of
+    this element when it is evaluated, so the address isn't computed again.
+    """
+    __slots__ = ("base", "index", "reuse")
+
+    def __init__(self, base: Var, index: "Expression") -> None:
+        self.base: Var = base
+        self.index: Expression = index
+        self.reuse: bool = False
+
+
+class Call:
+    """A call of the function name. receiver is pushed as the first argument
+    of method calls, and is None for function and constructor calls.
+    """
+    __slots__ = ("name", "receiver", "args")
+
+    def __init__(self, name: str, receiver: typing.Optional["Expression"], args: list["Expression"]) -> None:
+        self.name: str = name
+        self.receiver: typing.Optional[Expression] = receiver
+        self.args: list[Expression] = args
+
+
+class Unary:
+    __slots__ = ("op", "operand")
+
+    def __init__(self, op: str, operand: "Expression") -> None:
+        self.op: str = op
+        self.operand: Expression = operand
+
+
+class Binary:
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op: str, left: "Expression", right: "Expression") -> None:
+        self.op: str = op
+        self.left: Expression = left
+        self.right: Expression = right
+
+
+Expression = typing.Union[IntConst, StringConst, KeywordConst, Var, ArrayAccess, Call, Unary, Binary]
+
+
+class Let:
+    """let target = value. If reuse_target is set, the address of an array
+    target is kept in pointer 1 while the value is evaluated.
+    """
+    __slots__ = ("target", "value", "reuse_target")
+
+    def __init__(self, target: typing.Union[Var, ArrayAccess], value: Expression) -> None:
+        self.target: typing.Union[Var, ArrayAccess] = target
+        self.value: Expression = value
+        self.reuse_target: bool = False
+
+
+class If:
+    """else_statements is None when there is no else clause."""
+    __slots__ = ("condition", "statements", "else_statements")
+
+    def __init__(self, condition: Expression, statements: list["Statement"],
+                 else_statements: typing.Optional[list["Statement"]]) -> None:
+        self.condition: Expression = condition
+        self.statements: list[Statement] = statements
+        self.else_statements: typing.Optional[list[Statement]] = else_statements
+
+
+class While:
+    __slots__ = ("condition", "statements")
+
+    def __init__(self, condition: Expression, statements: list["Statement"]) -> None:
+        self.condition: Expression = condition
+        self.statements: list[Statement] = statements
+
+
+class Do:
+    __slots__ = ("call",)
+
+    def __init__(self, call: Call) -> None:
+        self.call: Call = call
+
+
+class Return:
+    """value is None for a return without an expression."""
+    __slots__ = ("value",)
+
+    def __init__(self, value: typing.Optional[Expression]) -> None:
+        self.value: typing.Optional[Expression] = value
+
+
+Statement = typing.Union[Let, If, While, Do, Return]
+
+
+class Subroutine:
+    """n_fields is the number of fields a constructor allocates."""
+    __slots__ = ("kind", "name", "n_vars", "n_fields", "statements")
+
+    def __init__(self, kind: str, name: str, n_vars: int, n_fields: int, statements: list[Statement]) -> None:
+        self.kind: str = kind
+        self.name: str = name
+        self.n_vars: int = n_vars
+        self.n_fields: int = n_fields
+        self.statements: list[Statement] = statements
+
+
+class Class:
+    __slots__ = ("name", "subroutines")
+
+    def __init__(self, name: str, subroutines: list[Subroutine]) -> None:
+        self.name: str = name
+        self.subroutines: list[Subroutine] = subroutines
+
+
+def statement_lists(statements: list[Statement]) -> typing.Iterator[list[Statement]]:
+    """
+    Args:
+        statements: a list of statements.
+
+    Yields:
+        The list itself and every statement list nested in it, inner lists
+        first, so they may be modified in place.
+    """
+    for statement in statements:
+        if isinstance(statement, If):
+            yield from statement_lists(statement.statements)
+            if statement.else_statements is not None:
+                yield from statement_lists(statement.else_statements)
+        elif isinstance(statement, While):
+            yield from statement_lists(statement.statements)
+    yield statements
+
+
+def sub_expressions(expression: Expression) -> typing.Iterator[Expression]:
+    """
+    Yields:
+        The expression and all of its sub expressions.
+    """
+    yield expression
+    if isinstance(expression, ArrayAccess):
+        yield from sub_expressions(expression.index)
+    elif isinstance(expression, Call):
+        if expression.receiver is not None:
+            yield from sub_expressions(expression.receiver)
+        for arg in expression.args:
+            yield from sub_expressions(arg)
+    elif isinstance(expression, Unary):
+        yield from sub_expressions(expression.operand)
+    elif isinstance(expression, Binary):
+        yield from sub_expressions(expression.left)
+        yield from sub_expressions(expression.right)